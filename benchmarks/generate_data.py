@@ -0,0 +1,132 @@
+# =========================================================
+# SYNTHETIC SALES DATA GENERATOR
+# File: benchmarks/generate_data.py
+# =========================================================
+# Writes sales files in the data/sales_data.txt format
+# (TransactionID|Date|ProductID|ProductName|Quantity|UnitPrice|CustomerID|Region)
+# with configurable dirtiness. Rows are streamed to disk in batches, so any
+# size from 10^3 to 10^8 rows can be generated in constant memory.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.generate_data --rows 1000000 --output data/bench_1m.txt
+
+import argparse
+import random
+from datetime import date, timedelta
+
+HEADER = "TransactionID|Date|ProductID|ProductName|Quantity|UnitPrice|CustomerID|Region"
+
+PRODUCTS = [
+    ("P101", "Laptop", 45000, 80000),
+    ("P102", "Mouse", 300, 900),
+    ("P103", "Keyboard", 1000, 5000),
+    ("P104", "Monitor", 8000, 20000),
+    ("P105", "Webcam", 1500, 4000),
+    ("P106", "Headphones", 1000, 5000),
+    ("P107", "USB Cable", 150, 500),
+    ("P108", "External Hard Drive", 3000, 9000),
+    ("P109", "Wireless Mouse", 400, 1500),
+    ("P110", "Laptop Charger", 1500, 3500)
+]
+VARIANTS = ["Premium", "Wireless", "Gaming", "1TB", "LED", "HD", "Mechanical", "65W"]
+REGIONS = ["North", "South", "East", "West"]
+
+DEFAULT_DIRTINESS = {
+    "comma_numbers": 0.05,     # "1,916" style thousands separators
+    "comma_names": 0.05,       # "Laptop,Premium" style product names
+    "zero_quantity": 0.02,     # Quantity 0 (fails validation)
+    "negative_price": 0.01,    # UnitPrice < 0 (fails validation)
+    "bad_id_prefix": 0.02,     # X-prefixed Transaction/Product/Customer IDs
+    "missing_region": 0.005,   # empty Region field
+    "malformed": 0.005,        # wrong field count (dropped by the parser)
+    "encoding_noise": 0.0      # latin-1 bytes inside ProductName
+}
+
+
+def _row(rng, index, dirtiness, customers, start, days):
+    product_id, name, low, high = rng.choice(PRODUCTS)
+    txn_id = f"T{index:09d}"
+    customer_id = f"C{rng.randrange(customers):07d}"
+    day = (start + timedelta(days=rng.randrange(days))).isoformat()
+    quantity = rng.randint(1, 10)
+    price = rng.randint(low, high)
+    region = rng.choice(REGIONS)
+
+    if rng.random() < dirtiness["comma_names"]:
+        name = f"{name},{rng.choice(VARIANTS)}"
+    if rng.random() < dirtiness["encoding_noise"]:
+        name = name + " édition"
+    if rng.random() < dirtiness["zero_quantity"]:
+        quantity = 0
+    if rng.random() < dirtiness["negative_price"]:
+        price = -price
+    if rng.random() < dirtiness["bad_id_prefix"]:
+        which = rng.randrange(3)
+        if which == 0:
+            txn_id = "X" + txn_id[1:]
+        elif which == 1:
+            product_id = "X" + product_id[1:]
+        else:
+            customer_id = "X" + customer_id[1:]
+    if rng.random() < dirtiness["missing_region"]:
+        region = ""
+
+    price_text = f"{price:,}" if rng.random() < dirtiness["comma_numbers"] else str(price)
+
+    fields = [txn_id, day, product_id, name, str(quantity), price_text, customer_id, region]
+    if rng.random() < dirtiness["malformed"]:
+        fields = fields[:-1]
+
+    return "|".join(fields) + "\n"
+
+
+def generate_sales_file(filename, rows, dirtiness=None, seed=42, customers=None,
+                        start_date="2024-01-01", days=365, batch_rows=10000):
+    """
+    Writes a synthetic sales file.
+    Rows with encoding noise are written as latin-1, everything else as UTF-8,
+    mimicking mixed-encoding exports.
+    Returns: number of data rows written
+    """
+    settings = dict(DEFAULT_DIRTINESS)
+    settings.update(dirtiness or {})
+
+    rng = random.Random(seed)
+    customers = customers or max(10, rows // 20)
+    start = date.fromisoformat(start_date)
+
+    with open(filename, "wb") as f:
+        f.write((HEADER + "\n").encode("utf-8"))
+        batch = []
+        for index in range(1, rows + 1):
+            line = _row(rng, index, settings, customers, start, days)
+            batch.append(line.encode("latin-1" if "é" in line else "utf-8"))
+            if len(batch) >= batch_rows:
+                f.write(b"".join(batch))
+                batch = []
+        if batch:
+            f.write(b"".join(batch))
+
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic sales data")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--output", default="data/synthetic_sales_data.txt")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--customers", type=int, help="distinct customers (default rows/20)")
+    parser.add_argument("--days", type=int, default=365)
+    for key, value in DEFAULT_DIRTINESS.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=float, default=value,
+                            help=f"fraction of rows (default {value})")
+    args = parser.parse_args(argv)
+
+    dirtiness = {key: getattr(args, key) for key in DEFAULT_DIRTINESS}
+    generate_sales_file(args.output, args.rows, dirtiness, args.seed, args.customers,
+                        days=args.days)
+    print(f"Wrote {args.rows} rows to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
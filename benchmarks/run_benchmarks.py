@@ -0,0 +1,193 @@
+# =========================================================
+# PIPELINE BENCHMARK HARNESS
+# File: benchmarks/run_benchmarks.py
+# =========================================================
+# Times (and optionally memory-profiles) every pipeline stage on synthetic
+# data of increasing size and writes machine-readable JSON, tagged with the
+# current git commit, so regressions can be tracked across commits.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.run_benchmarks --rows 1000 100000 1000000 --memory
+#   python -m benchmarks.run_benchmarks --input data/sales_data.txt
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.generate_data import generate_sales_file
+from utils.file_handler import read_sales_data
+from utils.data_processor import (
+    parse_transactions,
+    validate_and_filter,
+    build_sales_aggregate,
+    calculate_total_revenue,
+    region_wise_sales,
+    top_selling_products,
+    customer_analysis,
+    daily_sales_trend,
+    find_peak_sales_day,
+    low_performing_products,
+    generate_sales_report
+)
+from utils.api_handler import enrich_sales_data
+from utils.columnar import TransactionTable
+
+RESULTS_DIR = "benchmarks/results"
+
+# Catalog stand-in so enrichment is measured without the network
+SYNTHETIC_MAPPING = {
+    pid: {"title": f"Product {pid}", "category": "electronics", "brand": "Brand", "rating": 4.5}
+    for pid in range(101, 111)
+}
+
+ANALYTICS = [
+    calculate_total_revenue,
+    region_wise_sales,
+    top_selling_products,
+    customer_analysis,
+    daily_sales_trend,
+    find_peak_sales_day,
+    low_performing_products
+]
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(name, func, rows=None, memory=False):
+    """
+    Runs func once and records wall time, CPU time, throughput and,
+    when memory is True, the tracemalloc peak. When rows is None the
+    length of the result is used.
+    Returns: (result, measurement dictionary)
+    """
+    if memory:
+        tracemalloc.start()
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    result = func()
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+
+    peak = None
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    if rows is None:
+        rows = len(result)
+
+    return result, {
+        "stage": name,
+        "rows": rows,
+        "wall_seconds": round(wall, 6),
+        "cpu_seconds": round(cpu, 6),
+        "rows_per_second": round(rows / wall, 1) if wall > 0 else None,
+        "peak_bytes": peak
+    }
+
+
+def benchmark_file(filename, memory=False):
+    """
+    Runs every pipeline stage on one sales file.
+    Returns: list of per-stage measurements
+    """
+    stages = []
+
+    def run(name, func, rows):
+        result, row = measure(name, func, rows, memory)
+        stages.append(row)
+        print(f"  {name:<32}{row['wall_seconds']:>10.4f}s  {row['rows_per_second'] or 0:>14,.0f} rows/s")
+        return result
+
+    raw = run("read_sales_data", lambda: read_sales_data(filename), None)
+    parsed = run("parse_transactions", lambda: parse_transactions(raw), len(raw))
+    run("TransactionTable.from_raw_lines", lambda: TransactionTable.from_raw_lines(raw), len(raw))
+    run("TransactionTable.from_file", lambda: TransactionTable.from_file(filename), len(raw))
+    valid, _, _ = run("validate_and_filter", lambda: validate_and_filter(parsed), len(parsed))
+
+    for func in ANALYTICS:
+        run(func.__name__, lambda: func(valid), len(valid))
+
+    aggregate = run("build_sales_aggregate", lambda: build_sales_aggregate(valid), len(valid))
+    enriched = run(
+        "enrich_sales_data", lambda: enrich_sales_data(valid, SYNTHETIC_MAPPING), len(valid)
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        report = os.path.join(tmp, "sales_report.txt")
+        run(
+            "generate_sales_report",
+            lambda: generate_sales_report(valid, enriched, report, aggregate=aggregate),
+            len(valid)
+        )
+
+    return stages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the sales analytics pipeline")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="synthetic dataset sizes to benchmark")
+    parser.add_argument("--input", nargs="+", help="benchmark existing files instead")
+    parser.add_argument("--memory", action="store_true",
+                        help="record tracemalloc peaks (slower)")
+    parser.add_argument("--encoding-noise", type=float, default=0.001)
+    parser.add_argument("--output", help="results JSON path (default benchmarks/results/<commit>.json)")
+    args = parser.parse_args(argv)
+
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "memory_profiled": args.memory,
+        "datasets": []
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.input:
+            datasets = [(path, None) for path in args.input]
+        else:
+            datasets = []
+            for rows in args.rows:
+                path = os.path.join(tmp, f"sales_{rows}.txt")
+                generate_sales_file(path, rows, {"encoding_noise": args.encoding_noise})
+                datasets.append((path, rows))
+
+        for path, rows in datasets:
+            print(f"\n{os.path.basename(path)}")
+            results["datasets"].append({
+                "file": path if rows is None else None,
+                "generated_rows": rows,
+                "file_bytes": os.path.getsize(path),
+                "stages": benchmark_file(path, args.memory)
+            })
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit or 'unknown'}.json")
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# =========================================================
+# STARTUP BUDGET CHECK
+# File: benchmarks/startup_budget.py
+# =========================================================
+# Measures how much `import main` adds to interpreter startup and checks that
+# heavy dependencies (requests, numpy, multiprocessing, ...) are only loaded by
+# the code paths that use them. Exits non-zero when either check fails, so it
+# can gate CI.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.startup_budget --budget-ms 100 --runs 15
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+LAZY_MODULES = (
+    "requests", "urllib3", "numpy", "multiprocessing", "tracemalloc", "pyarrow",
+    "concurrent.futures", "hashlib", "pickle", "utils.report"
+)
+DEFAULT_BUDGET_MS = 100
+
+
+def time_command(code, runs):
+    """
+    Returns: median wall time in milliseconds of `python -c code`
+    """
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def eagerly_loaded():
+    """
+    Returns: the LAZY_MODULES that `import main` pulls in
+    """
+    code = (
+        "import sys, main; "
+        f"print(' '.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    )
+    return result.stdout.split()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the import-time budget of main.py")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="Maximum time `import main` may add to interpreter startup")
+    parser.add_argument("--runs", type=int, default=15)
+    args = parser.parse_args(argv)
+
+    baseline = time_command("pass", args.runs)
+    with_main = time_command("import main", args.runs)
+    overhead = with_main - baseline
+    loaded = eagerly_loaded()
+
+    print(f"Interpreter startup: {baseline:.1f} ms")
+    print(f"import main:         {with_main:.1f} ms (+{overhead:.1f} ms, budget {args.budget_ms:.0f} ms)")
+
+    failed = False
+    if overhead > args.budget_ms:
+        print(f"✗ Import overhead exceeds the budget by {overhead - args.budget_ms:.1f} ms")
+        failed = True
+    if loaded:
+        print(f"✗ Loaded at import time: {', '.join(loaded)}")
+        failed = True
+    if not failed:
+        print("✓ Startup within budget")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
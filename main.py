@@ -1,6 +1,16 @@
-from utils.file_handler import read_sales_data
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from contextlib import redirect_stderr, redirect_stdout
+
+from utils.file_handler import read_sales_data, read_sales_bytes, expand_inputs
 from utils.data_processor import (
     parse_transactions,
+    new_parse_rejects,
+    format_parse_rejects,
     validate_and_filter,
     calculate_total_revenue,
     region_wise_sales,
@@ -9,42 +19,512 @@ from utils.data_processor import (
     daily_sales_trend,
     find_peak_sales_day,
     low_performing_products,
+    build_sales_aggregate,
+    merge_sales_aggregates,
+    merge_validation_summaries,
+    merge_enrichment_summaries,
+    new_sales_aggregate,
+    new_validation_summary,
+    new_enrichment_summary,
     generate_sales_report
 )
 from utils.api_handler import (
-    fetch_all_products,
-    create_product_mapping,
+    CACHE_TTL,
+    CatalogPrefetch,
+    DETAIL_CONCURRENCY,
+    complete_product_mapping,
     enrich_sales_data,
     save_enriched_data
 )
+from utils.streaming import stream_pipeline, DEFAULT_CHUNK_SIZE
+from utils.parallel import parallel_pipeline
+from utils.incremental import incremental_pipeline, STATE_FILE
+from utils.metrics import MetricsRecorder
+from utils.dedup import DEFAULT_CAPACITY as DEDUP_CAPACITY
+from utils.sketches import approximate_settings, DEFAULT_DISTINCT_ERROR, DEFAULT_TOP_K_ERROR
+
+DEFAULT_INPUT = "data/sales_data.txt"
+DEFAULT_REPORT = "output/sales_report.txt"
+DEFAULT_ENRICHED = "data/enriched_sales_data.txt"
+FORMAT_EXTENSIONS = {"text": "txt", "columnar": "scol", "parquet": "parquet", "arrow": "arrow"}
+REPORT_EXTENSIONS = {"text": "txt", "json": "json", "csv": "csv", "html": "html"}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Sales Analytics System",
+        epilog="Without filter flags, an interactive terminal is prompted for filters "
+               "(use --no-prompt to disable)."
+    )
+
+    # Inputs & outputs
+    parser.add_argument("inputs", nargs="*", default=[DEFAULT_INPUT],
+                        help="input files, glob patterns or directories")
+    parser.add_argument("--dir-pattern", default="*.txt",
+                        help="file pattern used inside input directories "
+                             "(compressed .gz/.bz2/.xz/.zst variants match too)")
+    parser.add_argument("--report",
+                        help=f"report output path (default {DEFAULT_REPORT}, "
+                             "extension following --report-format)")
+    parser.add_argument("--report-format", default="text", choices=list(REPORT_EXTENSIONS),
+                        help="report output format")
+    parser.add_argument("--report-cache",
+                        help="JSON file caching rendered report sections across runs")
+    parser.add_argument("--customer-analytics", action="store_true",
+                        help="add RFM customer segments and cohort retention to the report")
+    parser.add_argument("--enriched-output",
+                        help=f"enriched data output path (default {DEFAULT_ENRICHED})")
+    parser.add_argument("--enriched-format", default="text",
+                        choices=list(FORMAT_EXTENSIONS),
+                        help="format of the enriched data file (in-memory mode only)")
+    parser.add_argument("--per-file", action="store_true",
+                        help="write one report and enriched file per input into --output-dir")
+    parser.add_argument("--output-dir", default="output",
+                        help="output directory for --per-file")
+
+    # Filters
+    parser.add_argument("--region", help="only keep transactions from this region")
+    parser.add_argument("--min-amount", type=float, help="minimum transaction amount")
+    parser.add_argument("--max-amount", type=float, help="maximum transaction amount")
+    parser.add_argument("--no-prompt", action="store_true",
+                        help="never prompt for filters")
+
+    # Stage selection
+    parser.add_argument("--no-enrich", action="store_true",
+                        help="skip the API fetch, enrichment and enriched data file")
+    parser.add_argument("--no-report", action="store_true", help="skip report generation")
+    parser.add_argument("--dedup", action="store_true",
+                        help="drop transactions whose TransactionID was already seen in this run")
+    parser.add_argument("--dedup-index",
+                        help="SQLite file of seen TransactionIDs kept across runs (implies --dedup)")
+    parser.add_argument("--dedup-capacity", type=int, default=DEDUP_CAPACITY,
+                        help="IDs the in-memory Bloom filter is sized for")
+    parser.add_argument("--warehouse",
+                        help="SQLite file that keeps every valid transaction across runs; "
+                             "analysis and report run as queries over the whole history")
+    parser.add_argument("--scenarios",
+                        help="JSON list of filter scenarios ({\"name\", \"region\", \"min_amount\", "
+                             "\"max_amount\"}) evaluated in one pass, one report each")
+    parser.add_argument("--cube-regions",
+                        help="comma-separated regions for a scenario grid; 'each' = every region "
+                             "in the data, 'all' = no region filter")
+    parser.add_argument("--cube-bands",
+                        help="comma-separated amount edges for a scenario grid, e.g. 0,1000,10000")
+    parser.add_argument("--detail-concurrency", type=int, default=DETAIL_CONCURRENCY,
+                        help="parallel per-product lookups for IDs missing from the catalog "
+                             "(0 disables)")
+
+    # Execution engines
+    parser.add_argument("--stream", action="store_true",
+                        help="process the input chunk by chunk with constant memory")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="transactions per chunk in streaming mode")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="process the input over N worker processes")
+    parser.add_argument("--incremental", action="store_true",
+                        help="fold only rows appended since the last run into saved state")
+    parser.add_argument("--state-file", default=STATE_FILE,
+                        help="aggregate state file for incremental mode")
+    parser.add_argument("--columnar", action="store_true",
+                        help="in-memory mode: parse into NumPy columns (TransactionTable) and "
+                             "validate / aggregate with vectorized operations")
+
+    # Approximate analytics
+    parser.add_argument("--approximate", action="store_true",
+                        help="estimate unique customers and top products with sketches")
+    parser.add_argument("--distinct-error", type=float, default=DEFAULT_DISTINCT_ERROR,
+                        help="relative standard error of unique-customer estimates")
+    parser.add_argument("--top-k-error", type=float, default=DEFAULT_TOP_K_ERROR,
+                        help="max product quantity over-count, as a fraction of total quantity")
 
+    # Worker mode
+    parser.add_argument("--serve", action="store_true",
+                        help="stay running and take jobs as JSON lines on stdin")
+    parser.add_argument("--socket",
+                        help="with --serve, take jobs on this Unix socket instead of stdin")
 
-def main():
+    # Metrics
+    parser.add_argument("--metrics-file", default="output/metrics.json",
+                        help="JSON file for per-stage timing and memory metrics")
+    parser.add_argument("--openmetrics-file",
+                        help="also write metrics in OpenMetrics text format")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="record tracemalloc peaks per stage (slower)")
+
+    args = parser.parse_args(argv)
+    if args.approximate:
+        try:
+            args.approximate = approximate_settings(args.distinct_error, args.top_k_error)
+        except ValueError as e:
+            parser.error(str(e))
+    else:
+        args.approximate = None
+    if args.dedup_index:
+        args.dedup = True
+    if args.dedup and args.workers > 1:
+        parser.error("--dedup cannot be combined with --workers (worker processes "
+                     "would each need the whole ID index)")
+    if args.dedup_index and args.incremental:
+        parser.error("--dedup-index cannot be combined with --incremental (a rebuilt "
+                     "state would find every earlier ID in the index and count nothing)")
+    args.cube = bool(args.scenarios or args.cube_regions or args.cube_bands)
+    if args.cube:
+        if any(value is not None for value in (args.region, args.min_amount, args.max_amount)):
+            parser.error("filter flags cannot be combined with a cube; add them as scenarios")
+        if args.workers > 1 or args.incremental or args.per_file or args.warehouse or args.columnar:
+            parser.error("a cube runs as one streaming pass; drop --workers, --incremental, "
+                         "--per-file, --warehouse and --columnar")
+        try:
+            args.cube_bands = [float(edge) for edge in args.cube_bands.split(",")] \
+                if args.cube_bands else None
+        except ValueError:
+            parser.error(f"--cube-bands must be comma-separated amounts: {args.cube_bands}")
+    if args.warehouse and args.approximate:
+        parser.error("--warehouse aggregates are exact; drop --approximate")
+    if args.report is None:
+        root = os.path.splitext(DEFAULT_REPORT)[0]
+        args.report = f"{root}.{REPORT_EXTENSIONS[args.report_format]}"
+    return args
+
+
+def _suffixed(path, stem):
+    root, ext = os.path.splitext(path)
+    return f"{root}.{stem}{ext}"
+
+
+def _stem(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def open_dedup_index(args):
     """
-    Main execution function
+    Returns the TransactionID index for this run, or None without --dedup.
     """
-    try:
-        print("=" * 40)
-        print("      SALES ANALYTICS SYSTEM")
-        print("=" * 40)
+    if not args.dedup:
+        return None
+    from utils.dedup import TransactionIDIndex
 
-        # -------------------------------------------------
-        # 1. Read sales data
-        # -------------------------------------------------
-        print("\n[1/10] Reading sales data...")
-        raw = read_sales_data("data/sales_data.txt")
-        print(f"✓ Successfully read {len(raw)} transactions")
+    return TransactionIDIndex(args.dedup_index, capacity=args.dedup_capacity)
 
-        # -------------------------------------------------
-        # 2. Parse and clean data
-        # -------------------------------------------------
-        print("\n[2/10] Parsing and cleaning data...")
-        parsed = parse_transactions(raw)
-        print(f"✓ Parsed {len(parsed)} records")
 
-        # -------------------------------------------------
-        # 3. Show filter options
-        # -------------------------------------------------
+def open_warehouse(args):
+    """
+    Returns the SalesWarehouse for this run, or None without --warehouse.
+    """
+    if not args.warehouse:
+        return None
+    from utils.warehouse import SalesWarehouse
+
+    directory = os.path.dirname(args.warehouse)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    warehouse = SalesWarehouse(args.warehouse)
+    if warehouse.removed_duplicates:
+        print(f"✓ Removed {warehouse.removed_duplicates:,} duplicate rows from {warehouse.path}")
+    return warehouse
+
+
+def report_renderer(args):
+    """
+    Returns a renderer backed by --report-cache, or None for the shared
+    in-process section cache.
+    """
+    if not args.report_cache:
+        return None
+    from utils.report import ReportRenderer
+
+    return ReportRenderer(args.report_cache)
+
+
+class CatalogLoader:
+    """
+    Fetches the product catalog at most once per process, however many
+    input files are processed. start() begins the fetch on a background
+    thread and get() only waits for what is left. source is the factory
+    for that fetch; worker mode passes one that returns its warm catalog.
+    """
+
+    def __init__(self, metrics, source=CatalogPrefetch):
+        self.metrics = metrics
+        self.source = source
+        self.mapping = None
+        self.prefetch = None
+
+    def start(self):
+        if self.prefetch is None:
+            self.prefetch = self.source()
+
+    def get(self):
+        if self.mapping is None:
+            self.start()
+            with self.metrics.stage("fetch_products") as stage:
+                api_products, self.mapping = self.prefetch.result()
+                stage.rows = len(api_products)
+            print(
+                f"✓ Fetched {len(api_products)} products "
+                f"(fetch {self.prefetch.fetch_seconds:.2f}s, waited {stage.wall_seconds:.2f}s)"
+            )
+        return self.mapping
+
+    def complete(self, product_ids, max_workers):
+        """
+        Adds ProductIDs missing from the catalog via concurrent detail lookups.
+        """
+        mapping = self.get()
+        if not max_workers:
+            return
+        with self.metrics.stage("fetch_product_details") as stage:
+            added = complete_product_mapping(
+                mapping, product_ids, self.prefetch.client, max_workers
+            )
+            stage.rows = added
+        if added:
+            print(f"✓ Looked up {added} products missing from the catalog")
+
+
+def print_parse_rejects(rejects):
+    """
+    Prints the rejected-row tally and the first offending lines.
+    """
+    print(f"✓ Parse: {format_parse_rejects(rejects)}")
+    for example in rejects["examples"]:
+        print(f"  ✗ {example['reason']}: {example['line']}")
+
+
+def ingest(args, files, product_mapping, enriched_file, dedup=None, rejects=None):
+    """
+    Runs the selected engine (incremental, parallel or streaming) over files.
+    Rows dropped by the parser are counted into rejects when it is given.
+    Returns: (aggregate, validation summary, enrichment summary or None)
+    """
+    filters = {
+        "region": args.region,
+        "min_amount": args.min_amount,
+        "max_amount": args.max_amount
+    }
+
+    if args.incremental:
+        aggregate = new_sales_aggregate(args.approximate)
+        summary = new_validation_summary()
+        enrichment = new_enrichment_summary() if product_mapping is not None else None
+
+        for filename in files:
+            state_file = args.state_file
+            file_enriched = enriched_file
+            if len(files) > 1:
+                state_file = _suffixed(state_file, _stem(filename))
+                file_enriched = _suffixed(enriched_file, _stem(filename)) if enriched_file else None
+
+            part_aggregate, part_summary, part_enrichment, new_rows = incremental_pipeline(
+                filename, state_file, product_mapping=product_mapping,
+                enriched_file=file_enriched, approximate=args.approximate, dedup=dedup,
+                rejects=rejects, **filters
+            )
+            print(f"✓ {filename}: folded in {new_rows} new rows")
+            merge_sales_aggregates(aggregate, part_aggregate)
+            merge_validation_summaries(summary, part_summary)
+            if enrichment is not None:
+                merge_enrichment_summaries(enrichment, part_enrichment)
+
+        return aggregate, summary, enrichment
+
+    if args.workers > 1:
+        return parallel_pipeline(
+            files, args.workers, product_mapping=product_mapping,
+            enriched_file=enriched_file, approximate=args.approximate, rejects=rejects,
+            **filters
+        )
+
+    return stream_pipeline(
+        files, product_mapping, enriched_file, chunk_size=args.chunk_size,
+        approximate=args.approximate, dedup=dedup, rejects=rejects, **filters
+    )
+
+
+def run_pipeline(args, metrics, inputs, catalog_source=CatalogPrefetch, dedup=None):
+    """
+    Non-interactive execution over one or more inputs using the streaming,
+    parallel or incremental engine. The catalog is fetched once and reused
+    for every input; --no-enrich / --no-report skip stages entirely.
+    One dedup index spans all inputs.
+    """
+    catalog = CatalogLoader(metrics, catalog_source)
+    if not args.no_enrich:
+        catalog.start()
+    renderer = report_renderer(args)
+
+    enriched_default = args.enriched_output or DEFAULT_ENRICHED
+    if args.per_file:
+        jobs = [
+            (
+                [filename],
+                os.path.join(
+                    args.output_dir,
+                    f"{_stem(filename)}_sales_report.{REPORT_EXTENSIONS[args.report_format]}"
+                ),
+                os.path.join(args.output_dir, f"{_stem(filename)}_enriched_sales_data.txt")
+            )
+            for filename in inputs
+        ]
+        os.makedirs(args.output_dir, exist_ok=True)
+    else:
+        jobs = [(inputs, args.report, enriched_default)]
+
+    for files, report_file, enriched_file in jobs:
+        label = files[0] if len(files) == 1 else f"{len(files)} files"
+        print(f"\nProcessing {label}...")
+
+        product_mapping = None if args.no_enrich else catalog.get()
+
+        duplicates_before = dedup.duplicates if dedup is not None else 0
+        rejects = new_parse_rejects()
+        with metrics.stage(f"ingest:{label}") as stage:
+            aggregate, summary, enrichment = ingest(
+                args, files, product_mapping, None if args.no_enrich else enriched_file, dedup,
+                rejects
+            )
+            stage.rows = summary["total_input"]
+        print_parse_rejects(rejects)
+        print(f"✓ Valid: {summary['final_count']} | Invalid: {summary['invalid']}")
+        if dedup is not None:
+            print(f"✓ Duplicates skipped: {dedup.duplicates - duplicates_before} "
+                  f"(index: {len(dedup):,} IDs)")
+        if enrichment is not None:
+            print(f"✓ Enriched {enrichment['enriched_count']}/{enrichment['total']} transactions")
+
+        if args.no_report:
+            continue
+        if not aggregate["transactions"]:
+            print("No valid transactions, report skipped")
+            continue
+
+        with metrics.stage(f"report:{label}", aggregate["transactions"]):
+            generate_sales_report(
+                None, None, report_file, aggregate=aggregate, enrichment=enrichment,
+                file_format=args.report_format, renderer=renderer,
+                customer_analytics=args.customer_analytics
+            )
+        print(f"✓ Report saved to: {report_file}")
+
+    print("\nProcess Complete!")
+    print("=" * 40)
+
+
+def run_cube(args, metrics, inputs, catalog_source=CatalogPrefetch, dedup=None):
+    """
+    Filter cube: a single streaming pass over all inputs evaluates every
+    scenario from --scenarios and the --cube-regions x --cube-bands grid,
+    then one report per scenario is written next to --report.
+    """
+    from utils.cube import FilterCube, cube_pipeline, load_scenarios, ALL_REGIONS
+
+    catalog = CatalogLoader(metrics, catalog_source)
+    if not args.no_enrich:
+        catalog.start()
+
+    cube = FilterCube(
+        load_scenarios(args.scenarios) if args.scenarios else (), args.approximate
+    )
+    if args.cube_regions or args.cube_bands:
+        regions = args.cube_regions.split(",") if args.cube_regions else [ALL_REGIONS]
+        cube.add_grid([region.strip() for region in regions], args.cube_bands)
+
+    label = inputs[0] if len(inputs) == 1 else f"{len(inputs)} files"
+    print(f"\nProcessing {label}...")
+    product_mapping = None if args.no_enrich else catalog.get()
+    enriched_file = None if args.no_enrich else args.enriched_output or DEFAULT_ENRICHED
+
+    rejects = new_parse_rejects()
+    with metrics.stage("cube") as stage:
+        summary = cube_pipeline(
+            cube, inputs, product_mapping, enriched_file, args.chunk_size, dedup, rejects
+        )
+        stage.rows = summary["total_input"]
+    print_parse_rejects(rejects)
+    print(f"✓ Valid: {summary['final_count']} | Invalid: {summary['invalid']}")
+    if dedup is not None:
+        print(f"✓ Duplicates skipped: {dedup.duplicates} (index: {len(dedup):,} IDs)")
+    print(f"✓ Evaluated {len(cube.scenarios)} scenarios in one pass")
+
+    if args.no_report:
+        print("\nReports skipped")
+    else:
+        renderer = report_renderer(args)
+        with metrics.stage("report", len(cube.scenarios)):
+            for scenario, aggregate, enrichment in cube.results():
+                if not aggregate["transactions"]:
+                    print(f"  {scenario['name']}: no matching transactions, report skipped")
+                    continue
+                report_file = _suffixed(args.report, scenario["name"])
+                generate_sales_report(
+                    None, None, report_file, aggregate=aggregate, enrichment=enrichment,
+                    file_format=args.report_format, renderer=renderer,
+                    customer_analytics=args.customer_analytics
+                )
+                print(f"✓ {scenario['name']}: {aggregate['transactions']} transactions "
+                      f"-> {report_file}")
+
+    print("\nProcess Complete!")
+    print("=" * 40)
+
+
+def run_batch(args, metrics, filename, prompt, catalog_source=CatalogPrefetch, dedup=None,
+              warehouse=None):
+    """
+    In-memory execution of the ten pipeline steps for a single input.
+    Filters come from the prompts when prompt is True, else from the flags.
+    Non-interactive runs start the catalog fetch first, so it overlaps with
+    steps 1-5.
+    With a warehouse, every valid row is appended to it and the analysis and
+    report cover its whole history (filters applied in the queries); only
+    this run's rows are enriched.
+    With --columnar, rows are parsed into a TransactionTable and validated and
+    aggregated column-wise; row dictionaries are only built for enrichment.
+    """
+    catalog = CatalogLoader(metrics, catalog_source)
+    if not (args.no_enrich or prompt):
+        catalog.start()
+
+    # -------------------------------------------------
+    # 1. Read sales data
+    # -------------------------------------------------
+    print("\n[1/10] Reading sales data...")
+    with metrics.stage("read") as stage:
+        if args.columnar:
+            # Parsed straight from the (decompressed) bytes in step 2
+            raw = read_sales_bytes(filename)
+            print(f"✓ Successfully read {len(raw):,} bytes")
+        else:
+            raw = read_sales_data(filename)
+            stage.rows = len(raw)
+            print(f"✓ Successfully read {len(raw)} transactions")
+
+    # -------------------------------------------------
+    # 2. Parse and clean data
+    # -------------------------------------------------
+    print("\n[2/10] Parsing and cleaning data...")
+    rejects = new_parse_rejects()
+    with metrics.stage("parse") as stage:
+        if args.columnar:
+            from utils.columnar import TransactionTable
+
+            parsed = TransactionTable.from_bytes(raw, rejects=rejects)
+        else:
+            parsed = parse_transactions(raw, rejects)
+        stage.rows = len(parsed) + rejects["total"]
+    del raw
+    print(f"✓ Parsed {len(parsed)} records | {format_parse_rejects(rejects)}")
+    for example in rejects["examples"]:
+        print(f"  ✗ {example['reason']}: {example['line']}")
+
+    # -------------------------------------------------
+    # 3. Show filter options
+    # -------------------------------------------------
+    region_filter = args.region
+    min_amount = args.min_amount
+    max_amount = args.max_amount
+
+    if prompt:
         regions = sorted({tx["Region"] for tx in parsed if tx["Region"]})
         amounts = [tx["Quantity"] * tx["UnitPrice"] for tx in parsed]
 
@@ -54,10 +534,6 @@ def main():
 
         apply_filter = input("\nDo you want to filter data? (y/n): ").strip().lower()
 
-        region_filter = None
-        min_amount = None
-        max_amount = None
-
         if apply_filter == "y":
             region_filter = input("Enter region (or leave blank): ").strip() or None
 
@@ -66,46 +542,87 @@ def main():
 
             min_amount = float(min_val) if min_val else None
             max_amount = float(max_val) if max_val else None
+    else:
+        print("\n[3/10] Filters:", {
+            "region": region_filter, "min_amount": min_amount, "max_amount": max_amount
+        })
 
-        # -------------------------------------------------
-        # 4. Validate transactions
-        # -------------------------------------------------
-        print("\n[4/10] Validating transactions...")
+    # -------------------------------------------------
+    # 4. Validate transactions
+    # -------------------------------------------------
+    print("\n[4/10] Validating transactions...")
+    filters = {"region": region_filter, "min_amount": min_amount, "max_amount": max_amount}
+    with metrics.stage("validate", len(parsed)):
+        # The warehouse keeps every valid row; filters apply when it is queried
         valid, invalid, summary = validate_and_filter(
-            parsed,
-            region=region_filter,
-            min_amount=min_amount,
-            max_amount=max_amount
+            parsed, **({} if warehouse is not None else filters)
         )
-        print(f"✓ Valid: {len(valid)} | Invalid: {invalid}")
+    print(f"✓ Valid: {len(valid)} | Invalid: {invalid}")
 
-        # -------------------------------------------------
-        # 5. Perform data analysis
-        # -------------------------------------------------
-        print("\n[5/10] Analyzing sales data...")
-        calculate_total_revenue(valid)
-        region_wise_sales(valid)
-        top_selling_products(valid)
-        customer_analysis(valid)
-        daily_sales_trend(valid)
-        find_peak_sales_day(valid)
-        low_performing_products(valid)
-        print("✓ Analysis complete")
+    if dedup is not None:
+        from utils.dedup import deduplicate_mask, iter_deduplicate
+
+        with metrics.stage("dedup", len(valid)):
+            if hasattr(valid, "take"):
+                # --columnar: keep the table, so analysis stays vectorized
+                valid = valid.take(deduplicate_mask(valid.transaction_ids.tolist(), dedup))
+            else:
+                valid = list(iter_deduplicate(valid, dedup))
+        print(f"✓ Duplicates skipped: {dedup.duplicates} (index: {len(dedup):,} IDs)")
+
+    aggregate = None
+    if warehouse is not None:
+        with metrics.stage("warehouse_load", len(valid)):
+            loaded = warehouse.load(valid)
+        print(f"✓ Loaded {loaded} into warehouse, {len(valid) - loaded} already stored "
+              f"({len(warehouse):,} rows in {warehouse.path})")
+        aggregate = warehouse.to_aggregate(**filters)
+        valid = validate_and_filter(valid, **filters)[0]
+
+    if not (aggregate["transactions"] if aggregate is not None else valid):
+        # e.g. a re-sent file whose IDs were all counted by an earlier run
+        print("\nNo valid transactions, analysis and report skipped")
+        return
 
+    # -------------------------------------------------
+    # 5. Perform data analysis
+    # -------------------------------------------------
+    print("\n[5/10] Analyzing sales data...")
+    with metrics.stage("analyze", len(valid)):
+        if aggregate is None:
+            if hasattr(valid, "to_aggregate") and not args.approximate:
+                aggregate = valid.to_aggregate()
+            else:
+                aggregate = build_sales_aggregate(valid, args.approximate)
+        calculate_total_revenue(aggregate)
+        region_wise_sales(aggregate)
+        top_selling_products(aggregate)
+        customer_analysis(aggregate)
+        daily_sales_trend(aggregate)
+        find_peak_sales_day(aggregate)
+        low_performing_products(aggregate)
+    print("✓ Analysis complete")
+
+    enriched = None
+    if args.no_enrich:
+        print("\n[6-8/10] API enrichment skipped")
+    else:
         # -------------------------------------------------
         # 6. Fetch API data
         # -------------------------------------------------
         print("\n[6/10] Fetching product data from API...")
-        api_products = fetch_all_products()
-        product_mapping = create_product_mapping(api_products)
-        print(f"✓ Fetched {len(api_products)} products")
+        # The columnar table itself is kept for the report's customer analytics
+        transactions = valid.to_transactions() if hasattr(valid, "to_transactions") else valid
+        catalog.complete({tx["ProductID"] for tx in transactions}, args.detail_concurrency)
+        product_mapping = catalog.get()
 
         # -------------------------------------------------
         # 7. Enrich sales data
         # -------------------------------------------------
         print("\n[7/10] Enriching sales data...")
-        enriched = enrich_sales_data(valid, product_mapping)
-        enriched_count = sum(1 for tx in enriched if tx.get("API_Match"))
+        with metrics.stage("enrich", len(transactions)):
+            enriched = enrich_sales_data(transactions, product_mapping)
+        enriched_count = enriched.match_count()
         rate = (enriched_count / len(enriched)) * 100 if enriched else 0
         print(f"✓ Enriched {enriched_count}/{len(enriched)} transactions ({rate:.1f}%)")
 
@@ -113,27 +630,259 @@ def main():
         # 8. Save enriched data
         # -------------------------------------------------
         print("\n[8/10] Saving enriched data...")
-        save_enriched_data(enriched)
-        print("✓ Saved to: data/enriched_sales_data.txt")
+        enriched_file = args.enriched_output
+        if enriched_file is None:
+            root = os.path.splitext(DEFAULT_ENRICHED)[0]
+            enriched_file = f"{root}.{FORMAT_EXTENSIONS[args.enriched_format]}"
+        with metrics.stage("save_enriched", len(enriched)):
+            save_enriched_data(enriched, enriched_file, file_format=args.enriched_format)
+        print(f"✓ Saved to: {enriched_file}")
 
-        # -------------------------------------------------
-        # 9. Generate report
-        # -------------------------------------------------
+    # -------------------------------------------------
+    # 9. Generate report
+    # -------------------------------------------------
+    if args.no_report:
+        print("\n[9/10] Report skipped")
+    else:
         print("\n[9/10] Generating report...")
-        generate_sales_report(valid, enriched)
-        print("✓ Report saved to: output/sales_report.txt")
+        with metrics.stage("report", len(valid)):
+            generate_sales_report(
+                valid, enriched, args.report, aggregate=aggregate,
+                file_format=args.report_format, renderer=report_renderer(args),
+                customer_analytics=args.customer_analytics
+            )
+        print(f"✓ Report saved to: {args.report}")
 
-        # -------------------------------------------------
-        # 10. Done
-        # -------------------------------------------------
-        print("\n[10/10] Process Complete!")
+    # -------------------------------------------------
+    # 10. Done
+    # -------------------------------------------------
+    print("\n[10/10] Process Complete!")
+    print("=" * 40)
+
+
+# =========================================================
+# DAEMON / WORKER MODE
+# =========================================================
+# A long-lived process that keeps the interpreter, imports and product
+# catalog warm and runs one job per JSON line, read from stdin or from a
+# local Unix socket:
+#
+#   {"id": 1, "args": ["data/store_17.txt", "--report", "output/store_17.txt"]}
+#   -> {"id": 1, "exit_code": 0, "seconds": 0.41, "output": "..."}
+#
+# {"command": "ping"} answers without running anything; {"command": "shutdown"}
+# stops the worker. Jobs run one at a time and never prompt.
+class Worker:
+    def __init__(self, catalog_ttl=CACHE_TTL, enrich=True):
+        self.catalog_ttl = catalog_ttl
+        self.catalog = None
+        self.catalog_started = None
+        self.jobs = 0
+        if enrich:
+            self.warm_catalog()
+
+    def warm_catalog(self):
+        """
+        Returns the shared CatalogPrefetch, refreshed once it is older than the TTL.
+        """
+        if self.catalog is None or time.time() - self.catalog_started > self.catalog_ttl:
+            self.catalog = CatalogPrefetch()
+            self.catalog_started = time.time()
+        return self.catalog
+
+    def handle(self, line):
+        """
+        Runs one request line.
+        Returns: (response dictionary, True if the worker should stop)
+        """
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+        except ValueError as e:
+            return {"exit_code": 2, "error": f"Invalid request: {e}"}, False
+
+        command = request.get("command", "run")
+        if command == "ping":
+            return {"id": request.get("id"), "ok": True, "jobs": self.jobs}, False
+        if command == "shutdown":
+            return {"id": request.get("id"), "ok": True}, True
+        if command != "run":
+            return {"id": request.get("id"), "exit_code": 2,
+                    "error": f"Unknown command: {command}"}, False
+
+        argv = [str(arg) for arg in request.get("args", [])] + ["--no-prompt"]
+        output = io.StringIO()
+        start = time.perf_counter()
+        with redirect_stdout(output), redirect_stderr(output):
+            try:
+                exit_code = main(argv, catalog_source=self.warm_catalog)
+            except SystemExit as e:  # argparse errors
+                exit_code = e.code if isinstance(e.code, int) else 2
+        self.jobs += 1
+
+        return {
+            "id": request.get("id"),
+            "exit_code": exit_code,
+            "seconds": round(time.perf_counter() - start, 6),
+            "output": output.getvalue()
+        }, False
+
+    def serve_lines(self, reader, writer):
+        """
+        Answers request lines from reader on writer until EOF or shutdown.
+        Returns: True if a shutdown was requested
+        """
+        for line in reader:
+            if not line.strip():
+                continue
+            response, stop = self.handle(line)
+            writer.write(json.dumps(response) + "\n")
+            writer.flush()
+            if stop:
+                return True
+        return False
+
+
+def serve(args):
+    """
+    Runs the worker on stdin/stdout, or on a Unix socket when --socket is given.
+    Returns: process exit code
+    """
+    # Only responses go to stdout; log lines (including the background
+    # catalog fetch) go to stderr so they never corrupt the JSON stream
+    stdout = sys.stdout
+    with redirect_stdout(sys.stderr):
+        worker = Worker(enrich=not args.no_enrich)
+        try:
+            if not args.socket:
+                print("Worker ready (stdin)")
+                worker.serve_lines(sys.stdin, stdout)
+                return 0
+
+            return _serve_socket(worker, args.socket)
+        finally:
+            # Let an in-flight catalog fetch finish while its messages still go to stderr
+            if worker.catalog is not None:
+                worker.catalog.wait()
+
+
+def _serve_socket(worker, path):
+    import socket
+
+    if not hasattr(socket, "AF_UNIX"):
+        print("Unix sockets are not available on this platform; use --serve")
+        return 2
+
+    if os.path.exists(path):
+        os.remove(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen()
+    print(f"Worker ready ({path})")
+
+    try:
+        while True:
+            conn, _ = server.accept()
+            with conn, conn.makefile("r", encoding="utf-8") as reader, \
+                    conn.makefile("w", encoding="utf-8") as writer:
+                if worker.serve_lines(reader, writer):
+                    return 0
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        server.close()
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def main(argv=None, catalog_source=CatalogPrefetch):
+    """
+    Main execution function
+    catalog_source: factory for the catalog fetch; worker mode passes one
+    that returns the catalog shared across jobs
+    Returns: process exit code (0 on success, 1 on failure)
+    """
+    args = parse_args(argv)
+
+    if args.serve or args.socket:
+        if catalog_source is not CatalogPrefetch:
+            print("--serve cannot be used inside a worker job")
+            return 2
+        return serve(args)
+
+    metrics = MetricsRecorder(trace_memory=args.trace_memory)
+
+    try:
+        print("=" * 40)
+        print("      SALES ANALYTICS SYSTEM")
         print("=" * 40)
 
+        inputs = expand_inputs(args.inputs, args.dir_pattern)
+        if not inputs:
+            raise FileNotFoundError(f"No input files match: {' '.join(args.inputs)}")
+
+        use_engine = (
+            args.stream or args.workers > 1 or args.incremental
+            or args.per_file or len(inputs) > 1
+        )
+        has_filters = any(
+            value is not None for value in (args.region, args.min_amount, args.max_amount)
+        )
+        prompt = not (args.no_prompt or has_filters) and sys.stdin.isatty()
+
+        if args.warehouse and use_engine:
+            print("--warehouse needs a single input file without --stream, --workers, "
+                  "--incremental or --per-file")
+            return 2
+        if args.enriched_format != "text" and not args.no_enrich and (use_engine or args.cube):
+            # The engines stream enriched rows out chunk by chunk; the binary
+            # formats are written from all rows at once
+            print(f"--enriched-format {args.enriched_format} needs a single input file without "
+                  "--stream, --workers, --incremental, --per-file or a cube")
+            return 2
+        if args.columnar and use_engine:
+            print("--columnar needs a single input file without --stream, --workers, "
+                  "--incremental or --per-file")
+            return 2
+
+        dedup = open_dedup_index(args)
+        warehouse = None
+        completed = False
+        try:
+            warehouse = open_warehouse(args)
+            with metrics.activate():
+                if args.cube:
+                    run_cube(args, metrics, inputs, catalog_source, dedup)
+                elif use_engine:
+                    run_pipeline(args, metrics, inputs, catalog_source, dedup)
+                else:
+                    run_batch(args, metrics, inputs[0], prompt, catalog_source, dedup, warehouse)
+            completed = True
+        finally:
+            if warehouse is not None:
+                warehouse.close()
+            if dedup is not None:
+                # IDs of a failed run were never counted; keep them out of the index
+                dedup.close(commit=completed)
+
     except Exception as e:
         print("\n❌ An error occurred:")
-        print(str(e))
+        stage = metrics.failed_stage()
+        if stage:
+            print(f"Stage: {stage}")
+        print(f"{type(e).__name__}: {e}")
         print("Please check inputs or try again.")
+        return 1
+
+    finally:
+        if args.metrics_file:
+            metrics.write_json(args.metrics_file)
+        if args.openmetrics_file:
+            metrics.write_openmetrics(args.openmetrics_file)
+
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -1,28 +1,278 @@
-import requests
+import json
+import os
+import time
+from collections.abc import Mapping, Sequence
+
+from utils.metrics import instrument
+from utils.writers import write_batched, save_columnar, save_arrow
 
 BASE_URL = "https://dummyjson.com/products"
+CACHE_FILE = "data/product_cache.json"
+CACHE_TTL = 24 * 60 * 60
+PAGE_SIZE = 100
+DETAIL_CONCURRENCY = 8
+
 
+def _page_end(skip, products):
+    return skip + len(products)
 
-def fetch_all_products():
+
+def _missing_skips(pages, total):
     """
-    Fetches all products from DummyJSON API
-    Returns: list of product dictionaries
+    Returns the offsets still to fetch: the end of every non-empty page that
+    no fetched page covers yet. Pages are keyed by the skip they were
+    requested with, so a server that caps limit (even inconsistently) only
+    leaves gaps that the next round fills.
     """
-    try:
-        response = requests.get(f"{BASE_URL}?limit=100", timeout=10)
+    covered = [(skip, _page_end(skip, products)) for skip, products in pages.items()]
+    missing = set()
+    for skip, products in pages.items():
+        end = _page_end(skip, products)
+        if products and end < total and end not in pages and not any(
+            start <= end < stop for start, stop in covered
+        ):
+            missing.add(end)
+    return sorted(missing)
 
-        if response.status_code == 200:
-            data = response.json()
-            print("API fetch successful")
-            return data.get("products", [])
-        else:
-            print("API fetch failed with status:", response.status_code)
-            return []
 
-    except requests.RequestException as e:
-        print("API connection error:", e)
+def _join_pages(pages):
+    """
+    Returns: the products of all pages in offset order, overlaps dropped
+    """
+    products = []
+    for skip in sorted(pages):
+        overlap = len(products) - skip
+        products.extend(pages[skip][max(overlap, 0):])
+    return products
+
+
+class ProductCatalogClient:
+    """
+    Product catalog client for the DummyJSON API.
+
+    - Reads every page (limit/skip) concurrently over one pooled session
+    - Retries connection errors and 429/5xx responses with exponential backoff
+    - Keeps an on-disk cache; within the TTL no request is made at all, after
+      it the first page is revalidated with ETag / If-Modified-Since
+    - Falls back to a stale cache when the API is unreachable
+    """
+
+    def __init__(self, base_url=BASE_URL, cache_file=CACHE_FILE, ttl=CACHE_TTL,
+                 page_size=PAGE_SIZE, max_workers=8, retries=3, backoff=0.5, timeout=10):
+        # requests is imported on first use so runs without the API never load it
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self.base_url = base_url
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.timeout = timeout
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET",)
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    # ---------------------------------------------------------
+    # Cache
+    # ---------------------------------------------------------
+    def load_cache(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return None
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_cache(self, cache):
+        if not self.cache_file:
+            return
+        directory = os.path.dirname(self.cache_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_file = self.cache_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+        os.replace(tmp_file, self.cache_file)
+
+    # ---------------------------------------------------------
+    # Network
+    # ---------------------------------------------------------
+    def fetch_page(self, skip, headers=None):
+        return self.session.get(
+            self.base_url,
+            params={"limit": self.page_size, "skip": skip},
+            headers=headers,
+            timeout=self.timeout
+        )
+
+    def fetch_products(self):
+        """
+        Returns: list of product dictionaries (every page of the catalog)
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        import requests
+
+        cache = self.load_cache()
+
+        if cache and time.time() - cache.get("fetched_at", 0) < self.ttl:
+            print("API catalog served from cache")
+            return cache["products"]
+
+        headers = {}
+        if cache:
+            if cache.get("etag"):
+                headers["If-None-Match"] = cache["etag"]
+            if cache.get("last_modified"):
+                headers["If-Modified-Since"] = cache["last_modified"]
+
+        try:
+            first = self.fetch_page(0, headers)
+
+            if first.status_code == 304 and cache:
+                cache["fetched_at"] = time.time()
+                self.save_cache(cache)
+                print("API catalog not modified, using cache")
+                return cache["products"]
+
+            if first.status_code != 200:
+                print("API fetch failed with status:", first.status_code)
+                return self._stale(cache)
+
+            data = first.json()
+            pages = {0: list(data.get("products", []))}
+            total = data.get("total", len(pages[0]))
+
+            # Step by what the server returned, not by page_size: it may cap limit
+            step = len(pages[0])
+            skips = list(range(step, total, step)) if step else []
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                while skips:
+                    for skip, page in zip(skips, pool.map(self.fetch_page, skips)):
+                        if page.status_code != 200:
+                            print("API page fetch failed with status:", page.status_code)
+                            return self._stale(cache)
+                        pages[skip] = page.json().get("products", [])
+                    skips = _missing_skips(pages, total)
+
+        except (requests.RequestException, ValueError) as e:
+            print("API connection error:", e)
+            return self._stale(cache)
+
+        products = _join_pages(pages)
+        if len(products) < total:
+            # Not cached, so the next run fetches again
+            print(f"API catalog incomplete: got {len(products)} of {total} products")
+            return self._stale(cache) if cache else products
+
+        self.save_cache({
+            "fetched_at": time.time(),
+            "etag": first.headers.get("ETag"),
+            "last_modified": first.headers.get("Last-Modified"),
+            "products": products
+        })
+        print(f"API fetch successful ({len(products)} products)")
+        return products
+
+    def _stale(self, cache):
+        if cache:
+            print("Using stale API catalog cache")
+            return cache["products"]
         return []
 
+    def fetch_product(self, product_id):
+        """
+        Looks up a single product by its numeric API id.
+        Returns: product dictionary, or None if unknown or unreachable
+        """
+        import requests
+
+        try:
+            response = self.session.get(f"{self.base_url}/{product_id}", timeout=self.timeout)
+            if response.status_code != 200:
+                return None
+            return response.json()
+        except (requests.RequestException, ValueError):
+            return None
+
+    def fetch_product_details(self, product_ids, max_workers=DETAIL_CONCURRENCY):
+        """
+        Looks up many products concurrently, at most max_workers requests in flight.
+        Returns: list of the product dictionaries that were found
+        """
+        if not product_ids:
+            return []
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            found = pool.map(self.fetch_product, product_ids)
+        return [product for product in found if product]
+
+
+class CatalogPrefetch:
+    """
+    Fetches the catalog and builds the product mapping on a background
+    thread, started as early as possible so the API round trips overlap
+    with reading, parsing and analysis. result() blocks only if the fetch
+    has not finished by the time enrichment needs it.
+    """
+
+    def __init__(self, client=None):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.client = client or ProductCatalogClient()
+        self.fetch_seconds = None
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="catalog-prefetch")
+        self._future = executor.submit(self._fetch)
+        executor.shutdown(wait=False)
+
+    def _fetch(self):
+        start = time.perf_counter()
+        products = fetch_all_products(self.client)
+        mapping = create_product_mapping(products)
+        self.fetch_seconds = time.perf_counter() - start
+        return products, mapping
+
+    def done(self):
+        return self._future.done()
+
+    def wait(self, timeout=None):
+        """
+        Blocks until the fetch has finished (successfully or not).
+        """
+        from concurrent.futures import wait
+
+        wait([self._future], timeout)
+
+    def result(self):
+        """
+        Returns: (api_products, product_mapping)
+        """
+        return self._future.result()
+
+
+@instrument
+def fetch_all_products(client=None):
+    """
+    Fetches all products from DummyJSON API
+    Returns: list of product dictionaries
+    """
+    if client is None:
+        client = ProductCatalogClient()
+    return client.fetch_products()
+
+@instrument
 def create_product_mapping(api_products):
     """
     Creates mapping of product ID to product info
@@ -43,56 +293,197 @@ def create_product_mapping(api_products):
 
     return mapping
 
-def enrich_sales_data(transactions, product_mapping):
+
+API_COLUMNS = ["API_Category", "API_Brand", "API_Rating", "API_Match"]
+NO_MATCH = (None, None, None, False)
+
+
+def _api_product_id(product_id):
+    try:
+        return int(product_id.replace("P", ""))
+    except Exception:
+        return None
+
+
+def complete_product_mapping(product_mapping, product_ids, client=None,
+                             max_workers=DETAIL_CONCURRENCY):
     """
-    Enriches sales transactions with API product information
+    Looks up the ProductIDs that the catalog mapping does not cover with
+    concurrent per-product requests and adds the ones found to the mapping.
+    Skipped when the mapping is empty, i.e. the catalog itself was unreachable.
+    Returns: number of products added
     """
-    enriched = []
+    if not product_mapping:
+        return 0
 
-    for tx in transactions:
-        tx_copy = tx.copy()
+    missing = sorted({
+        api_id
+        for api_id in map(_api_product_id, set(product_ids))
+        if api_id is not None and api_id not in product_mapping
+    })
+    if not missing:
+        return 0
 
-        try:
-            product_id_str = tx["ProductID"].replace("P", "")
-            product_id = int(product_id_str)
-        except Exception:
-            product_id = None
+    if client is None:
+        client = ProductCatalogClient()
+    found = client.fetch_product_details(missing, max_workers)
+    product_mapping.update(create_product_mapping(found))
+    return len(found)
 
-        api_product = product_mapping.get(product_id)
 
+def build_enrichment_index(product_ids, product_mapping):
+    """
+    Joins distinct ProductIDs against the API mapping.
+    Each ProductID is parsed once, however many transactions reference it.
+    Returns: dict of ProductID -> (category, brand, rating, match) tuple
+    """
+    index = {}
+    for product_id in product_ids:
+        if product_id in index:
+            continue
+        api_product = product_mapping.get(_api_product_id(product_id))
         if api_product:
-            tx_copy["API_Category"] = api_product.get("category")
-            tx_copy["API_Brand"] = api_product.get("brand")
-            tx_copy["API_Rating"] = api_product.get("rating")
-            tx_copy["API_Match"] = True
+            index[product_id] = (
+                api_product.get("category"),
+                api_product.get("brand"),
+                api_product.get("rating"),
+                True
+            )
         else:
-            tx_copy["API_Category"] = None
-            tx_copy["API_Brand"] = None
-            tx_copy["API_Rating"] = None
-            tx_copy["API_Match"] = False
+            index[product_id] = NO_MATCH
+    return index
+
+
+class EnrichedTransaction(Mapping):
+    """
+    Read-only view of one transaction plus its API columns.
+    Nothing is copied; the API values are shared per product.
+    """
+
+    __slots__ = ("tx", "api")
+
+    def __init__(self, tx, api):
+        self.tx = tx
+        self.api = api
+
+    def __getitem__(self, key):
+        if key in API_COLUMNS:
+            return self.api[API_COLUMNS.index(key)]
+        return self.tx[key]
+
+    def __iter__(self):
+        yield from self.tx
+        yield from API_COLUMNS
+
+    def __len__(self):
+        return len(self.tx) + len(API_COLUMNS)
+
+    def copy(self):
+        return dict(self)
 
-        enriched.append(tx_copy)
 
-    return enriched
+class EnrichedTransactions(Sequence):
+    """
+    Lazy result of enrich_sales_data: the original transactions joined with
+    one API tuple per row. Rows are materialised as views only when accessed.
+    """
+
+    def __init__(self, transactions, api_values):
+        self.transactions = transactions
+        self.api_values = api_values
+
+    def __len__(self):
+        return len(self.transactions)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return EnrichedTransactions(self.transactions[i], self.api_values[i])
+        return EnrichedTransaction(self.transactions[i], self.api_values[i])
+
+    def __iter__(self):
+        return map(EnrichedTransaction, self.transactions, self.api_values)
+
+    def column(self, name):
+        if name in API_COLUMNS:
+            pos = API_COLUMNS.index(name)
+            return [api[pos] for api in self.api_values]
+        return [tx[name] for tx in self.transactions]
+
+    def match_count(self):
+        return sum(1 for api in self.api_values if api[3])
+
+
+@instrument
+def enrich_sales_data(transactions, product_mapping):
+    """
+    Enriches sales transactions with API product information
+    Returns: EnrichedTransactions (a sequence of read-only row mappings)
+    """
+    transactions = list(transactions)
+    index = build_enrichment_index(
+        (tx["ProductID"] for tx in transactions), product_mapping
+    )
+    api_values = [index[tx["ProductID"]] for tx in transactions]
+
+    return EnrichedTransactions(transactions, api_values)
+
+
+ENRICHED_HEADER = [
+    "TransactionID", "Date", "ProductID", "ProductName",
+    "Quantity", "UnitPrice", "CustomerID", "Region",
+    "API_Category", "API_Brand", "API_Rating", "API_Match"
+]
+
+
+def _field_text(value):
+    return str(value) if value is not None else ""
+
+
+def _iter_enriched_lines(enriched_transactions):
+    if isinstance(enriched_transactions, EnrichedTransactions):
+        # API columns are formatted once per distinct product
+        base_columns = ENRICHED_HEADER[:-len(API_COLUMNS)]
+        suffixes = {}
+        for tx, api in zip(enriched_transactions.transactions, enriched_transactions.api_values):
+            suffix = suffixes.get(api)
+            if suffix is None:
+                suffix = suffixes[api] = "|".join(_field_text(v) for v in api)
+            yield "|".join(_field_text(tx.get(col)) for col in base_columns) + "|" + suffix + "\n"
+        return
+
+    for tx in enriched_transactions:
+        row = [
+            str(tx.get(col, "")) if tx.get(col) is not None else ""
+            for col in ENRICHED_HEADER
+        ]
+        yield "|".join(row) + "\n"
+
+
+def write_enriched_rows(f, enriched_transactions):
+    """
+    Writes enriched transactions (without header) to an open text file
+    in batched writes
+    """
+    write_batched(f, _iter_enriched_lines(enriched_transactions))
+
 
-def save_enriched_data(enriched_transactions, filename="data/enriched_sales_data.txt"):
+@instrument
+def save_enriched_data(enriched_transactions, filename="data/enriched_sales_data.txt",
+                       file_format="text"):
     """
     Saves enriched transactions to file
+    file_format: "text" (pipe-delimited), "columnar" (memory-mappable, see
+    utils.writers.ColumnarFile), "parquet" or "arrow" (require pyarrow)
     """
-    header = [
-        "TransactionID", "Date", "ProductID", "ProductName",
-        "Quantity", "UnitPrice", "CustomerID", "Region",
-        "API_Category", "API_Brand", "API_Rating", "API_Match"
-    ]
-
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write("|".join(header) + "\n")
-
-        for tx in enriched_transactions:
-            row = [
-                str(tx.get(col, "")) if tx.get(col) is not None else ""
-                for col in header
-            ]
-            f.write("|".join(row) + "\n")
+    if file_format == "columnar":
+        save_columnar(enriched_transactions, ENRICHED_HEADER, filename)
+    elif file_format in ("parquet", "arrow"):
+        save_arrow(enriched_transactions, ENRICHED_HEADER, filename, file_format)
+    elif file_format == "text":
+        with open(filename, "w", encoding="utf-8") as f:
+            f.write("|".join(ENRICHED_HEADER) + "\n")
+            write_enriched_rows(f, enriched_transactions)
+    else:
+        raise ValueError(f"Unknown enriched data format: {file_format}")
 
     print(f"Enriched data saved to {filename}")
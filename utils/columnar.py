@@ -0,0 +1,656 @@
+# =========================================================
+# COLUMNAR TRANSACTION STORE
+# File: utils/columnar.py
+# =========================================================
+# Transactions are held as NumPy columns instead of one dict per row.
+# Quantity and UnitPrice are numeric arrays, with prices also held as integer
+# paise so revenue sums are exact; Region, ProductName, CustomerID, ProductID
+# and Date are dictionary-encoded into integer codes, so group-bys become
+# bincount calls over small code arrays.
+
+import numpy as np
+
+from utils.data_processor import new_sales_aggregate, parse_number, record_reject
+from utils.money import PAISE_PER_RUPEE
+
+ENCODED_COLUMNS = ["Date", "ProductID", "ProductName", "CustomerID", "Region"]
+FIELD_POSITIONS = {
+    "TransactionID": 0, "Date": 1, "ProductID": 2, "ProductName": 3,
+    "Quantity": 4, "UnitPrice": 5, "CustomerID": 6, "Region": 7
+}
+
+
+# ---------------------------------------------------------
+# Byte-level parsing
+# ---------------------------------------------------------
+# A whole file is parsed as one uint8 array: newline and "|" positions come
+# from flatnonzero, fields are gathered into fixed-width byte matrices, numbers
+# are converted column-wise (Horner over the digit columns) and text fields
+# are dictionary-encoded by grouping their bytes 8 at a time, so only
+# distinct values are ever decoded. Fields the vectorized rules do not cover
+# (exponents, spaces, "+" signs, very long values) go through parse_number
+# one by one, so the result matches parse_transactions exactly.
+WHITESPACE = np.zeros(256, dtype=bool)
+WHITESPACE[list(b" \t\n\r\x0b\x0c")] = True
+MAX_GATHER_WIDTH = 64
+MAX_FAST_DIGITS = 15  # below 2**53, so mantissa / 10**k is correctly rounded
+HASH_MULTIPLIER = np.uint64(0x100000001B3)
+
+# Grouping: columns with few distinct values in their first GROUP_SAMPLE rows
+# are looked up in a small multiply-shift hash table instead of sorted
+GROUP_SAMPLE = 64 * 1024
+MAX_TABLE_BITS = 20
+TABLE_MULTIPLIERS = [
+    np.uint64(m) for m in (0x9E3779B97F4A7C15, 0xBF58476D1CE4E5B9, 0x94D049BB133111EB, 0xD6E8FEB86659FD93)
+]
+ASCII_MASK = np.uint64(0x8080808080808080)
+# WORD_MASKS[n] keeps the first n bytes of a word, whatever the byte order
+WORD_MASKS = np.frombuffer(
+    b"".join(b"\xff" * n + b"\x00" * (8 - n) for n in range(9)), dtype=np.uint64
+)
+DOT, MINUS, PIPE, NEWLINE = b".-|\n"
+
+# Per-byte tables for the numeric columns
+DIGIT_BYTES = np.zeros(256, dtype=bool)
+DIGIT_BYTES[list(b"0123456789")] = True
+INT_BYTES = DIGIT_BYTES.copy()
+INT_BYTES[list(b",-")] = True
+FLOAT_BYTES = INT_BYTES.copy()
+FLOAT_BYTES[DOT] = True
+DIGIT_SCALE = np.where(DIGIT_BYTES, 10, 1).astype(np.int64)
+DIGIT_VALUE = np.where(DIGIT_BYTES, np.arange(256) - ord("0"), 0).astype(np.int64)
+
+
+def _strip_lines(buf, starts, ends):
+    """
+    Moves line bounds past leading / trailing whitespace (bytes.strip());
+    a CRLF file costs one extra pass.
+    """
+    while True:
+        move = (starts < ends) & WHITESPACE[buf[np.minimum(starts, len(buf) - 1)]]
+        if not move.any():
+            break
+        starts = starts + move
+    while True:
+        move = (ends > starts) & WHITESPACE[buf[np.maximum(ends - 1, 0)]]
+        if not move.any():
+            break
+        ends = ends - move
+    return starts, ends
+
+
+def _gather(buf, starts, lengths, width):
+    """
+    Returns: len(starts) x width uint8 matrix of field bytes, zero padded,
+    with width rounded up to whole 8-byte words so callers can compare it a
+    uint64 at a time (buf must extend MAX_GATHER_WIDTH bytes past the data)
+    """
+    width = -(-width // 8) * 8
+    if not width:
+        return np.zeros((len(starts), 0), dtype=np.uint8)
+    words = np.lib.stride_tricks.sliding_window_view(buf, width)[starts].view(np.uint64)
+    for j in range(width // 8):
+        words[:, j] &= WORD_MASKS[np.clip(lengths - 8 * j, 0, 8)]
+    return words.view(np.uint8)
+
+
+def _group(keys):
+    """
+    Groups equal keys; groups are numbered in order of first appearance, as
+    a dict lookup would number them. Low-cardinality columns are matched
+    against the distinct keys of a prefix, the others take one full sort.
+    Returns: (first row of each group, row -> group index array)
+    """
+    if not len(keys):
+        return np.zeros(0, np.int64), np.zeros(0, np.int64)
+
+    candidates, first = np.unique(keys[:GROUP_SAMPLE], return_index=True)
+    if len(candidates) <= GROUP_SAMPLE // 16:
+        position = _lookup(candidates, keys)
+        if np.array_equal(candidates[position], keys):
+            return _by_appearance(first, position)
+
+    order = np.argsort(keys)
+    ordered = keys[order]
+    boundary = np.empty(len(keys), dtype=bool)
+    boundary[0] = True
+    boundary[1:] = ordered[1:] != ordered[:-1]
+    inverse = np.empty(len(keys), dtype=np.int64)
+    inverse[order] = np.cumsum(boundary) - 1
+    return _by_appearance(np.minimum.reduceat(order, np.flatnonzero(boundary)), inverse)
+
+
+def _lookup(candidates, keys):
+    """
+    Finds each key among a few sorted candidates through a multiply-shift
+    hash table when one without collisions exists, else by binary search.
+    Returns: candidate index per key (meaningless for keys not among them)
+    """
+    if keys.dtype == np.uint64:
+        bits = min(2 * len(candidates).bit_length() + 1, MAX_TABLE_BITS)
+        shift = np.uint64(64 - bits)
+        for multiplier in TABLE_MULTIPLIERS:
+            slots = (candidates * multiplier) >> shift
+            if len(np.unique(slots)) == len(candidates):
+                table = np.zeros(1 << bits, dtype=np.intp)
+                table[slots] = np.arange(len(candidates))
+                return table[(keys * multiplier) >> shift]
+    position = np.searchsorted(candidates, keys)
+    return np.minimum(position, len(candidates) - 1, out=position)
+
+
+def _by_appearance(first, inverse):
+    """
+    Renumbers groups (given their first rows) in order of first appearance.
+    """
+    appearance = np.argsort(first)
+    rank = np.empty_like(appearance)
+    rank[appearance] = np.arange(len(appearance))
+    return first[appearance], rank[inverse]
+
+
+def _field_bytes(data, starts, ends):
+    return [data[s:e] for s, e in zip(starts.tolist(), ends.tolist())]
+
+
+def _parse_numbers(buf, data, starts, ends, convert):
+    """
+    Converts a Quantity / UnitPrice column. Digits, thousands separators, a
+    leading "-" and (for floats) one "." are handled column-wise; any other
+    field falls back to parse_number.
+    Returns: (int64 or float64 values, boolean mask of unparseable fields)
+    """
+    lengths = ends - starts
+    count = len(starts)
+    is_float = convert is float
+    values = np.zeros(count, dtype=np.float64 if is_float else np.int64)
+    failed = np.zeros(count, dtype=bool)
+    if not count:
+        return values, failed
+
+    fast = lengths <= MAX_GATHER_WIDTH
+    gathered = np.where(fast, lengths, 0)
+    width = int(gathered.max())
+    matrix = _gather(buf, starts, gathered, width)
+    known_bytes = FLOAT_BYTES if is_float else INT_BYTES
+
+    # One pass per byte column: Horner over the digits, plus the counts that
+    # decide whether the field fits the vectorized rules
+    mantissa = np.zeros(count, dtype=np.int64)
+    digits, known, minus, dots, decimals = np.zeros((5, count), dtype=np.uint8)
+    for column in np.ascontiguousarray(matrix[:, :width].T):
+        mantissa = mantissa * DIGIT_SCALE[column] + DIGIT_VALUE[column]
+        is_digit = DIGIT_BYTES[column]
+        digits += is_digit
+        known += known_bytes[column]
+        minus += column == MINUS
+        if is_float:
+            decimals += is_digit & (dots > 0)
+            dots += column == DOT
+
+    negative = matrix[:, 0] == MINUS if width else np.zeros(count, dtype=bool)
+    # NUL padding is not a known byte, so a field is all-known iff the count
+    # matches its length; "-" is only accepted in front
+    fast &= (known == gathered) & (minus == negative) & (dots <= 1)
+    fast &= (digits > 0) & (digits <= MAX_FAST_DIGITS)
+    if is_float:
+        values[:] = mantissa / np.power(10.0, decimals)
+    else:
+        values[:] = mantissa
+    values = np.where(negative, -values, values)
+
+    for i in np.flatnonzero(~fast).tolist():
+        value = parse_number(data[starts[i]:ends[i]], convert)
+        if value is None:
+            failed[i] = True
+            continue
+        try:
+            values[i] = value
+        except OverflowError:
+            # A quantity beyond int64 that no column can hold
+            failed[i] = True
+    return values, failed
+
+
+def _distinct_fields(buf, data, starts, ends):
+    """
+    Groups equal field byte strings, keyed on their first 8 bytes or on a
+    hash of all of them; the grouping is checked against the bytes.
+    Returns: (first row of each distinct value, row -> distinct index array)
+    """
+    lengths = ends - starts
+    width = int(lengths.max()) if len(starts) else 0
+    if width > MAX_GATHER_WIDTH:
+        values = _field_bytes(data, starts, ends)
+        lookup = {}
+        inverse = np.fromiter(
+            (lookup.setdefault(value, len(lookup)) for value in values),
+            dtype=np.int64, count=len(values)
+        )
+        # Codes follow first appearance, so unique() returns them in order
+        _, first = np.unique(inverse, return_index=True)
+        return first, inverse
+
+    matrix = _gather(buf, starts, lengths, width)
+    words = matrix.view(np.uint64)
+    keys = words[:, 0].copy() if width else np.zeros(len(starts), dtype=np.uint64)
+    for j in range(1, words.shape[1]):
+        keys = keys * HASH_MULTIPLIER + words[:, j]
+    first, inverse = _group(keys)
+
+    representative = first[inverse]
+    if not (np.array_equal(words, words[representative])
+            and np.array_equal(lengths, lengths[representative])):
+        # Hash collision (or NUL bytes): group on the bytes themselves
+        keyed = np.ascontiguousarray(np.column_stack([matrix, lengths.astype(np.uint8)]))
+        first, inverse = _group(keyed.view(np.dtype((np.void, keyed.shape[1]))).ravel())
+    return first, inverse
+
+
+def _encode_fields(buf, data, starts, ends, encoding, clean):
+    """
+    Dictionary-encodes a text column, decoding and cleaning each distinct
+    byte string once. Values that clean to the same text share a code.
+    Returns: (int32 code array, categories list)
+    """
+    from utils.file_handler import decode_field
+
+    first, inverse = _distinct_fields(buf, data, starts, ends)
+    categories = {}
+    lookup = np.array(
+        [
+            categories.setdefault(clean(decode_field(data[s:e], encoding)), len(categories))
+            for s, e in zip(starts[first].tolist(), ends[first].tolist())
+        ],
+        dtype=np.int32
+    )
+    return lookup[inverse] if len(lookup) else np.zeros(0, np.int32), list(categories)
+
+
+def _decode_ids(buf, data, starts, ends, encoding):
+    """
+    Returns: array of stripped TransactionIDs (fixed-width str when they are
+    all ASCII, object otherwise)
+    """
+    from utils.file_handler import decode_field
+
+    lengths = ends - starts
+    width = int(lengths.max()) if len(starts) else 0
+    if 0 < width <= MAX_GATHER_WIDTH:
+        matrix = _gather(buf, starts, lengths, width)
+        if not (matrix.view(np.uint64) & ASCII_MASK).any():
+            # ASCII bytes are their own code points: widen them to UCS-4
+            ids = matrix[:, :width].astype(np.uint32).view(f"U{width}").ravel()
+            if WHITESPACE[buf[starts]].any() or WHITESPACE[buf[ends - 1]].any():
+                ids = np.char.strip(ids)
+            return ids
+    return np.array(
+        [decode_field(value, encoding).strip() for value in _field_bytes(data, starts, ends)],
+        dtype=object
+    )
+
+
+def _clean_name(value):
+    return value.replace(",", "").strip()
+
+
+def _parse_buffer(data, encoding, rejects=None, skip_header=True):
+    """
+    Parses the bytes of a sales file (as iter_file_transactions would:
+    lines stripped, blank lines skipped, header = first line).
+    Returns: (transaction_ids, quantity, unit_price, codes, categories)
+    """
+    size = len(data)
+    buf = np.zeros(size + MAX_GATHER_WIDTH, dtype=np.uint8)
+    buf[:size] = np.frombuffer(data, dtype=np.uint8)
+    newlines = np.flatnonzero(buf == NEWLINE)
+    starts, ends = _strip_lines(
+        buf,
+        np.concatenate(([0], newlines + 1)),
+        np.concatenate((newlines, [size]))
+    )
+    present = ends > starts
+    starts, ends = starts[present], ends[present]
+    if skip_header:
+        starts, ends = starts[1:], ends[1:]
+
+    pipes = np.flatnonzero(buf == PIPE)
+    first_pipe = np.searchsorted(pipes, starts)
+    well_formed = np.searchsorted(pipes, ends) - first_pipe == 7
+    rejected = [
+        (start, end, "wrong_field_count")
+        for start, end in zip(starts[~well_formed].tolist(), ends[~well_formed].tolist())
+    ]
+    starts, ends, first_pipe = starts[well_formed], ends[well_formed], first_pipe[well_formed]
+    if len(starts) and len(pipes) - first_pipe[0] == 7 * len(starts):
+        # Every pipe from the first kept line on belongs to a kept line
+        bounds = pipes[first_pipe[0]:].reshape(-1, 7)
+    else:
+        bounds = pipes[first_pipe[:, None] + np.arange(7)].reshape(-1, 7)
+
+    def field(name):
+        position = FIELD_POSITIONS[name]
+        return (
+            starts if position == 0 else bounds[:, position - 1] + 1,
+            ends if position == 7 else bounds[:, position]
+        )
+
+    quantity, bad_quantity = _parse_numbers(buf, data, *field("Quantity"), int)
+    unit_price, bad_price = _parse_numbers(buf, data, *field("UnitPrice"), float)
+    failed = bad_quantity | bad_price
+    if failed.any():
+        for i in np.flatnonzero(failed).tolist():
+            reason = "invalid_quantity" if bad_quantity[i] else "invalid_unit_price"
+            rejected.append((int(starts[i]), int(ends[i]), reason))
+        keep = ~failed
+        starts, ends, bounds = starts[keep], ends[keep], bounds[keep]
+        quantity, unit_price = quantity[keep], unit_price[keep]
+
+    if rejects is not None:
+        for start, end, reason in sorted(rejected):
+            record_reject(rejects, reason, bytes(data[start:end]))
+
+    codes = {}
+    categories = {}
+    for col in ENCODED_COLUMNS:
+        clean = _clean_name if col == "ProductName" else str.strip
+        codes[col], categories[col] = _encode_fields(buf, data, *field(col), encoding, clean)
+
+    transaction_ids = _decode_ids(buf, data, *field("TransactionID"), encoding)
+    return transaction_ids, quantity, unit_price, codes, categories
+
+
+class TransactionTable:
+    """
+    Column-oriented, array-backed collection of transactions.
+    """
+
+    def __init__(self, transaction_ids, quantity, unit_price, codes, categories):
+        self.transaction_ids = transaction_ids
+        self.quantity = quantity
+        self.unit_price = unit_price
+        self.price_paise = np.rint(unit_price * PAISE_PER_RUPEE).astype(np.int64)
+        self.codes = codes
+        self.categories = categories
+
+    # ---------------------------------------------------------
+    # Construction & adapters
+    # ---------------------------------------------------------
+    @classmethod
+    def from_transactions(cls, transactions):
+        """
+        Builds a table from an iterable of transaction dictionaries.
+        The iterable is consumed once, so a generator keeps memory flat.
+        """
+        lookups = {col: {} for col in ENCODED_COLUMNS}
+        code_lists = {col: [] for col in ENCODED_COLUMNS}
+        transaction_ids = []
+        quantity = []
+        unit_price = []
+
+        for tx in transactions:
+            transaction_ids.append(tx["TransactionID"])
+            quantity.append(tx["Quantity"])
+            unit_price.append(tx["UnitPrice"])
+            for col in ENCODED_COLUMNS:
+                lookup = lookups[col]
+                value = tx[col]
+                code = lookup.get(value)
+                if code is None:
+                    code = lookup[value] = len(lookup)
+                code_lists[col].append(code)
+
+        codes = {
+            col: np.array(code_lists[col], dtype=np.int32)
+            for col in ENCODED_COLUMNS
+        }
+        categories = {col: list(lookups[col]) for col in ENCODED_COLUMNS}
+
+        return cls(
+            np.array(transaction_ids, dtype=object),
+            np.array(quantity, dtype=np.int64),
+            np.array(unit_price, dtype=np.float64),
+            codes,
+            categories
+        )
+
+    @classmethod
+    def from_bytes(cls, data, encoding=None, rejects=None, skip_header=True):
+        """
+        Parses the raw bytes of a sales file straight into a table, without
+        building per-row lists or dictionaries (see _parse_buffer). Rejected
+        rows are counted into rejects exactly as parse_transactions would.
+        encoding: detected from the first bytes when None
+        """
+        if encoding is None:
+            from utils.file_handler import detect_encoding, SAMPLE_SIZE
+
+            encoding = detect_encoding(bytes(data[:SAMPLE_SIZE]))
+        return cls(*_parse_buffer(data, encoding, rejects, skip_header))
+
+    @classmethod
+    def from_file(cls, filename, rejects=None):
+        """
+        Reads (and decompresses) a whole sales file and parses it with from_bytes.
+        """
+        from utils.file_handler import read_sales_bytes
+
+        return cls.from_bytes(read_sales_bytes(filename), rejects=rejects)
+
+    @classmethod
+    def from_raw_lines(cls, raw_lines, rejects=None, skip_header=True):
+        """
+        Parses decoded sales data lines (as read_sales_data returns them)
+        into a table by re-encoding them once and using from_bytes.
+        """
+        return cls.from_bytes("\n".join(raw_lines).encode("utf-8"), "utf-8", rejects, skip_header)
+
+    def to_transactions(self):
+        """
+        Converts the table back into a list of transaction dictionaries.
+        """
+        decoded = {col: self.column(col) for col in ENCODED_COLUMNS}
+        quantity = self.quantity.tolist()
+        unit_price = self.unit_price.tolist()
+        price_paise = self.price_paise.tolist()
+
+        return [
+            {
+                "TransactionID": txn_id,
+                "Date": decoded["Date"][i],
+                "ProductID": decoded["ProductID"][i],
+                "ProductName": decoded["ProductName"][i],
+                "Quantity": quantity[i],
+                "UnitPrice": unit_price[i],
+                "UnitPricePaise": price_paise[i],
+                "CustomerID": decoded["CustomerID"][i],
+                "Region": decoded["Region"][i]
+            }
+            for i, txn_id in enumerate(self.transaction_ids.tolist())
+        ]
+
+    def __len__(self):
+        return len(self.quantity)
+
+    def __iter__(self):
+        return iter(self.to_transactions())
+
+    def column(self, name):
+        """
+        Returns a decoded column as a list of values.
+        """
+        if name == "TransactionID":
+            return self.transaction_ids.tolist()
+        if name == "Quantity":
+            return self.quantity.tolist()
+        if name == "UnitPrice":
+            return self.unit_price.tolist()
+        if name == "UnitPricePaise":
+            return self.price_paise.tolist()
+        categories = self.categories[name]
+        return [categories[c] for c in self.codes[name].tolist()]
+
+    # ---------------------------------------------------------
+    # Vectorized operations
+    # ---------------------------------------------------------
+    @property
+    def revenue(self):
+        """
+        Returns: per-row revenue in integer paise
+        """
+        return self.quantity * self.price_paise
+
+    def take(self, mask):
+        """
+        Returns a new table with the rows selected by a boolean mask or index
+        array. Category dictionaries are shared with this table.
+        """
+        return TransactionTable(
+            self.transaction_ids[mask],
+            self.quantity[mask],
+            self.unit_price[mask],
+            {col: codes[mask] for col, codes in self.codes.items()},
+            self.categories
+        )
+
+    def _prefix_mask(self, name, prefix):
+        """
+        Evaluates startswith once per distinct value, then broadcasts by code.
+        """
+        per_category = np.array(
+            [value.startswith(prefix) for value in self.categories[name]],
+            dtype=bool
+        )
+        if not len(per_category):
+            return np.zeros(len(self), dtype=bool)
+        return per_category[self.codes[name]]
+
+    def validate_and_filter(self, region=None, min_amount=None, max_amount=None):
+        """
+        Vectorized counterpart of data_processor.validate_and_filter.
+        Returns: (valid table, invalid count, summary)
+        """
+        txn_ok = np.char.startswith(self.transaction_ids.astype(str), "T")
+        valid_mask = (
+            (self.quantity > 0)
+            & (self.unit_price > 0)
+            & txn_ok
+            & self._prefix_mask("ProductID", "P")
+            & self._prefix_mask("CustomerID", "C")
+        )
+        invalid = int(len(self) - valid_mask.sum())
+
+        keep = valid_mask
+        amount = self.revenue
+        if region:
+            lookup = self.categories["Region"]
+            code = lookup.index(region) if region in lookup else -1
+            keep = keep & (self.codes["Region"] == code)
+        if min_amount:
+            keep = keep & (amount >= min_amount * PAISE_PER_RUPEE)
+        if max_amount:
+            keep = keep & (amount <= max_amount * PAISE_PER_RUPEE)
+
+        valid = self.take(keep)
+        summary = {
+            "total_input": len(self),
+            "invalid": invalid,
+            "final_count": len(valid)
+        }
+
+        return valid, invalid, summary
+
+    def group_sum(self, name, values):
+        """
+        Sums values per category of an encoded column. Integer columns
+        (quantities, paise) are summed exactly in int64; bincount would
+        accumulate them as float64.
+        Returns: array indexed by category code
+        """
+        if values.dtype.kind in "iu":
+            totals = np.zeros(len(self.categories[name]), dtype=np.int64)
+            np.add.at(totals, self.codes[name], values)
+            return totals
+        return np.bincount(
+            self.codes[name],
+            weights=values,
+            minlength=len(self.categories[name])
+        )
+
+    def group_count(self, name):
+        return np.bincount(self.codes[name], minlength=len(self.categories[name]))
+
+    def codes_in_order(self, name):
+        """
+        Returns the category codes present in the table, ordered by first
+        appearance so groupings iterate like the row-by-row aggregation.
+        """
+        present, first_index = np.unique(self.codes[name], return_index=True)
+        return present[np.argsort(first_index, kind="stable")].tolist()
+
+    def _distinct_pairs(self, outer, inner):
+        """
+        Returns the distinct (outer code, inner code) pairs present in the table.
+        """
+        width = len(self.categories[inner])
+        keys = self.codes[outer].astype(np.int64) * width + self.codes[inner]
+        keys = np.unique(keys)
+        return zip((keys // width).tolist(), (keys % width).tolist())
+
+    def to_aggregate(self):
+        """
+        Builds the sales aggregate used by data_processor with vectorized
+        group-bys instead of a per-row loop.
+        """
+        aggregate = new_sales_aggregate()
+        if not len(self):
+            return aggregate
+
+        revenue = self.revenue
+        aggregate["total_revenue"] = int(revenue.sum())
+        aggregate["transactions"] = len(self)
+
+        date_values = [self.categories["Date"][c] for c in np.unique(self.codes["Date"]).tolist()]
+        aggregate["start_date"] = min(date_values)
+        aggregate["end_date"] = max(date_values)
+
+        def grouped(name, **sums):
+            counts = self.group_count(name).tolist()
+            totals = {
+                key: self.group_sum(name, values).tolist()
+                for key, values in sums.items()
+            }
+            categories = self.categories[name]
+            result = {}
+            for code in self.codes_in_order(name):
+                entry = {key: totals[key][code] for key in totals}
+                entry["count"] = counts[code]
+                result[categories[code]] = entry
+            return result
+
+        aggregate["regions"] = grouped("Region", revenue=revenue)
+
+        products = grouped("ProductName", qty=self.quantity, revenue=revenue)
+        for entry in products.values():
+            entry["qty"] = int(entry["qty"])
+            del entry["count"]
+        aggregate["products"] = products
+
+        customers = grouped("CustomerID", spent=revenue)
+        customer_names = self.categories["CustomerID"]
+        product_names = self.categories["ProductName"]
+        for entry in customers.values():
+            entry["products"] = set()
+        for c, p in self._distinct_pairs("CustomerID", "ProductName"):
+            customers[customer_names[c]]["products"].add(product_names[p])
+        aggregate["customers"] = customers
+
+        daily = grouped("Date", revenue=revenue)
+        dates = self.categories["Date"]
+        for entry in daily.values():
+            entry["customers"] = set()
+        for d, c in self._distinct_pairs("Date", "CustomerID"):
+            daily[dates[d]]["customers"].add(customer_names[c])
+        aggregate["daily"] = daily
+
+        return aggregate
@@ -0,0 +1,269 @@
+# =========================================================
+# MULTI-SCENARIO FILTER CUBE
+# File: utils/cube.py
+# =========================================================
+# Evaluates many region / amount filter scenarios in one scan instead of one
+# pipeline run per combination. Every row is read, parsed and validated once.
+# Each valid row is then placed in a cell: its region, and where its amount
+# falls among the bounds of all scenarios (two bisects). The scenarios
+# covering a cell are worked out once per cell, and each scenario aggregates
+# its rows in file order. A scenario's aggregate (and report) is therefore
+# identical to a separate run with the same --region / --min-amount /
+# --max-amount flags.
+#
+#   cube = FilterCube(load_scenarios("scenarios.json"))
+#   cube.add_grid(["each", "all"], [0, 1000, 10000])
+#   summary = cube_pipeline(cube, ["data/sales_data.txt"])
+#   for scenario, aggregate, enrichment in cube.results():
+#       ...
+
+import json
+import re
+from bisect import bisect_left, bisect_right
+
+from utils.data_processor import (
+    new_sales_aggregate,
+    update_sales_aggregate,
+    new_enrichment_summary,
+    update_enrichment_summary,
+    new_validation_summary
+)
+from utils.money import PAISE_PER_RUPEE
+from utils.streaming import iter_transaction_chunks, DEFAULT_CHUNK_SIZE
+
+SCENARIO_KEYS = ("name", "region", "min_amount", "max_amount")
+EACH_REGION = "each"
+ALL_REGIONS = "all"
+
+
+def _format_amount(amount):
+    return f"{amount:g}"
+
+
+def scenario_name(region=None, min_amount=None, max_amount=None):
+    """
+    Returns: a file-name friendly label such as "North_1000-10000",
+    "all_10000+" or "South"
+    """
+    name = re.sub(r"[^A-Za-z0-9]+", "-", region).strip("-") if region else ALL_REGIONS
+    if min_amount or max_amount:
+        low = _format_amount(min_amount) if min_amount else "0"
+        high = _format_amount(max_amount) if max_amount else "+"
+        name += f"_{low}{'-' if max_amount else ''}{high}"
+    return name
+
+
+def new_scenario(region=None, min_amount=None, max_amount=None, name=None):
+    return {
+        "name": name or scenario_name(region, min_amount, max_amount),
+        "region": region or None,
+        "min_amount": min_amount,
+        "max_amount": max_amount
+    }
+
+
+def load_scenarios(filename):
+    """
+    Reads scenarios from a JSON list of objects with optional "name",
+    "region", "min_amount" and "max_amount" keys (same meaning as the
+    --region / --min-amount / --max-amount flags).
+    Returns: list of scenario dictionaries
+    """
+    with open(filename, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    if not isinstance(entries, list):
+        raise ValueError(f"{filename}: expected a JSON list of scenarios")
+
+    scenarios = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            raise ValueError(f"{filename}: every scenario must be a JSON object")
+        unknown = set(entry) - set(SCENARIO_KEYS)
+        if unknown:
+            raise ValueError(f"{filename}: unknown scenario keys: {', '.join(sorted(unknown))}")
+        scenarios.append(new_scenario(**entry))
+    return scenarios
+
+
+def amount_bands(edges):
+    """
+    Turns sorted amount edges into consecutive bands: 0,1000,10000 gives
+    0-1000, 1000-10000 and 10000+. Lower bounds after the first are raised
+    by one paisa so that every amount lands in exactly one band.
+    Returns: list of (name, min_amount, max_amount)
+    """
+    edges = sorted(set(edges))
+    bands = []
+    for i, low in enumerate(edges):
+        high = edges[i + 1] if i + 1 < len(edges) else None
+        min_amount = low + 1 / PAISE_PER_RUPEE if i else low
+        if high is None:
+            name = f"{_format_amount(low)}+"
+        else:
+            name = f"{_format_amount(low)}-{_format_amount(high)}"
+        bands.append((name, min_amount or None, high))
+    return bands
+
+
+class FilterCube:
+    """
+    Per-scenario sales aggregates (and enrichment summaries) built from one
+    scan. Scenarios are dictionaries as returned by new_scenario.
+    """
+
+    def __init__(self, scenarios=(), approximate=None):
+        self.approximate = approximate
+        self.scenarios = []
+        self.aggregates = []
+        self.enrichment = []
+        self.each_region_bands = []
+        self.regions_seen = set()
+        self.mins = []
+        self.maxes = []
+        self.cells = {}
+        self.enriched = False
+        for scenario in scenarios:
+            self.add(scenario)
+
+    def add(self, scenario):
+        if self.cells:
+            raise ValueError("Scenarios must be added before the first update")
+        self._append(scenario)
+
+    def _append(self, scenario):
+        if any(s["name"] == scenario["name"] for s in self.scenarios):
+            raise ValueError(f"Duplicate scenario name: {scenario['name']}")
+
+        self.scenarios.append(scenario)
+        self.aggregates.append(new_sales_aggregate(self.approximate))
+        self.enrichment.append(new_enrichment_summary())
+        self._add_bounds(scenario["min_amount"], scenario["max_amount"])
+
+    def add_grid(self, regions, edges=None):
+        """
+        Adds a region x amount-band grid of scenarios. Regions are names,
+        "all" (no region filter) or "each" (one scenario per region found in
+        the data, created as regions appear).
+        """
+        bands = amount_bands(edges) if edges else [(None, None, None)]
+        for region in regions:
+            if region == EACH_REGION:
+                self.each_region_bands.extend(bands)
+                for _, min_amount, max_amount in bands:
+                    self._add_bounds(min_amount, max_amount)
+                continue
+
+            region = None if region == ALL_REGIONS else region
+            for band, min_amount, max_amount in bands:
+                name = scenario_name(region) + (f"_{band}" if band else "")
+                self.add(new_scenario(region, min_amount, max_amount, name))
+
+    def _add_bounds(self, min_amount, max_amount):
+        # Same truthiness as iter_validate_and_filter: 0 / None mean no bound
+        if min_amount and min_amount * PAISE_PER_RUPEE not in self.mins:
+            self.mins.append(min_amount * PAISE_PER_RUPEE)
+            self.mins.sort()
+        if max_amount and max_amount * PAISE_PER_RUPEE not in self.maxes:
+            self.maxes.append(max_amount * PAISE_PER_RUPEE)
+            self.maxes.sort()
+
+    def _cell_scenarios(self, region, low, high):
+        """
+        Returns the indexes of the scenarios covering a cell: rows of that
+        region whose amount is >= the first `low` min bounds and <= all max
+        bounds from position `high` on.
+        """
+        if region and region not in self.regions_seen:
+            self.regions_seen.add(region)
+            for band, min_amount, max_amount in self.each_region_bands:
+                name = scenario_name(region) + (f"_{band}" if band else "")
+                # Its bounds were registered by add_grid, so existing cells stay valid
+                self._append(new_scenario(region, min_amount, max_amount, name))
+
+        covering = []
+        for index, scenario in enumerate(self.scenarios):
+            if scenario["region"] and scenario["region"] != region:
+                continue
+            min_amount, max_amount = scenario["min_amount"], scenario["max_amount"]
+            if min_amount and bisect_right(self.mins, min_amount * PAISE_PER_RUPEE) > low:
+                continue
+            if max_amount and bisect_left(self.maxes, max_amount * PAISE_PER_RUPEE) < high:
+                continue
+            covering.append(index)
+        return covering
+
+    def update(self, transactions, enriched=None):
+        """
+        Folds a chunk of valid transactions into every scenario it matches.
+        enriched: the chunk's EnrichedTransactions, to also fold each
+                  scenario's enrichment summary
+        """
+        mins, maxes = self.mins, self.maxes
+        keys = []
+        for tx in transactions:
+            amount = tx["Quantity"] * tx["UnitPricePaise"]
+            keys.append((tx["Region"], bisect_right(mins, amount), bisect_left(maxes, amount)))
+
+        cells = self.cells
+        for key in set(keys):
+            if key not in cells:
+                cells[key] = self._cell_scenarios(*key)
+
+        selected = [[] for _ in self.scenarios]
+        for i, key in enumerate(keys):
+            for index in cells[key]:
+                selected[index].append(i)
+
+        for index, rows in enumerate(selected):
+            if not rows:
+                continue
+            if len(rows) == len(transactions):
+                update_sales_aggregate(self.aggregates[index], transactions)
+            else:
+                update_sales_aggregate(self.aggregates[index], [transactions[i] for i in rows])
+            if enriched is not None:
+                update_enrichment_summary(self.enrichment[index], [enriched[i] for i in rows])
+        if enriched is not None:
+            self.enriched = True
+
+    def results(self):
+        """
+        Yields: (scenario, aggregate, enrichment summary or None when nothing
+        was enriched) per scenario
+        """
+        for scenario, aggregate, enrichment in zip(self.scenarios, self.aggregates, self.enrichment):
+            yield scenario, aggregate, enrichment if self.enriched else None
+
+
+def cube_pipeline(cube, filenames, product_mapping=None, enriched_file=None,
+                  chunk_size=DEFAULT_CHUNK_SIZE, dedup=None, rejects=None):
+    """
+    Streams one or more sales files once into a FilterCube. Rows are
+    validated without filters; each scenario applies its own. With
+    product_mapping and enriched_file, every valid row is enriched once
+    and written to enriched_file. Rows dropped by the parser are counted
+    into rejects.
+    Returns: validation summary (final_count counts every valid row)
+    """
+    summary = new_validation_summary()
+    chunks = iter_transaction_chunks(
+        filenames, chunk_size=chunk_size, summary=summary, dedup=dedup, rejects=rejects
+    )
+
+    if product_mapping is None or not enriched_file:
+        for chunk in chunks:
+            cube.update(chunk)
+        return summary
+
+    from utils.api_handler import ENRICHED_HEADER, enrich_sales_data, write_enriched_rows
+
+    with open(enriched_file, "w", encoding="utf-8") as out:
+        out.write("|".join(ENRICHED_HEADER) + "\n")
+        for chunk in chunks:
+            enriched = enrich_sales_data(chunk, product_mapping)
+            cube.update(chunk, enriched)
+            write_enriched_rows(out, enriched)
+
+    print(f"Enriched data saved to {enriched_file}")
+
+    return summary
@@ -0,0 +1,394 @@
+# =========================================================
+# CUSTOMER ANALYTICS: RFM & COHORTS
+# File: utils/customer_analytics.py
+# =========================================================
+# Recency / frequency / monetary scoring and first-purchase cohort retention.
+# A TransactionTable is used directly: its encoded CustomerID and Date
+# columns give the customer totals and every (customer, active day) pair.
+# Other inputs go through the exact sales aggregate, whose customer totals
+# and per-day customer sets give the same. Customers and days are encoded
+# into integer arrays once; the per-customer figures are then NumPy
+# group-bys (minimum.at / maximum.at / bincount) and quantile bisects rather
+# than a loop over customer dictionaries.
+#
+#   rfm = rfm_analysis(valid)
+#   rfm_segments(rfm)                 # customers, revenue and averages per segment
+#   cohort_retention(valid, "month")  # retention matrix by first-purchase month
+
+from datetime import date
+
+import numpy as np
+
+from utils.data_processor import _as_aggregate
+from utils.rollups import week_of
+
+RFM_BINS = 5
+COHORT_PERIODS = 12
+
+# First match wins; scores run 1 (worst) to 5 (best)
+SEGMENTS = (
+    ("Champions", lambda r, f: (r >= 4) & (f >= 4)),
+    ("Loyal", lambda r, f: f >= 4),
+    ("New", lambda r, f: (r >= 4) & (f <= 2)),
+    ("At Risk", lambda r, f: (r <= 2) & (f >= 3)),
+    ("Hibernating", lambda r, f: r <= 2),
+)
+OTHER_SEGMENT = "Others"
+SEGMENT_NAMES = [name for name, _ in SEGMENTS] + [OTHER_SEGMENT]
+
+
+def _distinct(keys):
+    """
+    Returns: the sorted distinct values of an integer array. One sort and a
+    neighbour comparison; np.unique hashes in recent NumPy releases, which
+    is many times slower for a million int64 keys.
+    """
+    keys = np.sort(keys)
+    keep = np.empty(len(keys), dtype=bool)
+    keep[:1] = True
+    np.not_equal(keys[1:], keys[:-1], out=keep[1:])
+    return keys[keep]
+
+
+def _ordinal(day):
+    """
+    Returns: date ordinal of an ISO date, or -1 when it does not parse
+    """
+    try:
+        return date.fromisoformat(day).toordinal()
+    except (TypeError, ValueError):
+        return -1
+
+
+class CustomerActivity:
+    """
+    Integer-encoded customer activity:
+      customers         – customer IDs, indexed by customer code (in order
+                          of first appearance)
+      spent, orders     – per-code totals (spent in integer paise)
+      first_day, last_day – per-code first / last active day (date ordinals,
+                          -1 for customers without an ISO-dated purchase)
+      pair_customer, pair_day – one entry per (customer, active day)
+      skipped_dates     – transactions without an ISO date
+    """
+
+    def __init__(self, customers, spent, orders, pair_customer, pair_day, skipped_dates=0):
+        self.customers = customers
+        self.spent = spent
+        self.orders = orders
+        self.pair_customer = pair_customer
+        self.pair_day = pair_day
+        self.skipped_dates = skipped_dates
+
+        count = len(customers)
+        self.first_day = np.full(count, np.iinfo(np.int64).max)
+        np.minimum.at(self.first_day, pair_customer, pair_day)
+        self.last_day = np.full(count, -1, dtype=np.int64)
+        np.maximum.at(self.last_day, pair_customer, pair_day)
+        self.first_day[self.last_day < 0] = -1
+
+    @classmethod
+    def from_table(cls, table):
+        """
+        Builds the activity from a TransactionTable's encoded CustomerID and
+        Date columns: dates are parsed once per distinct value, and the
+        (customer, day) pairs are the distinct combined codes.
+        """
+        names = table.categories["CustomerID"]
+        codes = table.codes["CustomerID"]
+        rows = len(codes)
+
+        # Customer codes renumbered in order of first appearance
+        first = np.full(len(names), rows, dtype=np.int64)
+        np.minimum.at(first, codes, np.arange(rows))
+        order = np.flatnonzero(first < rows)
+        order = order[np.argsort(first[order])]
+        rank = np.zeros(len(names), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        customer = rank[codes]
+
+        spent = np.zeros(len(order), dtype=np.int64)
+        np.add.at(spent, customer, table.revenue)
+        orders = np.bincount(customer, minlength=len(order))
+
+        dates = table.categories["Date"]
+        ordinals = np.fromiter(map(_ordinal, dates), dtype=np.int64, count=len(dates))
+        date_code = table.codes["Date"].astype(np.int64)
+        dated = ordinals[date_code] >= 0
+
+        width = max(len(dates), 1)
+        pairs = _distinct(customer[dated] * width + date_code[dated])
+        return cls(
+            [names[c] for c in order.tolist()], spent, orders,
+            pairs // width, ordinals[pairs % width],
+            skipped_dates=int(len(dated) - dated.sum())
+        )
+
+    @classmethod
+    def from_aggregate(cls, aggregate):
+        """
+        Builds the activity from an exact sales aggregate, whose per-day
+        customer sets give the (customer, day) pairs.
+        """
+        daily = aggregate["daily"]
+        if not all(isinstance(entry["customers"], (set, frozenset)) for entry in daily.values()):
+            raise ValueError(
+                "Customer analytics need the exact per-day customer sets "
+                "(not available for approximate or warehouse aggregates)"
+            )
+
+        customers = aggregate["customers"]
+        names = list(customers)
+        code = {customer: i for i, customer in enumerate(names)}
+        spent = np.fromiter(
+            (v["spent"] for v in customers.values()), dtype=np.int64, count=len(names)
+        )
+        orders = np.fromiter(
+            (v["count"] for v in customers.values()), dtype=np.int64, count=len(names)
+        )
+
+        pair_customer, pair_day = [], []
+        skipped_dates = 0
+        for day, entry in daily.items():
+            ordinal = _ordinal(day)
+            if ordinal < 0:
+                skipped_dates += entry["count"]
+                continue
+            members = entry["customers"]
+            pair_customer.append(
+                np.fromiter(map(code.__getitem__, members), dtype=np.int64, count=len(members))
+            )
+            pair_day.append(np.full(len(members), ordinal, dtype=np.int64))
+
+        return cls(
+            names, spent, orders,
+            np.concatenate(pair_customer) if pair_customer else np.zeros(0, np.int64),
+            np.concatenate(pair_day) if pair_day else np.zeros(0, np.int64),
+            skipped_dates
+        )
+
+    @classmethod
+    def of(cls, data):
+        """
+        Accepts whatever the analytics functions accept: validated
+        transactions, a TransactionTable, an aggregate or an activity.
+        """
+        if isinstance(data, cls):
+            return data
+        if hasattr(data, "codes_in_order"):
+            return cls.from_table(data)
+        return cls.from_aggregate(_as_aggregate(data))
+
+    @property
+    def dated(self):
+        """
+        Returns: boolean mask of the customers with at least one dated purchase
+        """
+        return self.last_day >= 0
+
+
+# ---------------------------------------------------------
+# RFM
+# ---------------------------------------------------------
+def quantile_scores(values, higher_is_better=True):
+    """
+    Scores values 1..RFM_BINS by quantile: the bin edges are the
+    20/40/60/80% quantiles and each value is bisected into them.
+    """
+    if not len(values):
+        return np.zeros(0, dtype=np.int64)
+    edges = np.quantile(values, np.arange(1, RFM_BINS) / RFM_BINS)
+    scores = np.searchsorted(edges, values, side="right") + 1
+    return scores if higher_is_better else RFM_BINS + 1 - scores
+
+
+def segment_codes(r, f):
+    """
+    Returns: index into SEGMENT_NAMES for every (recency, frequency) score pair
+    """
+    return np.select(
+        [condition(r, f) for _, condition in SEGMENTS],
+        range(len(SEGMENTS)),
+        default=len(SEGMENTS)
+    )
+
+
+def rfm_analysis(data, as_of=None):
+    """
+    Scores every customer with a dated purchase on recency (days since the
+    last purchase, counted from as_of, default the last day in the data),
+    frequency (transactions) and monetary value (total spent).
+    Returns: dict of parallel arrays, one entry per customer:
+      customers, recency, frequency, monetary (paise), r, f, m (1-5 scores),
+      segment; plus as_of (ISO date)
+    """
+    activity = CustomerActivity.of(data)
+    dated = activity.dated
+    last_day = activity.last_day[dated]
+
+    if as_of is None:
+        as_of_day = int(last_day.max()) if len(last_day) else date.today().toordinal()
+    else:
+        as_of_day = date.fromisoformat(str(as_of)).toordinal()
+
+    recency = as_of_day - last_day
+    frequency = activity.orders[dated]
+    monetary = activity.spent[dated]
+    r = quantile_scores(recency, higher_is_better=False)
+    f = quantile_scores(frequency)
+    m = quantile_scores(monetary)
+
+    segment = np.array(SEGMENT_NAMES)[segment_codes(r, f)]
+
+    return {
+        "as_of": date.fromordinal(as_of_day).isoformat(),
+        "customers": [c for c, keep in zip(activity.customers, dated.tolist()) if keep],
+        "recency": recency,
+        "frequency": frequency,
+        "monetary": monetary,
+        "r": r,
+        "f": f,
+        "m": m,
+        "segment": segment
+    }
+
+
+def rfm_segments(rfm):
+    """
+    Summarises an rfm_analysis result per segment (in SEGMENTS order, empty
+    segments left out) with bincount group-bys over segment codes.
+    Returns: list of {"segment", "customers", "share", "revenue" (paise),
+             "recency", "orders"} rows, share in % of scored customers
+    """
+    names = SEGMENT_NAMES
+    if not len(rfm["r"]):
+        return []
+    codes = segment_codes(rfm["r"], rfm["f"])
+
+    revenue = np.zeros(len(names), dtype=np.int64)
+    np.add.at(revenue, codes, rfm["monetary"])
+    revenue = revenue.tolist()
+    counts = np.bincount(codes, minlength=len(names)).tolist()
+    recency = np.bincount(codes, weights=rfm["recency"], minlength=len(names)).tolist()
+    orders = np.bincount(codes, weights=rfm["frequency"], minlength=len(names)).tolist()
+    total = len(codes)
+
+    return [
+        {
+            "segment": name,
+            "customers": counts[i],
+            "share": round(counts[i] * 100 / total, 2),
+            "revenue": revenue[i],
+            "recency": round(recency[i] / counts[i], 1),
+            "orders": round(orders[i] / counts[i], 2)
+        }
+        for i, name in enumerate(names)
+        if counts[i]
+    ]
+
+
+# ---------------------------------------------------------
+# COHORTS
+# ---------------------------------------------------------
+def _period_index(days, period):
+    """
+    Maps date ordinals to consecutive period numbers (months since year 0,
+    or Monday-aligned weeks) through a lookup over the distinct days only.
+    """
+    distinct = _distinct(days)
+    inverse = np.searchsorted(distinct, days)
+    if period == "week":
+        index = (distinct - 1) // 7  # ordinal 1 (0001-01-01) is a Monday
+    elif period == "month":
+        index = np.array(
+            [d.year * 12 + d.month - 1 for d in map(date.fromordinal, distinct.tolist())],
+            dtype=np.int64
+        )
+    else:
+        raise ValueError(f"Unknown cohort period: {period} (use month or week)")
+    return index[inverse]
+
+
+def _period_label(index, period):
+    if period == "week":
+        return week_of(date.fromordinal(index * 7 + 1))
+    year, month = divmod(index, 12)
+    return f"{year}-{month + 1:02d}"
+
+
+def cohort_retention(data, period="month", max_periods=COHORT_PERIODS):
+    """
+    Groups customers by the period of their first purchase and measures,
+    for each later period, the share of the cohort that bought again.
+    Returns: {"period", "cohorts": [labels], "sizes": [customers],
+              "retention": rows of % active in period +0, +1, ... (as many
+              periods as the data covers after the cohort, at most
+              max_periods)}
+    """
+    activity = CustomerActivity.of(data)
+    if not len(activity.pair_day):
+        return {"period": period, "cohorts": [], "sizes": [], "retention": []}
+
+    pair_period = _period_index(activity.pair_day, period)
+    first_period = np.full(len(activity.customers), np.iinfo(np.int64).max)
+    np.minimum.at(first_period, activity.pair_customer, pair_period)
+
+    start = int(pair_period.min())
+    width = int(pair_period.max()) - start + 1
+
+    # Distinct (customer, period) pairs, then active customers per cohort cell
+    active = _distinct(activity.pair_customer * width + (pair_period - start))
+    customer = active // width
+    cohort_of = first_period[customer] - start
+    offset_of = (active % width) - cohort_of
+    cells = np.bincount(cohort_of * width + offset_of, minlength=width * width).reshape(width, width)
+
+    rows = []
+    labels = []
+    sizes = []
+    for c in range(width):
+        size = int(cells[c, 0])
+        if not size:
+            continue
+        periods = min(width - c, max_periods)
+        labels.append(_period_label(start + c, period))
+        sizes.append(size)
+        rows.append([round(int(n) * 100 / size, 1) for n in cells[c, :periods]])
+
+    return {"period": period, "cohorts": labels, "sizes": sizes, "retention": rows}
+
+
+# ---------------------------------------------------------
+# REPORT SECTIONS
+# ---------------------------------------------------------
+def customer_report_sections(data):
+    """
+    Returns: (customer_segments, cohorts) report section data, or
+    (None, None) when the data has no per-customer activity
+    (approximate and warehouse aggregates)
+    """
+    try:
+        activity = CustomerActivity.of(data)
+    except ValueError:
+        return None, None
+    if not activity.dated.any():
+        return None, None
+
+    rfm = rfm_analysis(activity)
+    segments = {"as_of": rfm["as_of"], "rows": rfm_segments(rfm)}
+
+    # Monthly cohorts once the data spans more than one month, else weekly
+    first = date.fromordinal(int(activity.pair_day.min()))
+    last = date.fromordinal(int(activity.pair_day.max()))
+    period = "month" if (first.year, first.month) != (last.year, last.month) else "week"
+    cohorts = cohort_retention(activity, period)
+    longest = max(len(row) for row in cohorts["retention"])
+
+    return segments, {
+        "period": period,
+        "periods": [f"+{i}" for i in range(longest)],
+        "rows": [
+            {"cohort": label, "customers": size, "retention": row}
+            for label, size, row in zip(cohorts["cohorts"], cohorts["sizes"], cohorts["retention"])
+        ]
+    }
@@ -4,15 +4,91 @@
 # =========================================================
 
 
+from utils.file_handler import decode_field, detect_file_encoding, iter_sales_records
+from utils.metrics import instrument
+from utils.money import PAISE_PER_RUPEE, divide_paise, rupees, to_paise
+from utils.sketches import HyperLogLog, SpaceSaving, hash64
+
+
 # ---------------------------------------------------------
 # Q2 – TASK 1.2: PARSE & CLEAN DATA
 # ---------------------------------------------------------
-def parse_transactions(raw_lines):
+PARSE_REJECT_REASONS = ("wrong_field_count", "invalid_quantity", "invalid_unit_price")
+REJECT_EXAMPLES = 5
+
+
+def new_parse_rejects():
     """
-    Parses raw sales data lines into a list of dictionaries.
+    Returns an empty rejected-row tally: total, count per reason and the
+    first few offending lines.
+    """
+    return {
+        "total": 0,
+        "reasons": {reason: 0 for reason in PARSE_REJECT_REASONS},
+        "examples": []
+    }
+
+
+def record_reject(rejects, reason, line):
+    if rejects is None:
+        return
+    rejects["total"] += 1
+    rejects["reasons"][reason] += 1
+    if len(rejects["examples"]) < REJECT_EXAMPLES:
+        if isinstance(line, (list, tuple)):
+            line = b"|".join(line) if line and isinstance(line[0], bytes) else "|".join(line)
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", errors="replace")
+        rejects["examples"].append({"reason": reason, "line": line})
+
+
+def merge_parse_rejects(target, other):
+    target["total"] += other["total"]
+    for reason, count in other["reasons"].items():
+        target["reasons"][reason] += count
+    room = REJECT_EXAMPLES - len(target["examples"])
+    target["examples"].extend(other["examples"][:max(room, 0)])
+    return target
+
+
+def format_parse_rejects(rejects):
+    """
+    Returns: one-line summary such as "3 rejected (wrong_field_count: 2, ...)"
+    """
+    reasons = ", ".join(
+        f"{reason}: {count}" for reason, count in rejects["reasons"].items() if count
+    )
+    return f"{rejects['total']} rejected ({reasons})" if reasons else "0 rejected"
+
+
+def parse_number(value, convert):
     """
-    transactions = []
-    header_skipped = False
+    Converts a Quantity/UnitPrice field, trying the plain value first and
+    only stripping thousands separators ("1,916") when that fails.
+    Returns: the number, or None if the field is not numeric
+    """
+    try:
+        return convert(value)
+    except ValueError:
+        pass
+    separator = b"," if isinstance(value, bytes) else ","
+    try:
+        return convert(value.replace(separator, separator[:0]))
+    except ValueError:
+        return None
+
+
+def iter_parse_transactions(raw_lines, skip_header=True, rejects=None):
+    """
+    Lazily parses raw sales data lines into transaction dictionaries.
+    Yields one dictionary per well-formed record; the others are counted
+    into rejects (see new_parse_rejects) when it is given.
+    Pass skip_header=False for chunks that start mid-file.
+    """
+    header_skipped = not skip_header
+    names = {}
+    prices = {}
+    strip = str.strip
 
     for line in raw_lines:
         if not header_skipped:
@@ -22,36 +98,155 @@ def parse_transactions(raw_lines):
         parts = line.split("|")
 
         if len(parts) != 8:
+            record_reject(rejects, "wrong_field_count", line)
             continue
 
+        txn_id, date, prod_id, prod_name, qty, price, cust_id, region = parts
+
+        # Fast path: most rows have no thousands separators
         try:
-            txn_id, date, prod_id, prod_name, qty, price, cust_id, region = parts
-
-            transactions.append({
-                "TransactionID": txn_id.strip(),
-                "Date": date.strip(),
-                "ProductID": prod_id.strip(),
-                "ProductName": prod_name.replace(",", "").strip(),
-                "Quantity": int(qty.replace(",", "")),
-                "UnitPrice": float(price.replace(",", "")),
-                "CustomerID": cust_id.strip(),
-                "Region": region.strip()
-            })
+            qty = int(qty)
+        except ValueError:
+            qty = parse_number(qty, int)
+            if qty is None:
+                record_reject(rejects, "invalid_quantity", line)
+                continue
 
-        except Exception:
+        # (UnitPrice, paise) once per distinct price field
+        parsed_price = prices.get(price)
+        if parsed_price is None:
+            try:
+                value = float(price)
+            except ValueError:
+                value = parse_number(price, float)
+                if value is None:
+                    record_reject(rejects, "invalid_unit_price", line)
+                    continue
+            parsed_price = prices[price] = (value, to_paise(value))
+        price, paise = parsed_price
+
+        name = names.get(prod_name)
+        if name is None:
+            name = names[prod_name] = prod_name.replace(",", "").strip()
+
+        yield {
+            "TransactionID": strip(txn_id),
+            "Date": strip(date),
+            "ProductID": strip(prod_id),
+            "ProductName": name,
+            "Quantity": qty,
+            "UnitPrice": price,
+            "UnitPricePaise": paise,
+            "CustomerID": strip(cust_id),
+            "Region": strip(region)
+        }
+
+
+def iter_parse_records(records, encoding="utf-8", skip_header=True, rejects=None):
+    """
+    Parses records of raw field bytes (from file_handler.iter_sales_records)
+    into transaction dictionaries. Quantity and UnitPrice are converted
+    straight from bytes; text fields are decoded once per distinct value.
+    """
+    decoded = {}
+    prices = {}
+    header_skipped = not skip_header
+
+    def text(raw):
+        value = decoded.get(raw)
+        if value is None:
+            value = decoded[raw] = decode_field(raw, encoding).strip()
+        return value
+
+    for parts in records:
+        if not header_skipped:
+            header_skipped = True
+            continue
+
+        if len(parts) != 8:
+            record_reject(rejects, "wrong_field_count", parts)
             continue
 
-    return transactions
+        txn_id, date, prod_id, prod_name, qty, price, cust_id, region = parts
+
+        try:
+            qty = int(qty)
+        except ValueError:
+            qty = parse_number(qty, int)
+            if qty is None:
+                record_reject(rejects, "invalid_quantity", parts)
+                continue
+
+        parsed_price = prices.get(price)
+        if parsed_price is None:
+            try:
+                value = float(price)
+            except ValueError:
+                value = parse_number(price, float)
+                if value is None:
+                    record_reject(rejects, "invalid_unit_price", parts)
+                    continue
+            parsed_price = prices[price] = (value, to_paise(value))
+        price, paise = parsed_price
+
+        yield {
+            "TransactionID": decode_field(txn_id, encoding).strip(),
+            "Date": text(date),
+            "ProductID": text(prod_id),
+            "ProductName": text(prod_name.replace(b",", b"")),
+            "Quantity": qty,
+            "UnitPrice": price,
+            "UnitPricePaise": paise,
+            "CustomerID": text(cust_id),
+            "Region": text(region)
+        }
+
+
+def iter_file_transactions(filename, start=0, end=None, rejects=None):
+    """
+    Streams transactions from a byte range of a sales file via mmap.
+    The header is only skipped for the range that starts the file.
+    """
+    return iter_parse_records(
+        iter_sales_records(filename, start, end),
+        detect_file_encoding(filename),
+        skip_header=(start == 0),
+        rejects=rejects
+    )
+
+
+@instrument
+def parse_transactions(raw_lines, rejects=None):
+    """
+    Parses raw sales data lines into a list of dictionaries.
+    Pass rejects=new_parse_rejects() to find out which rows were dropped and why.
+    """
+    return list(iter_parse_transactions(raw_lines, rejects=rejects))
 
 
 # ---------------------------------------------------------
 # Q2 – TASK 1.3: VALIDATION & FILTERING
 # ---------------------------------------------------------
-def validate_and_filter(transactions, region=None, min_amount=None, max_amount=None):
-    valid = []
-    invalid = 0
+def new_validation_summary():
+    return {
+        "total_input": 0,
+        "invalid": 0,
+        "final_count": 0
+    }
+
+
+def iter_validate_and_filter(transactions, region=None, min_amount=None, max_amount=None,
+                             summary=None):
+    """
+    Lazily validates and filters transactions.
+    Counts are accumulated into summary as records flow through.
+    """
+    if summary is None:
+        summary = new_validation_summary()
 
     for tx in transactions:
+        summary["total_input"] += 1
+
         try:
             if (
                 tx["Quantity"] <= 0
@@ -60,114 +255,371 @@ def validate_and_filter(transactions, region=None, min_amount=None, max_amount=N
                 or not tx["ProductID"].startswith("P")
                 or not tx["CustomerID"].startswith("C")
             ):
-                invalid += 1
+                summary["invalid"] += 1
                 continue
 
-            amount = tx["Quantity"] * tx["UnitPrice"]
+            amount = tx["Quantity"] * tx["UnitPricePaise"]
 
             if region and tx["Region"] != region:
                 continue
-            if min_amount and amount < min_amount:
+            if min_amount and amount < min_amount * PAISE_PER_RUPEE:
                 continue
-            if max_amount and amount > max_amount:
+            if max_amount and amount > max_amount * PAISE_PER_RUPEE:
                 continue
 
-            valid.append(tx)
-
         except Exception:
-            invalid += 1
+            summary["invalid"] += 1
+            continue
 
-    summary = {
-        "total_input": len(transactions),
-        "invalid": invalid,
-        "final_count": len(valid)
-    }
+        summary["final_count"] += 1
+        yield tx
+
+
+@instrument
+def validate_and_filter(transactions, region=None, min_amount=None, max_amount=None):
+    if hasattr(transactions, "validate_and_filter"):
+        # Columnar TransactionTable: filter with vectorized masks
+        return transactions.validate_and_filter(region, min_amount, max_amount)
+
+    summary = new_validation_summary()
+    valid = list(iter_validate_and_filter(
+        transactions, region, min_amount, max_amount, summary
+    ))
+
+    return valid, summary["invalid"], summary
 
-    return valid, invalid, summary
+
+def merge_validation_summaries(target, other):
+    for key in ("total_input", "invalid", "final_count"):
+        target[key] += other[key]
+    return target
+
+
+def iter_chunks(iterable, chunk_size):
+    """
+    Groups an iterable into lists of at most chunk_size items.
+    """
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
 
 
 # =========================================================
-# Q3 – TASK 2.1: SALES SUMMARY
+# Q3 – SINGLE-PASS AGGREGATION ENGINE
 # =========================================================
-def calculate_total_revenue(transactions):
-    total = 0.0
-    for tx in transactions:
-        total += tx["Quantity"] * tx["UnitPrice"]
-    return total
+def new_sales_aggregate(approximate=None):
+    """
+    Returns an empty aggregate holding every grouping used by the analytics
+    functions and the report. All money in an aggregate (revenue, spent) is
+    integer paise, so sums are exact.
+    Pass approximate=sketches.approximate_settings(...) to count unique
+    customers per day and region with HyperLogLog sketches, to track
+    products with a Space-Saving top-k summary instead of exact sets/dicts,
+    and to keep customer totals without per-customer product sets.
+    """
+    aggregate = {
+        "total_revenue": 0,
+        "transactions": 0,
+        "start_date": None,
+        "end_date": None,
+        "regions": {},
+        "products": {},
+        "customers": {},
+        "daily": {}
+    }
 
+    if approximate:
+        aggregate["approximate"] = dict(approximate)
+        aggregate["products"] = SpaceSaving(approximate["top_k_error"])
 
-def region_wise_sales(transactions):
-    region_data = {}
-    total_revenue = calculate_total_revenue(transactions)
+    return aggregate
+
+
+def update_sales_aggregate(aggregate, transactions):
+    """
+    Folds transactions into an aggregate in one pass.
+    Revenue is computed once per transaction and shared by every grouping.
+    """
+    if aggregate.get("approximate"):
+        return _update_approximate_aggregate(aggregate, transactions)
+
+    regions = aggregate["regions"]
+    products = aggregate["products"]
+    customers = aggregate["customers"]
+    daily = aggregate["daily"]
+
+    total = aggregate["total_revenue"]
+    count = aggregate["transactions"]
+    start_date = aggregate["start_date"]
+    end_date = aggregate["end_date"]
 
     for tx in transactions:
+        qty = tx["Quantity"]
+        revenue = qty * tx["UnitPricePaise"]
         region = tx["Region"]
-        revenue = tx["Quantity"] * tx["UnitPrice"]
+        product = tx["ProductName"]
+        customer = tx["CustomerID"]
+        date = tx["Date"]
 
-        if region not in region_data:
-            region_data[region] = {
-                "total_sales": 0,
-                "transactions": 0
+        total += revenue
+        count += 1
+
+        if start_date is None or date < start_date:
+            start_date = date
+        if end_date is None or date > end_date:
+            end_date = date
+
+        r = regions.get(region)
+        if r is None:
+            r = regions[region] = {"revenue": 0, "count": 0}
+        r["revenue"] += revenue
+        r["count"] += 1
+
+        p = products.get(product)
+        if p is None:
+            p = products[product] = {"qty": 0, "revenue": 0}
+        p["qty"] += qty
+        p["revenue"] += revenue
+
+        c = customers.get(customer)
+        if c is None:
+            c = customers[customer] = {"spent": 0, "count": 0, "products": set()}
+        c["spent"] += revenue
+        c["count"] += 1
+        c["products"].add(product)
+
+        d = daily.get(date)
+        if d is None:
+            d = daily[date] = {"revenue": 0, "count": 0, "customers": set()}
+        d["revenue"] += revenue
+        d["count"] += 1
+        d["customers"].add(customer)
+
+    aggregate["total_revenue"] = total
+    aggregate["transactions"] = count
+    aggregate["start_date"] = start_date
+    aggregate["end_date"] = end_date
+
+    return aggregate
+
+
+def _update_approximate_aggregate(aggregate, transactions):
+    """
+    update_sales_aggregate for approximate aggregates: unique customers go
+    into per-day and per-region HyperLogLogs, products into the top-k summary.
+    Each CustomerID is hashed once per call.
+    """
+    error = aggregate["approximate"]["distinct_error"]
+    regions = aggregate["regions"]
+    products = aggregate["products"]
+    customers = aggregate["customers"]
+    daily = aggregate["daily"]
+    hashes = {}
+
+    total = aggregate["total_revenue"]
+    count = aggregate["transactions"]
+    start_date = aggregate["start_date"]
+    end_date = aggregate["end_date"]
+
+    for tx in transactions:
+        qty = tx["Quantity"]
+        revenue = qty * tx["UnitPricePaise"]
+        region = tx["Region"]
+        product = tx["ProductName"]
+        customer = tx["CustomerID"]
+        date = tx["Date"]
+
+        total += revenue
+        count += 1
+
+        if start_date is None or date < start_date:
+            start_date = date
+        if end_date is None or date > end_date:
+            end_date = date
+
+        customer_hash = hashes.get(customer)
+        if customer_hash is None:
+            customer_hash = hashes[customer] = hash64(customer)
+
+        r = regions.get(region)
+        if r is None:
+            r = regions[region] = {"revenue": 0, "count": 0, "customers": HyperLogLog(error)}
+        r["revenue"] += revenue
+        r["count"] += 1
+        r["customers"].add_hash(customer_hash)
+
+        products.add(product, qty, revenue)
+
+        # Totals only: per-customer product sets would grow with every
+        # (customer, product) pair, which approximate mode exists to avoid
+        c = customers.get(customer)
+        if c is None:
+            c = customers[customer] = {"spent": 0, "count": 0}
+        c["spent"] += revenue
+        c["count"] += 1
+
+        d = daily.get(date)
+        if d is None:
+            d = daily[date] = {"revenue": 0, "count": 0, "customers": HyperLogLog(error)}
+        d["revenue"] += revenue
+        d["count"] += 1
+        d["customers"].add_hash(customer_hash)
+
+    aggregate["total_revenue"] = total
+    aggregate["transactions"] = count
+    aggregate["start_date"] = start_date
+    aggregate["end_date"] = end_date
+
+    return aggregate
+
+
+def merge_sales_aggregates(target, other):
+    """
+    Merges a partial aggregate (e.g. from another chunk) into target.
+    Partials must be merged in file order to keep first-appearance ordering.
+    Exact and approximate aggregates cannot be mixed.
+    """
+    approximate = target.get("approximate")
+    if approximate != other.get("approximate"):
+        raise ValueError("Cannot merge aggregates built with different approximation settings")
+
+    if not other["transactions"]:
+        return target
+
+    target["total_revenue"] += other["total_revenue"]
+    target["transactions"] += other["transactions"]
+
+    if target["start_date"] is None or other["start_date"] < target["start_date"]:
+        target["start_date"] = other["start_date"]
+    if target["end_date"] is None or other["end_date"] > target["end_date"]:
+        target["end_date"] = other["end_date"]
+
+    for region, v in other["regions"].items():
+        r = target["regions"].get(region)
+        if r is None:
+            r = target["regions"][region] = {"revenue": 0, "count": 0}
+            if approximate:
+                r["customers"] = HyperLogLog(approximate["distinct_error"])
+        r["revenue"] += v["revenue"]
+        r["count"] += v["count"]
+        if approximate:
+            r["customers"] |= v["customers"]
+
+    if approximate:
+        target["products"].merge(other["products"])
+    else:
+        for product, v in other["products"].items():
+            p = target["products"].setdefault(product, {"qty": 0, "revenue": 0})
+            p["qty"] += v["qty"]
+            p["revenue"] += v["revenue"]
+
+    for customer, v in other["customers"].items():
+        c = target["customers"].get(customer)
+        if c is None:
+            c = target["customers"][customer] = {"spent": 0, "count": 0}
+            if not approximate:
+                c["products"] = set()
+        c["spent"] += v["spent"]
+        c["count"] += v["count"]
+        if not approximate:
+            c["products"] |= v["products"]
+
+    for date, v in other["daily"].items():
+        d = target["daily"].get(date)
+        if d is None:
+            d = target["daily"][date] = {
+                "revenue": 0,
+                "count": 0,
+                "customers": HyperLogLog(approximate["distinct_error"]) if approximate else set()
             }
+        d["revenue"] += v["revenue"]
+        d["count"] += v["count"]
+        d["customers"] |= v["customers"]
+
+    return target
+
 
-        region_data[region]["total_sales"] += revenue
-        region_data[region]["transactions"] += 1
+@instrument
+def build_sales_aggregate(transactions, approximate=None):
+    """
+    Builds every region, product, customer and daily grouping in a single pass.
+    Returns: aggregate dictionary accepted by all analytics functions
+    """
+    return update_sales_aggregate(new_sales_aggregate(approximate), transactions)
+
+
+def _as_aggregate(data):
+    """
+    Analytics functions accept validated transactions, a columnar
+    TransactionTable or a prebuilt aggregate; this returns the aggregate for all.
+    """
+    if isinstance(data, dict):
+        return data
+    if hasattr(data, "to_aggregate"):
+        return data.to_aggregate()
+    return build_sales_aggregate(data)
 
-    for r in region_data:
-        region_data[r]["percentage"] = round(
-            (region_data[r]["total_sales"] / total_revenue) * 100, 2
-        )
+
+# =========================================================
+# Q3 – TASK 2.1: SALES SUMMARY
+# =========================================================
+@instrument
+def calculate_total_revenue(transactions):
+    return rupees(_as_aggregate(transactions)["total_revenue"])
+
+
+@instrument
+def region_wise_sales(transactions):
+    aggregate = _as_aggregate(transactions)
+    total_revenue = aggregate["total_revenue"]
+
+    region_data = {}
+    for region, v in aggregate["regions"].items():
+        region_data[region] = {
+            "total_sales": rupees(v["revenue"]),
+            "transactions": v["count"],
+            "percentage": round(v["revenue"] * 100 / total_revenue, 2)
+        }
+        if "customers" in v:
+            # Approximate aggregates also estimate unique customers per region
+            region_data[region]["unique_customers"] = len(v["customers"])
 
     return dict(
         sorted(region_data.items(), key=lambda x: x[1]["total_sales"], reverse=True)
     )
 
 
+@instrument
 def top_selling_products(transactions, n=5):
-    products = {}
+    products = _as_aggregate(transactions)["products"]
 
-    for tx in transactions:
-        p = tx["ProductName"]
-        qty = tx["Quantity"]
-        revenue = qty * tx["UnitPrice"]
-
-        if p not in products:
-            products[p] = {"qty": 0, "revenue": 0}
-
-        products[p]["qty"] += qty
-        products[p]["revenue"] += revenue
-
-    result = [(p, v["qty"], v["revenue"]) for p, v in products.items()]
+    result = [(p, v["qty"], rupees(v["revenue"])) for p, v in products.items()]
     result.sort(key=lambda x: x[1], reverse=True)
 
     return result[:n]
 
 
+@instrument
 def customer_analysis(transactions):
-    customers = {}
-
-    for tx in transactions:
-        c = tx["CustomerID"]
-        amount = tx["Quantity"] * tx["UnitPrice"]
-
-        if c not in customers:
-            customers[c] = {
-                "total_spent": 0,
-                "count": 0,
-                "products": set()
-            }
-
-        customers[c]["total_spent"] += amount
-        customers[c]["count"] += 1
-        customers[c]["products"].add(tx["ProductName"])
+    """
+    Returns: {customer: total_spent, purchase_count, avg_order_value,
+             products_bought}, biggest spenders first. Approximate aggregates
+             keep no per-customer products, so products_bought is None there.
+    """
+    customers = _as_aggregate(transactions)["customers"]
 
     final = {}
     for c, v in customers.items():
         final[c] = {
-            "total_spent": v["total_spent"],
+            "total_spent": rupees(v["spent"]),
             "purchase_count": v["count"],
-            "avg_order_value": round(v["total_spent"] / v["count"], 2),
-            "products_bought": list(v["products"])
+            "avg_order_value": rupees(divide_paise(v["spent"], v["count"])),
+            "products_bought": list(v["products"]) if "products" in v else None
         }
 
     return dict(sorted(final.items(), key=lambda x: x[1]["total_spent"], reverse=True))
@@ -176,65 +628,50 @@ def customer_analysis(transactions):
 # =========================================================
 # Q3 – TASK 2.2: DATE-BASED ANALYSIS
 # =========================================================
+@instrument
 def daily_sales_trend(transactions):
-    daily = {}
-
-    for tx in transactions:
-        d = tx["Date"]
-        revenue = tx["Quantity"] * tx["UnitPrice"]
-
-        if d not in daily:
-            daily[d] = {
-                "revenue": 0,
-                "transactions": 0,
-                "customers": set()
-            }
-
-        daily[d]["revenue"] += revenue
-        daily[d]["transactions"] += 1
-        daily[d]["customers"].add(tx["CustomerID"])
+    daily = _as_aggregate(transactions)["daily"]
 
     result = {}
     for d in sorted(daily):
         result[d] = {
-            "revenue": daily[d]["revenue"],
-            "transaction_count": daily[d]["transactions"],
+            "revenue": rupees(daily[d]["revenue"]),
+            "transaction_count": daily[d]["count"],
             "unique_customers": len(daily[d]["customers"])
         }
 
     return result
 
 
+@instrument
 def find_peak_sales_day(transactions):
-    daily = daily_sales_trend(transactions)
-    peak = max(daily, key=lambda d: daily[d]["revenue"])
+    daily = _as_aggregate(transactions)["daily"]
+    peak = max(sorted(daily), key=lambda d: daily[d]["revenue"])
 
     return (
         peak,
-        daily[peak]["revenue"],
-        daily[peak]["transaction_count"]
+        rupees(daily[peak]["revenue"]),
+        daily[peak]["count"]
     )
 
 
 # =========================================================
 # Q3 – TASK 2.3: PRODUCT PERFORMANCE
 # =========================================================
+@instrument
 def low_performing_products(transactions, threshold=10):
-    products = {}
-
-    for tx in transactions:
-        p = tx["ProductName"]
-        qty = tx["Quantity"]
-        revenue = qty * tx["UnitPrice"]
-
-        if p not in products:
-            products[p] = {"qty": 0, "revenue": 0}
-
-        products[p]["qty"] += qty
-        products[p]["revenue"] += revenue
+    """
+    Returns: (product, qty, revenue) tuples for products sold below threshold,
+    fewest first; None for approximate aggregates, whose top-k summary has
+    evicted exactly the low sellers
+    """
+    aggregate = _as_aggregate(transactions)
+    if aggregate.get("approximate"):
+        return None
+    products = aggregate["products"]
 
     result = [
-        (p, v["qty"], v["revenue"])
+        (p, v["qty"], rupees(v["revenue"]))
         for p, v in products.items()
         if v["qty"] < threshold
     ]
@@ -248,179 +685,195 @@ def low_performing_products(transactions, threshold=10):
 # =========================================================
 
 from datetime import datetime
-from collections import defaultdict
-
 
-def generate_sales_report(transactions, enriched_transactions, output_file='output/sales_report.txt'):
-    """
-    Generates a comprehensive formatted sales report
-    """
+# Shared across reports of one process (per-file runs, worker mode); created
+# by the first report so runs without one never import utils.report
+_REPORT_RENDERER = None
 
-    # ----------------------------
-    # BASIC METRICS
-    # ----------------------------
-    total_transactions = len(transactions)
-    total_revenue = sum(tx["Quantity"] * tx["UnitPrice"] for tx in transactions)
-    avg_order_value = total_revenue / total_transactions if total_transactions else 0
 
-    dates = [tx["Date"] for tx in transactions]
-    start_date, end_date = min(dates), max(dates)
+def new_enrichment_summary():
+    return {
+        "enriched_count": 0,
+        "total": 0,
+        "failed_products": set()
+    }
 
-    # ----------------------------
-    # REGION-WISE PERFORMANCE
-    # ----------------------------
-    region_data = defaultdict(lambda: {"revenue": 0, "count": 0})
 
-    for tx in transactions:
-        region = tx["Region"]
-        region_data[region]["revenue"] += tx["Quantity"] * tx["UnitPrice"]
-        region_data[region]["count"] += 1
+def update_enrichment_summary(summary, enriched_transactions):
+    """
+    Folds enriched transactions into the API enrichment summary.
+    """
+    for tx in enriched_transactions:
+        summary["total"] += 1
+        if tx.get("API_Match"):
+            summary["enriched_count"] += 1
+        else:
+            summary["failed_products"].add(tx["ProductName"])
+    return summary
 
-    region_rows = []
-    for region, data in region_data.items():
-        percent = (data["revenue"] / total_revenue) * 100
-        region_rows.append((region, data["revenue"], percent, data["count"]))
 
-    region_rows.sort(key=lambda x: x[1], reverse=True)
+def merge_enrichment_summaries(target, other):
+    target["enriched_count"] += other["enriched_count"]
+    target["total"] += other["total"]
+    target["failed_products"] |= other["failed_products"]
+    return target
 
-    # ----------------------------
-    # TOP 5 PRODUCTS
-    # ----------------------------
-    product_data = defaultdict(lambda: {"qty": 0, "revenue": 0})
 
-    for tx in transactions:
-        product = tx["ProductName"]
-        product_data[product]["qty"] += tx["Quantity"]
-        product_data[product]["revenue"] += tx["Quantity"] * tx["UnitPrice"]
+def build_report_metrics(aggregate, enrichment=None, low_threshold=10, customers=None):
+    """
+    Computes everything the report shows from a sales aggregate and an
+    enrichment summary (None when enrichment was skipped). Money stays in
+    integer paise; utils.report converts it to rupees when rendering.
+    customers: data to add the RFM segment and cohort sections from (a
+               TransactionTable, transactions or the aggregate); None
+               leaves both sections out
+    Returns: {section name: section data} as rendered by utils.report
+    """
+    total_transactions = aggregate["transactions"]
+    total_revenue = aggregate["total_revenue"]
+    region_data = aggregate["regions"]
+    product_data = aggregate["products"]
+
+    approximate = None
+    if aggregate.get("approximate"):
+        approximate = {
+            "distinct_error": aggregate["approximate"]["distinct_error"],
+            "max_qty_error": product_data.min_qty()
+        }
 
-    top_products = sorted(
-        product_data.items(),
-        key=lambda x: x[1]["qty"],
+    region_rows = sorted(
+        (
+            {
+                "region": region,
+                "sales": data["revenue"],
+                "percentage": data["revenue"] * 100 / total_revenue,
+                "transactions": data["count"]
+            }
+            for region, data in region_data.items()
+        ),
+        key=lambda x: x["sales"],
         reverse=True
-    )[:5]
+    )
 
-    # ----------------------------
-    # TOP 5 CUSTOMERS
-    # ----------------------------
-    customer_data = defaultdict(lambda: {"spent": 0, "count": 0})
+    top_products = sorted(product_data.items(), key=lambda x: x[1]["qty"], reverse=True)[:5]
+    if hasattr(aggregate, "top_customers"):
+        top_customers = aggregate.top_customers(5)
+    else:
+        top_customers = sorted(
+            aggregate["customers"].items(), key=lambda x: x[1]["spent"], reverse=True
+        )[:5]
+    daily_rows = sorted(aggregate["daily"].items())
+    best_day = max(daily_rows, key=lambda x: x[1]["revenue"])
 
-    for tx in transactions:
-        cid = tx["CustomerID"]
-        customer_data[cid]["spent"] += tx["Quantity"] * tx["UnitPrice"]
-        customer_data[cid]["count"] += 1
+    if enrichment is not None:
+        enrichment = {
+            "enriched": enrichment["enriched_count"],
+            "success_rate": (
+                (enrichment["enriched_count"] / enrichment["total"]) * 100
+                if enrichment["total"] else 0
+            ),
+            "failed_products": [{"product": p} for p in enrichment["failed_products"]]
+        }
 
-    top_customers = sorted(
-        customer_data.items(),
-        key=lambda x: x[1]["spent"],
-        reverse=True
-    )[:5]
+    metrics = {
+        "header": {
+            "generated": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "records": total_transactions
+        },
+        "summary": {
+            "total_revenue": total_revenue,
+            "transactions": total_transactions,
+            "avg_order_value": (
+                divide_paise(total_revenue, total_transactions) if total_transactions else 0
+            ),
+            "start_date": aggregate["start_date"],
+            "end_date": aggregate["end_date"],
+            "approximate": approximate
+        },
+        "regions": {"rows": region_rows},
+        "top_products": {
+            "rows": [
+                {"rank": i, "product": p, "qty": v["qty"], "revenue": v["revenue"]}
+                for i, (p, v) in enumerate(top_products, 1)
+            ]
+        },
+        "top_customers": {
+            "rows": [
+                {"rank": i, "customer": c, "spent": v["spent"], "orders": v["count"]}
+                for i, (c, v) in enumerate(top_customers, 1)
+            ]
+        },
+        "daily": {
+            "rows": [
+                {
+                    "date": d,
+                    "revenue": v["revenue"],
+                    "transactions": v["count"],
+                    "customers": len(v["customers"])
+                }
+                for d, v in daily_rows
+            ]
+        },
+        "performance": {
+            "best_date": best_day[0],
+            "best_revenue": best_day[1]["revenue"],
+            "threshold": low_threshold,
+            "rows": None if approximate else [
+                {"product": p, "qty": v["qty"]}
+                for p, v in product_data.items()
+                if v["qty"] < low_threshold
+            ]
+        },
+        "region_averages": {
+            "rows": [
+                {"region": r, "value": divide_paise(v["revenue"], v["count"])}
+                for r, v in region_data.items()
+            ]
+        },
+        "enrichment": enrichment
+    }
 
-    # ----------------------------
-    # DAILY SALES TREND
-    # ----------------------------
-    daily_data = defaultdict(lambda: {"revenue": 0, "count": 0, "customers": set()})
+    if customers is not None:
+        from utils.customer_analytics import customer_report_sections
 
-    for tx in transactions:
-        date = tx["Date"]
-        daily_data[date]["revenue"] += tx["Quantity"] * tx["UnitPrice"]
-        daily_data[date]["count"] += 1
-        daily_data[date]["customers"].add(tx["CustomerID"])
+        metrics["customer_segments"], metrics["cohorts"] = customer_report_sections(customers)
 
-    daily_rows = sorted(daily_data.items())
+    return metrics
 
-    # ----------------------------
-    # PRODUCT PERFORMANCE ANALYSIS
-    # ----------------------------
-    best_day = max(daily_rows, key=lambda x: x[1]["revenue"])
 
-    low_products = [
-        (p, v["qty"])
-        for p, v in product_data.items()
-        if v["qty"] < 10
-    ]
+@instrument
+def generate_sales_report(transactions, enriched_transactions, output_file='output/sales_report.txt',
+                          aggregate=None, enrichment=None, file_format="text", renderer=None,
+                          customer_analytics=False):
+    """
+    Generates a comprehensive formatted sales report
+    Pass a prebuilt aggregate and enrichment summary to reuse what was computed
+    during analysis; transactions and enriched_transactions are then not scanned.
+    file_format: "text", "json", "csv" or "html"
+    renderer: ReportRenderer whose section cache should be reused (e.g. one
+              with a cache_file); defaults to a renderer shared by this process
+    customer_analytics: add the RFM segment and cohort sections, computed from
+                        transactions when it is a TransactionTable, else from
+                        the aggregate
+    """
 
-    avg_region_value = {
-        r: region_data[r]["revenue"] / region_data[r]["count"]
-        for r in region_data
-    }
+    aggregate = _as_aggregate(aggregate if aggregate is not None else transactions)
 
-    # ----------------------------
-    # API ENRICHMENT SUMMARY
-    # ----------------------------
-    enriched_count = sum(1 for tx in enriched_transactions if tx.get("API_Match"))
-    enrichment_rate = (enriched_count / len(enriched_transactions)) * 100 if enriched_transactions else 0
+    if enrichment is None and enriched_transactions is not None:
+        enrichment = update_enrichment_summary(new_enrichment_summary(), enriched_transactions)
 
-    failed_products = {
-        tx["ProductName"]
-        for tx in enriched_transactions
-        if not tx.get("API_Match")
-    }
+    customers = None
+    if customer_analytics:
+        customers = transactions if hasattr(transactions, "codes_in_order") else aggregate
 
-    # ----------------------------
-    # WRITE REPORT
-    # ----------------------------
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write("=" * 44 + "\n")
-        f.write("       SALES ANALYTICS REPORT\n")
-        f.write(f"     Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        f.write(f"     Records Processed: {total_transactions}\n")
-        f.write("=" * 44 + "\n\n")
-
-        f.write("OVERALL SUMMARY\n")
-        f.write("-" * 44 + "\n")
-        f.write(f"Total Revenue:        ₹{total_revenue:,.2f}\n")
-        f.write(f"Total Transactions:   {total_transactions}\n")
-        f.write(f"Average Order Value:  ₹{avg_order_value:,.2f}\n")
-        f.write(f"Date Range:           {start_date} to {end_date}\n\n")
-
-        f.write("REGION-WISE PERFORMANCE\n")
-        f.write("-" * 44 + "\n")
-        f.write(f"{'Region':<10}{'Sales':>12}{'% Total':>10}{'Txns':>8}\n")
-        for r, rev, pct, cnt in region_rows:
-            f.write(f"{r:<10}₹{rev:>10,.0f}{pct:>9.2f}%{cnt:>8}\n")
-        f.write("\n")
-
-        f.write("TOP 5 PRODUCTS\n")
-        f.write("-" * 44 + "\n")
-        f.write(f"{'Rank':<6}{'Product':<20}{'Qty':>6}{'Revenue':>12}\n")
-        for i, (p, v) in enumerate(top_products, 1):
-            f.write(f"{i:<6}{p:<20}{v['qty']:>6}₹{v['revenue']:>10,.0f}\n")
-        f.write("\n")
-
-        f.write("TOP 5 CUSTOMERS\n")
-        f.write("-" * 44 + "\n")
-        f.write(f"{'Rank':<6}{'Customer':<10}{'Spent':>14}{'Orders':>10}\n")
-        for i, (c, v) in enumerate(top_customers, 1):
-            f.write(f"{i:<6}{c:<10}₹{v['spent']:>12,.0f}{v['count']:>10}\n")
-        f.write("\n")
-
-        f.write("DAILY SALES TREND\n")
-        f.write("-" * 44 + "\n")
-        f.write(f"{'Date':<12}{'Revenue':>12}{'Txns':>8}{'Customers':>12}\n")
-        for d, v in daily_rows:
-            f.write(f"{d:<12}₹{v['revenue']:>10,.0f}{v['count']:>8}{len(v['customers']):>12}\n")
-        f.write("\n")
-
-        f.write("PRODUCT PERFORMANCE ANALYSIS\n")
-        f.write("-" * 44 + "\n")
-        f.write(f"Best Selling Day: {best_day[0]} (₹{best_day[1]['revenue']:,.0f})\n")
-        f.write("Low Performing Products (<10 units):\n")
-        for p, q in low_products:
-            f.write(f" - {p} ({q})\n")
-        f.write("\nAverage Transaction Value per Region:\n")
-        for r, v in avg_region_value.items():
-            f.write(f" - {r}: ₹{v:,.2f}\n")
-        f.write("\n")
-
-        f.write("API ENRICHMENT SUMMARY\n")
-        f.write("-" * 44 + "\n")
-        f.write(f"Total Products Enriched: {enriched_count}\n")
-        f.write(f"Success Rate: {enrichment_rate:.2f}%\n")
-        if failed_products:
-            f.write("Products not enriched:\n")
-            for p in failed_products:
-                f.write(f" - {p}\n")
-        else:
-            f.write("All products enriched successfully\n")
+    metrics = build_report_metrics(aggregate, enrichment, customers=customers)
+    if renderer is None:
+        global _REPORT_RENDERER
+        if _REPORT_RENDERER is None:
+            from utils.report import ReportRenderer
+
+            _REPORT_RENDERER = ReportRenderer()
+        renderer = _REPORT_RENDERER
+    renderer.write(metrics, output_file, file_format)
 
     print(f"Sales report generated at {output_file}")
@@ -0,0 +1,278 @@
+# =========================================================
+# TRANSACTION ID DEDUPLICATION
+# File: utils/dedup.py
+# =========================================================
+# Upstream exports overlap, so the same TransactionID can arrive in several
+# files or runs. TransactionIDIndex remembers every ID it has accepted:
+#
+#   BloomFilter  – fixed-size bit array in memory; "definitely new" for most
+#                  IDs without touching disk.
+#   SQLite table – exact set of accepted IDs on disk, only queried when the
+#                  Bloom filter reports a possible repeat (a real duplicate
+#                  or a false positive).
+#
+# Memory stays bounded by the Bloom filter size (about 1.2 bytes per ID of
+# capacity at a 1% false-positive rate) no matter how many IDs are stored;
+# beyond capacity only the false-positive rate, i.e. the number of disk
+# lookups, grows. A filter saved with another capacity is rebuilt at this
+# one. With a path, the index persists across runs: the IDs a run adds are
+# committed by close() in one transaction, so a run that fails part-way
+# leaves the index as it was.
+#
+#   index = TransactionIDIndex("output/transaction_ids.db")
+#   unique = iter_deduplicate(valid, index)
+#   ...
+#   index.close()
+
+import math
+import zlib
+
+from utils.data_processor import iter_chunks
+
+DEFAULT_CAPACITY = 10_000_000
+DEFAULT_ERROR_RATE = 0.01
+INSERT_BATCH = 10000
+SECOND_SEED = 0x9E3779B9
+
+
+def bloom_hashes(txn_id):
+    """
+    Returns: the two 32-bit hashes (h1, h2) that place an ID in the Bloom
+    filter. CRC32 is stable across runs and cheap, which is all a Bloom
+    filter needs; h2 is odd so every probe step is distinct.
+    """
+    data = txn_id.encode("utf-8")
+    return zlib.crc32(data), zlib.crc32(data, SECOND_SEED) | 1
+
+
+class BloomFilter:
+    """
+    Bloom filter sized for capacity items at error_rate. Probe i of an item
+    is bit (h1 + i * h2) % size (double hashing).
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, error_rate=DEFAULT_ERROR_RATE):
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def add(self, h1, h2):
+        """
+        Sets the bits of one item.
+        Returns: True if they were all set already (it may have been added before)
+        """
+        bits = self.bits
+        present = True
+        for i in range(self.hashes):
+            pos = (h1 + i * h2) % self.size
+            byte, mask = pos >> 3, 1 << (pos & 7)
+            if not bits[byte] & mask:
+                present = False
+                bits[byte] |= mask
+        return present
+
+    def add_many(self, h1, h2):
+        """
+        Vectorized add() over NumPy arrays of hashes. Every item is tested
+        against the bits as they were before the batch.
+        Returns: boolean array, True where all bits were already set
+        """
+        import numpy as np
+
+        probes = np.arange(self.hashes, dtype=np.int64)
+        positions = (h1[:, None] + probes * h2[:, None]) % self.size
+        index = positions >> 3
+        masks = (1 << (positions & 7)).astype(np.uint8)
+
+        bits = np.frombuffer(self.bits, dtype=np.uint8)
+        present = ((bits[index] & masks) != 0).all(axis=1)
+        np.bitwise_or.at(bits, index.ravel(), masks.ravel())
+        return present
+
+
+class TransactionIDIndex:
+    """
+    Exact set of accepted TransactionIDs: a Bloom filter in memory in front
+    of a SQLite table (in memory when path is None).
+
+    Counters (per instance):
+      checked          – IDs looked up
+      duplicates       – IDs rejected as already seen
+      disk_lookups     – Bloom positives that needed an exact lookup
+    """
+
+    def __init__(self, path=None, capacity=DEFAULT_CAPACITY, error_rate=DEFAULT_ERROR_RATE):
+        import sqlite3
+
+        self.path = path
+        self.db = sqlite3.connect(path or ":memory:")
+        if path:
+            # The index is re-derivable from the inputs; skip fsyncs
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS seen_ids (id TEXT PRIMARY KEY) WITHOUT ROWID"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS bloom (ids INTEGER, size INTEGER, hashes INTEGER, bits BLOB)"
+        )
+
+        self.pending = set()
+        self.checked = 0
+        self.duplicates = 0
+        self.disk_lookups = 0
+        self.stored = self.db.execute("SELECT COUNT(*) FROM seen_ids").fetchone()[0]
+
+        # Sized for capacity, never for the stored count, so memory stays
+        # fixed; past capacity only the false-positive rate grows
+        self.bloom = BloomFilter(capacity, error_rate)
+        row = self.db.execute("SELECT ids, size, hashes, bits FROM bloom").fetchone()
+        geometry = (self.bloom.size, self.bloom.hashes)
+        if row is not None and row[0] == self.stored and tuple(row[1:3]) == geometry:
+            # The saved filter covers every stored ID (a count mismatch means
+            # the table changed without it) and has this capacity's geometry
+            self.bloom.bits = bytearray(row[3])
+        elif self.stored:
+            self._rebuild_bloom()
+
+    def _rebuild_bloom(self):
+        # Streams the table through a cursor; only the filter is kept
+        for (txn_id,) in self.db.execute("SELECT id FROM seen_ids"):
+            self.bloom.add(*bloom_hashes(txn_id))
+
+    def _stored(self, txn_id):
+        self.disk_lookups += 1
+        return self.db.execute(
+            "SELECT 1 FROM seen_ids WHERE id = ?", (txn_id,)
+        ).fetchone() is not None
+
+    def add(self, txn_id):
+        """
+        Records one txn_id.
+        Returns: True if it had not been seen before, False for a duplicate
+        """
+        self.checked += 1
+
+        if txn_id in self.pending or (self.bloom.add(*bloom_hashes(txn_id)) and self._stored(txn_id)):
+            self.duplicates += 1
+            return False
+
+        self.pending.add(txn_id)
+        if len(self.pending) >= INSERT_BATCH:
+            self.flush()
+        return True
+
+    def add_many(self, txn_ids):
+        """
+        Records a batch of IDs with one vectorized Bloom filter pass.
+        Only Bloom positives are looked up exactly; repeats inside the batch
+        are caught by the pending set.
+        Returns: list of bools, True where the ID had not been seen before
+        """
+        import numpy as np
+
+        txn_ids = list(txn_ids)
+        if not txn_ids:
+            return []
+        self.checked += len(txn_ids)
+
+        hashes = np.array([bloom_hashes(txn_id) for txn_id in txn_ids], dtype=np.int64)
+        maybe_seen = self.bloom.add_many(hashes[:, 0], hashes[:, 1]).tolist()
+
+        pending = self.pending
+        accepted = []
+        for txn_id, maybe in zip(txn_ids, maybe_seen):
+            if txn_id in pending or (maybe and self._stored(txn_id)):
+                self.duplicates += 1
+                accepted.append(False)
+            else:
+                pending.add(txn_id)
+                accepted.append(True)
+
+        # Flush between batches only: an ID flushed mid-batch would escape
+        # the pending check while its Bloom test predates the batch
+        if len(pending) >= INSERT_BATCH:
+            self.flush()
+        return accepted
+
+    def flush(self):
+        """
+        Writes pending IDs to the table in one batch. They stay in the open
+        transaction (visible to this index's lookups) until close() commits.
+        """
+        if self.pending:
+            self.db.executemany(
+                "INSERT OR IGNORE INTO seen_ids (id) VALUES (?)",
+                ((txn_id,) for txn_id in self.pending)
+            )
+            self.stored += len(self.pending)
+            self.pending = set()
+
+    def __len__(self):
+        return self.stored + len(self.pending)
+
+    def __contains__(self, txn_id):
+        if txn_id in self.pending:
+            return True
+        h1, h2 = bloom_hashes(txn_id)
+        bits, size = self.bloom.bits, self.bloom.size
+        for i in range(self.bloom.hashes):
+            pos = (h1 + i * h2) % size
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return self._stored(txn_id)
+
+    def close(self, commit=True):
+        """
+        Flushes pending IDs and commits them with the Bloom filter, so the
+        next run does not rebuild it from the table. With commit=False (a
+        failed run) every ID added since opening is rolled back instead.
+        """
+        if not commit:
+            self.db.rollback()
+            self.db.close()
+            return
+
+        self.flush()
+        if self.path:
+            self.db.execute("DELETE FROM bloom")
+            self.db.execute(
+                "INSERT INTO bloom (ids, size, hashes, bits) VALUES (?, ?, ?, ?)",
+                (self.stored, self.bloom.size, self.bloom.hashes, bytes(self.bloom.bits))
+            )
+        self.db.commit()
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.close(commit=exc_type is None)
+
+
+def iter_deduplicate(transactions, index, batch_size=INSERT_BATCH):
+    """
+    Lazily drops transactions whose TransactionID the index has already
+    accepted (earlier in this input, in another file, or in an earlier run
+    sharing the index). IDs are checked a batch at a time; duplicates are
+    counted in index.duplicates.
+    """
+    for chunk in iter_chunks(transactions, batch_size):
+        accepted = index.add_many(tx["TransactionID"] for tx in chunk)
+        for tx, new in zip(chunk, accepted):
+            if new:
+                yield tx
+
+
+def deduplicate_mask(txn_ids, index, batch_size=INSERT_BATCH):
+    """
+    Column counterpart of iter_deduplicate, for TransactionTable.take():
+    runs the IDs through the index in the same batches.
+    Returns: boolean NumPy array, True where the ID had not been seen before
+    """
+    import numpy as np
+
+    accepted = []
+    for chunk in iter_chunks(txn_ids, batch_size):
+        accepted.extend(index.add_many(chunk))
+    return np.array(accepted, dtype=bool)
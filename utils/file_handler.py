@@ -1,22 +1,491 @@
+import glob
+import io
+import mmap
+import os
+
+from utils.metrics import instrument
+
+ENCODINGS = ["utf-8", "latin-1", "cp1252"]
+SAMPLE_SIZE = 64 * 1024
+
+# Magic bytes -> compression; inputs are recognised by content, not by name
+COMPRESSION_MAGIC = {
+    b"\x1f\x8b": "gzip",
+    b"BZh": "bz2",
+    b"\xfd7zXZ\x00": "xz",
+    b"\x28\xb5\x2f\xfd": "zstd"
+}
+COMPRESSED_SUFFIXES = (".gz", ".bz2", ".xz", ".zst")
+READ_BLOCK = 1024 * 1024
+
+
+@instrument
 def read_sales_data(filename):
     """
     Reads sales data from file handling encoding issues.
+    The encoding is detected once from a sample; lines that still fail to
+    decode fall back individually instead of re-reading the whole file.
     Returns: list of raw lines (strings)
     """
-    encodings = ["utf-8", "latin-1", "cp1252"]
     lines = []
+    for block in _iter_decoded_blocks(filename):
+        lines.extend(block)
+    return lines
+
+
+def read_sales_bytes(filename):
+    """
+    Reads a whole sales file, decompressed but not decoded, for parsers
+    that work on the buffer at once (columnar.TransactionTable.from_bytes).
+    Returns: bytes
+    """
+    compression = detect_compression(filename)
+    try:
+        f = open(filename, "rb")
+    except FileNotFoundError:
+        raise FileNotFoundError(f"File not found: {filename}")
+    with f:
+        if compression is None:
+            return f.read()
+        with open_decompressed(f, compression) as stream:
+            return stream.read()
+
+
+def expand_inputs(patterns, directory_pattern="*.txt"):
+    """
+    Expands input arguments into a sorted, de-duplicated list of files.
+    Each argument may be a file, a glob pattern or a directory (whose files
+    matching directory_pattern, plain or compressed, are taken).
+    """
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = [
+                match
+                for suffix in ("",) + COMPRESSED_SUFFIXES
+                for match in glob.glob(os.path.join(pattern, directory_pattern + suffix))
+            ]
+        elif glob.has_magic(pattern):
+            matches = glob.glob(pattern)
+        else:
+            matches = [pattern]
+        files.extend(sorted(m for m in matches if not os.path.isdir(m)))
+
+    seen = set()
+    unique = []
+    for f in files:
+        if f not in seen:
+            seen.add(f)
+            unique.append(f)
+    return unique
 
-    for enc in encodings:
+
+# ---------------------------------------------------------
+# ENCODING DETECTION
+# ---------------------------------------------------------
+def detect_encoding(sample):
+    """
+    Picks the first encoding in ENCODINGS that decodes a byte sample.
+    A multi-byte character cut off at the end of the sample is ignored.
+    """
+    cut = sample.rfind(b"\n")
+    if cut != -1:
+        sample = sample[:cut]
+
+    for enc in ENCODINGS:
+        try:
+            sample.decode(enc)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    return ENCODINGS[-1]
+
+
+def detect_file_encoding(filename):
+    compression = detect_compression(filename)
+    with open(filename, "rb") as f:
+        if compression is None:
+            return detect_encoding(f.read(SAMPLE_SIZE))
+        with open_decompressed(f, compression) as stream:
+            return detect_encoding(stream.read(SAMPLE_SIZE))
+
+
+def decode_field(raw_line, encoding):
+    """
+    Decodes one raw line (or field) with the detected encoding, falling back
+    through ENCODINGS for the rare value that does not fit it.
+    """
+    try:
+        return raw_line.decode(encoding)
+    except UnicodeDecodeError:
+        pass
+    for enc in ENCODINGS:
         try:
-            with open(filename, "r", encoding=enc) as file:
-                for line in file:
+            return raw_line.decode(enc)
+        except UnicodeDecodeError:
+            continue
+    return raw_line.decode(ENCODINGS[-1], errors="replace")
+
+
+# ---------------------------------------------------------
+# COMPRESSED INPUT
+# ---------------------------------------------------------
+# gzip, bzip2 and xz archives are decompressed as a stream straight into the
+# line reader (standard library); zstd needs the optional zstandard package.
+# BGZF gzip files (bgzip) and zstd files made of several frames (pzstd) can
+# be cut at block / frame boundaries, so parallel workers each decompress
+# their own part. Other archives are read by one worker from start to end.
+def detect_compression(filename):
+    """
+    Returns: "gzip", "bz2", "xz", "zstd", or None for an uncompressed file
+    """
+    try:
+        with open(filename, "rb") as f:
+            head = f.read(6)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"File not found: {filename}")
+
+    for magic, compression in COMPRESSION_MAGIC.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+class _ByteRange(io.RawIOBase):
+    """
+    Read-only view of bytes [start, end) of an open binary file, so a
+    decompressor stops at the end of a range.
+    """
+
+    def __init__(self, f, start=0, end=None):
+        super().__init__()
+        f.seek(start)
+        self.f = f
+        self.remaining = None if end is None else max(0, end - start)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = len(buffer) if self.remaining is None else min(len(buffer), self.remaining)
+        data = self.f.read(size)
+        buffer[:len(data)] = data
+        if self.remaining is not None:
+            self.remaining -= len(data)
+        return len(data)
+
+
+def open_decompressed(f, compression):
+    """
+    Returns: a binary stream of the decompressed contents of file object f,
+    read across concatenated members / streams / frames
+    """
+    if compression == "gzip":
+        import gzip
+
+        return gzip.GzipFile(fileobj=f, mode="rb")
+    if compression == "bz2":
+        import bz2
+
+        return bz2.BZ2File(f, "rb")
+    if compression == "xz":
+        import lzma
+
+        return lzma.LZMAFile(f, "rb")
+
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("zstandard is required for .zst input: pip install zstandard")
+    return zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True)
+
+
+def _bgzf_blocks(mm):
+    """
+    Returns: start offsets of the BGZF blocks of a gzip file, or None when it
+    is not BGZF. Every block header records the block size, so no data is
+    decompressed.
+    """
+    starts = []
+    position = 0
+    while position < len(mm):
+        header = mm[position:position + 12]
+        if header[:4] != b"\x1f\x8b\x08\x04":
+            return None
+        extra_end = position + 12 + int.from_bytes(header[10:12], "little")
+        field = position + 12
+        block_size = None
+        while field + 4 <= extra_end:
+            length = int.from_bytes(mm[field + 2:field + 4], "little")
+            if mm[field:field + 2] == b"BC" and length == 2:
+                block_size = int.from_bytes(mm[field + 4:field + 6], "little") + 1
+            field += 4 + length
+        if block_size is None:
+            return None
+        starts.append(position)
+        position += block_size
+    return starts
+
+
+def _zstd_frames(mm):
+    """
+    Returns: start offsets of the frames of a zstd file, found by walking the
+    frame and block headers, or None if the file cannot be walked.
+    """
+    starts = []
+    position = 0
+    size = len(mm)
+    while position < size:
+        magic = int.from_bytes(mm[position:position + 4], "little")
+        if magic & 0xFFFFFFF0 == 0x184D2A50:  # skippable frame
+            position += 8 + int.from_bytes(mm[position + 4:position + 8], "little")
+            continue
+        if magic != 0xFD2FB528 or position + 5 > size:
+            return None
+
+        starts.append(position)
+        descriptor = mm[position + 4]
+        single_segment = descriptor >> 5 & 1
+        content_size_bytes = (1 if single_segment else 0, 2, 4, 8)[descriptor >> 6]
+        position += (
+            5 + (not single_segment) + (0, 1, 2, 4)[descriptor & 3] + content_size_bytes
+        )
+
+        last = False
+        while not last:
+            if position + 3 > size:
+                return None
+            header = int.from_bytes(mm[position:position + 3], "little")
+            last = header & 1
+            block_type = header >> 1 & 3
+            position += 3 + (1 if block_type == 1 else header >> 3)
+        if descriptor >> 2 & 1:  # content checksum
+            position += 4
+    return starts
+
+
+def _compressed_ranges(filename, compression, parts):
+    """
+    Groups the independently decompressible blocks / frames of a file into
+    at most `parts` byte ranges of similar compressed size.
+    Returns: list of (start, end) byte offsets
+    """
+    f, mm = _open_mmap(filename)
+    with f:
+        if mm is None:
+            return []
+        with mm:
+            size = len(mm)
+            starts = None
+            if compression == "gzip":
+                starts = _bgzf_blocks(mm)
+            elif compression == "zstd":
+                starts = _zstd_frames(mm)
+
+    if not starts or parts <= 1:
+        return [(0, size)]
+
+    step = max(1, size // parts)
+    cuts = [0]
+    for start in starts:
+        if start >= cuts[-1] + step:
+            cuts.append(start)
+    return list(zip(cuts, cuts[1:] + [size]))
+
+
+def _iter_decompressed_lines(filename, compression, start=0, end=None):
+    """
+    Streams stripped, non-empty lines (bytes) of a compressed byte range.
+    Ranges start at block boundaries, not at line boundaries, so a line is
+    owned by the range it starts in: each range after the first skips the
+    line it opens with, and every range reads on past its end to the next
+    newline.
+    """
+    with open(filename, "rb") as f:
+        with open_decompressed(_ByteRange(f, start, end), compression) as stream:
+            blocks = iter(lambda: stream.read(READ_BLOCK), b"")
+            pending = b""
+
+            if start > 0:
+                for block in blocks:
+                    newline = block.find(b"\n")
+                    if newline != -1:
+                        pending = block[newline + 1:]
+                        break
+                else:
+                    # The range holds no line start: the whole range belongs
+                    # to a line owned by an earlier range
+                    return
+
+            for block in blocks:
+                lines = (pending + block).split(b"\n")
+                pending = lines.pop()
+                for line in lines:
                     line = line.strip()
                     if line:
-                        lines.append(line)
-            break
+                        yield line
+
+        if end is not None and end < os.fstat(f.fileno()).st_size:
+            with open_decompressed(_ByteRange(f, end), compression) as stream:
+                for block in iter(lambda: stream.read(SAMPLE_SIZE), b""):
+                    newline = block.find(b"\n")
+                    pending += block if newline == -1 else block[:newline + 1]
+                    if newline != -1:
+                        break
+
+    for line in pending.split(b"\n"):
+        line = line.strip()
+        if line:
+            yield line
+
+
+# ---------------------------------------------------------
+# MEMORY-MAPPED ACCESS
+# ---------------------------------------------------------
+def _open_mmap(filename):
+    """
+    Memory-maps a file read-only.
+    Returns: (file object, mmap) or (file object, None) for an empty file
+    """
+    try:
+        f = open(filename, "rb")
+    except FileNotFoundError:
+        raise FileNotFoundError(f"File not found: {filename}")
+
+    if os.fstat(f.fileno()).st_size == 0:
+        return f, None
+    return f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def line_aligned_ranges(filename, parts):
+    """
+    Splits a file into at most `parts` byte ranges whose boundaries fall
+    just after a newline, so each range holds whole lines only. Compressed
+    files are split at block / frame boundaries instead (see
+    _compressed_ranges); iter_raw_lines completes the lines that cross them.
+    Returns: list of (start, end) byte offsets
+    """
+    compression = detect_compression(filename)
+    if compression is not None:
+        return _compressed_ranges(filename, compression, parts)
+
+    f, mm = _open_mmap(filename)
+    with f:
+        if mm is None:
+            return []
+
+        with mm:
+            size = len(mm)
+            step = max(1, size // max(1, parts))
+            ranges = []
+            start = 0
+
+            while start < size:
+                end = start + step
+                if end < size:
+                    newline = mm.find(b"\n", end - 1)
+                    end = size if newline == -1 else newline + 1
+                else:
+                    end = size
+                ranges.append((start, end))
+                start = end
+
+    return ranges
+
+
+def iter_raw_lines(filename, start=0, end=None):
+    """
+    Streams stripped, non-empty raw lines (bytes) from a byte range of a
+    memory-mapped file, or of a compressed file, decompressed on the fly.
+    Nothing is decoded here.
+    """
+    compression = detect_compression(filename)
+    if compression is not None:
+        yield from _iter_decompressed_lines(filename, compression, start, end)
+        return
+
+    f, mm = _open_mmap(filename)
+    with f:
+        if mm is None:
+            return
+
+        with mm:
+            end = len(mm) if end is None else min(end, len(mm))
+            position = start
+            find = mm.find
+
+            while position < end:
+                newline = find(b"\n", position, end)
+                if newline == -1:
+                    newline = end
+                line = mm[position:newline].strip()
+                position = newline + 1
+                if line:
+                    yield line
+
+
+def iter_sales_records(filename, start=0, end=None):
+    """
+    Streams records as lists of raw field bytes split on "|", straight from a
+    memory-mapped file. Numeric fields can be converted without decoding.
+    """
+    for line in iter_raw_lines(filename, start, end):
+        yield line.split(b"|")
+
+
+def iter_sales_data(filename):
+    """
+    Streams sales data lines from file without loading the whole file.
+    The encoding is detected once from a sample; a line that does not decode
+    falls back on its own, so a bad byte late in the file never forces a re-read.
+    Yields: stripped, non-empty raw lines (strings)
+    """
+    for block in _iter_decoded_blocks(filename):
+        yield from block
+
+
+# ---------------------------------------------------------
+# BUFFERED TEXT ACCESS
+# ---------------------------------------------------------
+# The line APIs above read READ_BLOCK-sized blocks through a buffered (or
+# decompressing) stream and decode each block in one call, so splitting and
+# stripping stay in C like the text-mode reader they replace. The mmap
+# readers below serve the byte-range and worker paths instead.
+def _iter_line_blocks(filename):
+    """
+    Streams the decompressed contents of a file in blocks that end just
+    after a newline (the last block excepted).
+    """
+    compression = detect_compression(filename)
+    with open(filename, "rb") as f:
+        stream = f if compression is None else open_decompressed(f, compression)
+        with stream:
+            pending = b""
+            for block in iter(lambda: stream.read(READ_BLOCK), b""):
+                cut = block.rfind(b"\n")
+                if cut == -1:
+                    pending += block
+                    continue
+                yield pending + block[:cut + 1]
+                pending = block[cut + 1:]
+            if pending:
+                yield pending
+
+
+def _iter_decoded_blocks(filename):
+    """
+    Decodes whole blocks with the encoding detected from the first one; a
+    block that does not decode falls back line by line (decode_field).
+    Yields: lists of stripped, non-empty lines (strings)
+    """
+    encoding = None
+    for block in _iter_line_blocks(filename):
+        if encoding is None:
+            encoding = detect_encoding(block[:SAMPLE_SIZE])
+        try:
+            text = block.decode(encoding)
         except UnicodeDecodeError:
+            lines = (line.strip() for line in block.split(b"\n"))
+            yield [decode_field(line, encoding) for line in lines if line]
             continue
-        except FileNotFoundError:
-            raise FileNotFoundError(f"File not found: {filename}")
-
-    return lines
+        yield list(filter(None, map(str.strip, text.split("\n"))))
@@ -0,0 +1,197 @@
+# =========================================================
+# INCREMENTAL PROCESSING
+# File: utils/incremental.py
+# =========================================================
+# Aggregate state (region, product, customer and daily totals plus customer
+# sets) is persisted together with the byte offset already processed. Later
+# runs fold in only the rows appended since, so the cost of a run is
+# proportional to the new data rather than the whole file.
+
+import os
+
+from utils.file_handler import detect_compression
+from utils.data_processor import (
+    iter_file_transactions,
+    iter_validate_and_filter,
+    iter_chunks,
+    new_validation_summary,
+    new_sales_aggregate,
+    update_sales_aggregate,
+    new_enrichment_summary,
+    update_enrichment_summary
+)
+
+STATE_FILE = "output/aggregate_state.pkl"
+STATE_VERSION = 3  # 2: money in integer paise, 3: enriched output size
+HEAD_BYTES = 4096
+CHUNK_SIZE = 10000
+
+
+def _head_digest(filename, length):
+    """
+    Fingerprints the first bytes of a file so a rewritten (rather than
+    appended) input is detected and triggers a full rebuild.
+    """
+    import hashlib
+
+    with open(filename, "rb") as f:
+        return hashlib.sha1(f.read(length)).hexdigest()
+
+
+def _complete_end(filename):
+    """
+    Returns the offset just past the last newline; an unterminated final line
+    may still be being written and is left for the next run.
+    """
+    size = os.path.getsize(filename)
+    with open(filename, "rb") as f:
+        position = size
+        while position > 0:
+            step = min(HEAD_BYTES, position)
+            f.seek(position - step)
+            block = f.read(step)
+            newline = block.rfind(b"\n")
+            if newline != -1:
+                return position - step + newline + 1
+            position -= step
+    return 0
+
+
+def load_state(state_file):
+    import pickle
+
+    if not os.path.exists(state_file):
+        return None
+    try:
+        with open(state_file, "rb") as f:
+            state = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+    if state.get("version") != STATE_VERSION:
+        return None
+    return state
+
+
+def save_state(state, state_file):
+    import pickle
+
+    directory = os.path.dirname(state_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_file = state_file + ".tmp"
+    with open(tmp_file, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, state_file)
+
+
+def _enriched_output(enriched_file):
+    """
+    Returns: (absolute path, size or None when missing) of the enriched output
+    """
+    path = os.path.abspath(enriched_file)
+    return path, os.path.getsize(path) if os.path.exists(path) else None
+
+
+def _state_matches(state, filename, filters, enriched_file=None):
+    if state is None:
+        return False
+    if state["source"] != os.path.abspath(filename) or state["filters"] != filters:
+        return False
+    if os.path.getsize(filename) < state["offset"]:
+        return False
+    # Appending to a deleted, truncated or different enriched file would
+    # leave it silently missing the rows of earlier runs
+    if enriched_file and state["enriched_output"] != _enriched_output(enriched_file):
+        return False
+    length = min(state["offset"], HEAD_BYTES)
+    return _head_digest(filename, length) == state["head_digest"]
+
+
+def incremental_pipeline(filename, state_file=STATE_FILE, region=None, min_amount=None,
+                         max_amount=None, product_mapping=None, enriched_file=None,
+                         approximate=None, dedup=None, rejects=None):
+    """
+    Folds rows appended to filename since the last run into the saved state.
+    A missing or mismatched state (other file, filters, enrichment on/off,
+    approximation settings, a rewritten input, or an enriched_file that is
+    missing or not the size the last run left) triggers a full rebuild.
+    New enriched rows are appended to enriched_file. With a dedup
+    TransactionIDIndex, repeated TransactionIDs are dropped. A rebuild with a
+    persistent index that already holds IDs raises ValueError, since the
+    index would drop every row the lost state had counted.
+    Rows of this run dropped by the parser are counted into rejects.
+    Returns: (aggregate, validation summary, enrichment summary or None,
+              new row count)
+    """
+    if detect_compression(filename) is not None:
+        # Offsets are positions in the file; appended rows cannot be located in an archive
+        raise ValueError(f"Incremental mode needs an uncompressed input: {filename}")
+
+    enrich = product_mapping is not None and bool(enriched_file)
+    filters = (region, min_amount, max_amount, enrich, approximate or None)
+    state = load_state(state_file)
+
+    if not _state_matches(state, filename, filters, enriched_file if enrich else None):
+        if dedup is not None and dedup.path and len(dedup):
+            raise ValueError(
+                f"Incremental state for {filename} must be rebuilt, but the dedup "
+                f"index {dedup.path} already holds {len(dedup):,} IDs; delete it or "
+                f"use an in-memory index"
+            )
+        state = {
+            "version": STATE_VERSION,
+            "source": os.path.abspath(filename),
+            "filters": filters,
+            "offset": 0,
+            "head_digest": None,
+            "enriched_output": None,
+            "aggregate": new_sales_aggregate(approximate),
+            "summary": new_validation_summary(),
+            "enrichment": new_enrichment_summary()
+        }
+
+    start = state["offset"]
+    end = _complete_end(filename)
+    seen_before = state["summary"]["total_input"]
+
+    if end > start:
+        out = None
+        if enrich:
+            from utils.api_handler import ENRICHED_HEADER, enrich_sales_data, write_enriched_rows
+
+            if start == 0:
+                out = open(enriched_file, "w", encoding="utf-8")
+                out.write("|".join(ENRICHED_HEADER) + "\n")
+            else:
+                out = open(enriched_file, "a", encoding="utf-8")
+
+        try:
+            parsed = iter_file_transactions(filename, start, end, rejects)
+            valid = iter_validate_and_filter(
+                parsed, region, min_amount, max_amount, state["summary"]
+            )
+            if dedup is not None:
+                from utils.dedup import iter_deduplicate
+
+                valid = iter_deduplicate(valid, dedup)
+            for chunk in iter_chunks(valid, CHUNK_SIZE):
+                update_sales_aggregate(state["aggregate"], chunk)
+                if out is not None:
+                    enriched = enrich_sales_data(chunk, product_mapping)
+                    update_enrichment_summary(state["enrichment"], enriched)
+                    write_enriched_rows(out, enriched)
+        finally:
+            if out is not None:
+                out.close()
+
+        state["offset"] = end
+        state["head_digest"] = _head_digest(filename, min(end, HEAD_BYTES))
+        if enrich:
+            state["enriched_output"] = _enriched_output(enriched_file)
+        save_state(state, state_file)
+
+    new_rows = state["summary"]["total_input"] - seen_before
+
+    enrichment = state["enrichment"] if enrich else None
+
+    return state["aggregate"], state["summary"], enrichment, new_rows
@@ -0,0 +1,242 @@
+# =========================================================
+# PIPELINE INSTRUMENTATION
+# File: utils/metrics.py
+# =========================================================
+# Records wall time, CPU time, rows/s, peak RSS and (optionally) the
+# tracemalloc peak of each pipeline stage and instrumented function, and
+# emits them as JSON or OpenMetrics text for the scheduler to alert on.
+#
+#   recorder = MetricsRecorder()
+#   with recorder.activate():
+#       with recorder.stage("read") as stage:
+#           raw = read_sales_data(...)
+#           stage.rows = len(raw)
+#   recorder.write_json("output/metrics.json")
+
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+_active = None
+
+
+def peak_rss_bytes():
+    """
+    Peak resident set size of this process, or None if unavailable.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+class StageRecord:
+    def __init__(self, name, kind, depth, rows=None):
+        self.name = name
+        self.kind = kind
+        self.depth = depth
+        self.rows = rows
+        self.status = "ok"
+        self.error = None
+        self.wall_seconds = None
+        self.cpu_seconds = None
+        self.peak_rss_bytes = None
+        self.tracemalloc_peak_bytes = None
+
+    def as_dict(self):
+        rows_per_second = None
+        if self.rows is not None and self.wall_seconds:
+            rows_per_second = round(self.rows / self.wall_seconds, 1)
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "depth": self.depth,
+            "status": self.status,
+            "error": self.error,
+            "rows": self.rows,
+            "wall_seconds": self.wall_seconds,
+            "cpu_seconds": self.cpu_seconds,
+            "rows_per_second": rows_per_second,
+            "peak_rss_bytes": self.peak_rss_bytes,
+            "tracemalloc_peak_bytes": self.tracemalloc_peak_bytes
+        }
+
+
+class MetricsRecorder:
+    """
+    Collects one StageRecord per pipeline stage or instrumented call.
+    With trace_memory=True, tracemalloc peaks are recorded for top-level stages.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.records = []
+        self.started = datetime.now().isoformat(timespec="seconds")
+        self._depth = 0
+        self._thread = None
+
+    @contextmanager
+    def activate(self):
+        """
+        Makes this recorder receive calls to @instrument-ed functions made
+        from the current thread (background threads are not recorded).
+        """
+        global _active
+        previous = _active
+        _active = self
+        self._thread = threading.get_ident()
+        if self.trace_memory:
+            import tracemalloc
+
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+        try:
+            yield self
+        finally:
+            _active = previous
+            if self.trace_memory and tracemalloc.is_tracing():
+                tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, name, rows=None, kind="stage"):
+        """
+        Times the enclosed block. Set .rows on the yielded record to report
+        throughput. Errors are recorded and re-raised.
+        """
+        record = StageRecord(name, kind, self._depth, rows)
+        self.records.append(record)
+
+        trace = self._depth == 0 and self.trace_memory
+        if trace:
+            import tracemalloc
+
+            trace = tracemalloc.is_tracing()
+            if trace:
+                tracemalloc.reset_peak()
+
+        self._depth += 1
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield record
+        except BaseException as e:
+            record.status = "error"
+            record.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            record.cpu_seconds = round(time.process_time() - cpu_start, 6)
+            record.wall_seconds = round(time.perf_counter() - wall_start, 6)
+            self._depth -= 1
+            record.peak_rss_bytes = peak_rss_bytes()
+            if trace:
+                record.tracemalloc_peak_bytes = tracemalloc.get_traced_memory()[1]
+
+    def failed_stage(self):
+        """
+        Returns the innermost stage that raised, if any.
+        """
+        failed = [r for r in self.records if r.status == "error"]
+        return max(failed, key=lambda r: r.depth).name if failed else None
+
+    # ---------------------------------------------------------
+    # Output
+    # ---------------------------------------------------------
+    def as_dict(self):
+        return {
+            "started": self.started,
+            "peak_rss_bytes": peak_rss_bytes(),
+            "stages": [r.as_dict() for r in self.records]
+        }
+
+    def write_json(self, filename):
+        _ensure_dir(filename)
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+    def to_openmetrics(self):
+        """
+        Renders stage metrics in the OpenMetrics text exposition format.
+        """
+        series = [
+            ("sales_stage_wall_seconds", "gauge", "Wall time of a pipeline stage", "wall_seconds"),
+            ("sales_stage_cpu_seconds", "gauge", "CPU time of a pipeline stage", "cpu_seconds"),
+            ("sales_stage_rows", "gauge", "Rows processed by a pipeline stage", "rows"),
+            ("sales_stage_rows_per_second", "gauge", "Throughput of a pipeline stage",
+             "rows_per_second"),
+            ("sales_stage_peak_rss_bytes", "gauge", "Process peak RSS after a pipeline stage",
+             "peak_rss_bytes"),
+            ("sales_stage_tracemalloc_peak_bytes", "gauge",
+             "Python heap peak during a pipeline stage", "tracemalloc_peak_bytes")
+        ]
+        stages = [r.as_dict() for r in self.records]
+
+        lines = []
+        for metric, metric_type, help_text, key in series:
+            lines.append(f"# TYPE {metric} {metric_type}")
+            lines.append(f"# HELP {metric} {help_text}")
+            for seq, s in enumerate(stages):
+                if s[key] is None:
+                    continue
+                labels = (
+                    f'stage="{_escape(s["name"])}",kind="{s["kind"]}",'
+                    f'status="{s["status"]}",seq="{seq}"'
+                )
+                lines.append(f"{metric}{{{labels}}} {s[key]}")
+        lines.append("# EOF")
+
+        return "\n".join(lines) + "\n"
+
+    def write_openmetrics(self, filename):
+        _ensure_dir(filename)
+        with open(filename, "w", encoding="utf-8") as f:
+            f.write(self.to_openmetrics())
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _ensure_dir(filename):
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+
+def instrument(func):
+    """
+    Decorator recording each call of func into the active MetricsRecorder.
+    The row count is the length of the first argument when it is a
+    collection (or the transaction count of a sales aggregate).
+    Costs a single global lookup when no recorder is active.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        recorder = _active
+        if recorder is None or recorder._thread != threading.get_ident():
+            return func(*args, **kwargs)
+
+        rows = None
+        if args:
+            first = args[0]
+            if isinstance(first, dict) and "transactions" in first:
+                rows = first["transactions"]
+            elif not isinstance(first, str):
+                try:
+                    rows = len(first)
+                except TypeError:
+                    pass
+
+        with recorder.stage(func.__name__, rows, kind="function"):
+            return func(*args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,47 @@
+# =========================================================
+# FIXED-POINT MONEY
+# File: utils/money.py
+# =========================================================
+# Amounts are held as integer paise (1 rupee = 100 paise) from parse time
+# onwards, so revenue sums are exact integer additions no matter how many
+# rows are summed. Conversion back to rupees happens only where values leave
+# the aggregates: analytics return values and report rendering.
+
+PAISE_PER_RUPEE = 100
+
+
+def to_paise(amount):
+    """
+    Returns: rupee amount (int, float or Decimal) as integer paise, rounded
+    to the nearest paisa. Exact for any price written with at most two
+    decimals, since the float error is far below half a paisa.
+    """
+    return round(amount * PAISE_PER_RUPEE)
+
+
+def rupees(paise):
+    """
+    Returns: paise as a float rupee value (the closest float to the exact amount)
+    """
+    return paise / PAISE_PER_RUPEE
+
+
+def divide_paise(paise, count):
+    """
+    Exact integer division rounded to the nearest paisa (ties to even),
+    for averages such as average order value.
+    """
+    quotient, remainder = divmod(paise, count)
+    if 2 * remainder > count or (2 * remainder == count and quotient % 2):
+        quotient += 1
+    return quotient
+
+
+def display_rupees(paise):
+    """
+    Returns: paise as an exact Decimal rupee value, which formats with the
+    same specs as a float ("{:,.2f}", "{:>10,.0f}") without rounding drift.
+    """
+    from decimal import Decimal
+
+    return Decimal(paise).scaleb(-2)
@@ -0,0 +1,133 @@
+# =========================================================
+# MULTI-PROCESS PIPELINE
+# File: utils/parallel.py
+# =========================================================
+# The input file is split into line-aligned byte ranges. Each worker process
+# parses, validates, aggregates (and optionally enriches) its own range; the
+# parent merges the partial aggregates in file order.
+
+import os
+import shutil
+import tempfile
+
+from utils.file_handler import line_aligned_ranges
+from utils.data_processor import (
+    iter_file_transactions,
+    iter_validate_and_filter,
+    iter_chunks,
+    new_validation_summary,
+    new_sales_aggregate,
+    update_sales_aggregate,
+    merge_sales_aggregates,
+    merge_validation_summaries,
+    new_enrichment_summary,
+    update_enrichment_summary,
+    merge_enrichment_summaries,
+    new_parse_rejects,
+    merge_parse_rejects
+)
+
+CHUNKS_PER_WORKER = 4
+CHUNK_SIZE = 10000
+
+
+def process_range(filename, start, end, region=None, min_amount=None, max_amount=None,
+                  product_mapping=None, part_file=None, approximate=None):
+    """
+    Parses, validates and partially aggregates one byte range of a sales file.
+    When product_mapping and part_file are given, the valid rows are also
+    enriched and written (without header) to part_file.
+    Returns: (aggregate, validation summary, enrichment summary, parse rejects)
+    """
+    from utils.api_handler import enrich_sales_data, write_enriched_rows
+
+    summary = new_validation_summary()
+    aggregate = new_sales_aggregate(approximate)
+    enrichment = new_enrichment_summary()
+    rejects = new_parse_rejects()
+
+    parsed = iter_file_transactions(filename, start, end, rejects)
+    valid = iter_validate_and_filter(parsed, region, min_amount, max_amount, summary)
+
+    out = open(part_file, "w", encoding="utf-8") if part_file else None
+    try:
+        for chunk in iter_chunks(valid, CHUNK_SIZE):
+            update_sales_aggregate(aggregate, chunk)
+            if out is not None:
+                enriched = enrich_sales_data(chunk, product_mapping)
+                update_enrichment_summary(enrichment, enriched)
+                write_enriched_rows(out, enriched)
+    finally:
+        if out is not None:
+            out.close()
+
+    return aggregate, summary, enrichment, rejects
+
+
+def parallel_pipeline(filenames, workers, region=None, min_amount=None, max_amount=None,
+                      product_mapping=None, enriched_file=None, approximate=None,
+                      rejects=None):
+    """
+    Runs the parse/validate/aggregate pipeline over a process pool.
+    Byte ranges of every input file share one pool. Rows dropped by the
+    parser are merged into rejects (see new_parse_rejects) when it is given.
+    If product_mapping and enriched_file are given, workers also enrich their
+    ranges and the parts are concatenated into enriched_file in file order.
+    Returns: (aggregate, validation summary, enrichment summary or None)
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    from utils.api_handler import ENRICHED_HEADER
+
+    if isinstance(filenames, str):
+        filenames = [filenames]
+    if product_mapping is None:
+        enriched_file = None
+
+    ranges = [
+        (filename, start, end)
+        for filename in filenames
+        for start, end in line_aligned_ranges(filename, workers * CHUNKS_PER_WORKER)
+    ]
+
+    aggregate = new_sales_aggregate(approximate)
+    summary = new_validation_summary()
+    enrichment = new_enrichment_summary()
+
+    part_dir = tempfile.mkdtemp(prefix="enriched_parts_") if enriched_file else None
+    part_files = [
+        os.path.join(part_dir, f"part_{i:05d}.txt") if part_dir else None
+        for i in range(len(ranges))
+    ]
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(
+                    process_range, filename, start, end, region, min_amount,
+                    max_amount, product_mapping, part_file, approximate
+                )
+                for (filename, start, end), part_file in zip(ranges, part_files)
+            ]
+
+            # Merge in submission (file) order so results match the serial path
+            for future in futures:
+                part_aggregate, part_summary, part_enrichment, part_rejects = future.result()
+                merge_sales_aggregates(aggregate, part_aggregate)
+                merge_validation_summaries(summary, part_summary)
+                merge_enrichment_summaries(enrichment, part_enrichment)
+                if rejects is not None:
+                    merge_parse_rejects(rejects, part_rejects)
+
+        if enriched_file:
+            with open(enriched_file, "w", encoding="utf-8") as out:
+                out.write("|".join(ENRICHED_HEADER) + "\n")
+                for part_file in part_files:
+                    with open(part_file, "r", encoding="utf-8") as part:
+                        shutil.copyfileobj(part, out)
+            print(f"Enriched data saved to {enriched_file}")
+    finally:
+        if part_dir:
+            shutil.rmtree(part_dir, ignore_errors=True)
+
+    return aggregate, summary, enrichment if enriched_file else None
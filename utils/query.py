@@ -0,0 +1,184 @@
+# =========================================================
+# INDEXED QUERY LAYER
+# File: utils/query.py
+# =========================================================
+# Indexes validated transactions once (hash indexes on Region, CustomerID,
+# ProductID and ProductName; sorted indexes on Date and amount) and answers
+# filter + aggregate queries from the most selective index, so a query costs
+# time proportional to the rows it can match rather than the whole dataset.
+#
+#   query = TransactionQuery(valid)
+#   north_dec = query.aggregate(region="North", date_from="2024-12-01")
+#   region_wise_sales(north_dec)
+#   top_selling_products(query.aggregate(customer=["C004", "C017"]))
+
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+from utils.data_processor import build_sales_aggregate
+from utils.money import PAISE_PER_RUPEE
+
+HASH_INDEXES = {
+    "region": "Region",
+    "customer": "CustomerID",
+    "product": "ProductID",
+    "product_name": "ProductName"
+}
+CACHE_SIZE = 256
+
+
+class TransactionQuery:
+    """
+    Read-only, indexed view over a list of validated transactions.
+
+    Filters (all optional, combined with AND):
+      region, customer, product, product_name – a value or a list of values
+      date_from, date_to                      – inclusive ISO date bounds
+      min_amount, max_amount                  – inclusive Quantity * UnitPrice bounds (rupees)
+    """
+
+    def __init__(self, transactions, cache_size=CACHE_SIZE):
+        self.transactions = list(transactions)
+        # Amounts in integer paise, compared against bounds scaled to paise
+        self.amounts = [tx["Quantity"] * tx["UnitPricePaise"] for tx in self.transactions]
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+        self.hash_indexes = {key: {} for key in HASH_INDEXES}
+        for i, tx in enumerate(self.transactions):
+            for key, column in HASH_INDEXES.items():
+                self.hash_indexes[key].setdefault(tx[column], []).append(i)
+
+        self.date_rows = sorted(
+            range(len(self.transactions)), key=lambda i: self.transactions[i]["Date"]
+        )
+        self.date_keys = [self.transactions[i]["Date"] for i in self.date_rows]
+
+        self.amount_rows = sorted(range(len(self.amounts)), key=self.amounts.__getitem__)
+        self.amount_keys = [self.amounts[i] for i in self.amount_rows]
+
+    def __len__(self):
+        return len(self.transactions)
+
+    # ---------------------------------------------------------
+    # Index lookups
+    # ---------------------------------------------------------
+    @staticmethod
+    def _values(value):
+        """
+        Returns the distinct filter values in order; a repeated value would
+        otherwise add its index rows twice.
+        """
+        return [value] if isinstance(value, str) else list(dict.fromkeys(value))
+
+    @staticmethod
+    def _paise(amount):
+        return None if amount is None else amount * PAISE_PER_RUPEE
+
+    @staticmethod
+    def _range(keys, rows, low, high):
+        start = bisect_left(keys, low) if low is not None else 0
+        end = bisect_right(keys, high) if high is not None else len(keys)
+        return rows[start:end]
+
+    def _candidates(self, filters):
+        """
+        Returns one candidate row list per filter that has an index.
+        """
+        candidates = []
+
+        for key in HASH_INDEXES:
+            if filters.get(key) is None:
+                continue
+            index = self.hash_indexes[key]
+            rows = []
+            for value in self._values(filters[key]):
+                rows.extend(index.get(value, ()))
+            candidates.append(rows)
+
+        if filters.get("date_from") is not None or filters.get("date_to") is not None:
+            candidates.append(self._range(
+                self.date_keys, self.date_rows, filters.get("date_from"), filters.get("date_to")
+            ))
+
+        if filters.get("min_amount") is not None or filters.get("max_amount") is not None:
+            candidates.append(self._range(
+                self.amount_keys, self.amount_rows,
+                self._paise(filters.get("min_amount")), self._paise(filters.get("max_amount"))
+            ))
+
+        return candidates
+
+    def _matches(self, i, filters, value_sets):
+        tx = self.transactions[i]
+        for key, column in HASH_INDEXES.items():
+            if key in value_sets and tx[column] not in value_sets[key]:
+                return False
+        date = tx["Date"]
+        if filters.get("date_from") is not None and date < filters["date_from"]:
+            return False
+        if filters.get("date_to") is not None and date > filters["date_to"]:
+            return False
+        amount = self.amounts[i]
+        if filters.get("min_amount") is not None and amount < self._paise(filters["min_amount"]):
+            return False
+        if filters.get("max_amount") is not None and amount > self._paise(filters["max_amount"]):
+            return False
+        return True
+
+    def row_ids(self, **filters):
+        """
+        Returns the matching row positions in input order.
+        Only the smallest index candidate list is scanned; the other filters
+        are checked on those rows alone.
+        """
+        unknown = set(filters) - set(HASH_INDEXES) - {
+            "date_from", "date_to", "min_amount", "max_amount"
+        }
+        if unknown:
+            raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}")
+
+        candidates = self._candidates(filters)
+        if not candidates:
+            return list(range(len(self.transactions)))
+
+        base = min(candidates, key=len)
+        value_sets = {
+            key: set(self._values(filters[key]))
+            for key in HASH_INDEXES
+            if filters.get(key) is not None
+        }
+
+        return sorted(i for i in base if self._matches(i, filters, value_sets))
+
+    # ---------------------------------------------------------
+    # Queries
+    # ---------------------------------------------------------
+    def select(self, **filters):
+        """
+        Returns: list of matching transactions
+        """
+        return [self.transactions[i] for i in self.row_ids(**filters)]
+
+    def aggregate(self, **filters):
+        """
+        Returns the sales aggregate of the matching transactions, accepted by
+        every analytics function in data_processor. Results are cached per
+        filter combination.
+        """
+        key = tuple(sorted(
+            (k, tuple(sorted(self._values(v))) if k in HASH_INDEXES else v)
+            for k, v in filters.items()
+            if v is not None
+        ))
+
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        result = build_sales_aggregate(self.select(**filters))
+        self._cache[key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+        return result
@@ -0,0 +1,509 @@
+# =========================================================
+# REPORT RENDERING ENGINE
+# File: utils/report.py
+# =========================================================
+# Renders precomputed report metrics (see build_report_metrics in
+# data_processor) section by section to text, JSON, CSV or HTML.
+#
+# Text and HTML sections come from format-string templates; JSON and CSV are
+# produced from the section data itself. Money arrives as integer paise and is
+# converted to rupees here, at render time only (exact Decimals for text, HTML
+# and CSV; floats for JSON). Every rendered section is cached by
+# a hash of its format, template and input data, so rendering again with
+# unchanged data (or with one section changed) only re-renders what differs.
+# Passing cache_file keeps the cache across runs. Sections missing from the
+# metrics (the optional customer analytics ones) are left out of the report.
+#
+#   renderer = ReportRenderer(cache_file="output/report_cache.json")
+#   renderer.write(metrics, "output/sales_report.html", "html")
+
+import csv
+import hashlib
+import html
+import io
+import json
+import os
+from collections import OrderedDict
+
+from utils.money import display_rupees, rupees
+
+FORMATS = ("text", "json", "csv", "html")
+SECTIONS = (
+    "header", "summary", "regions", "top_products", "top_customers",
+    "customer_segments", "cohorts", "daily", "performance", "region_averages", "enrichment"
+)
+CACHE_SIZE = 256
+
+# Section fields holding integer paise
+MONEY_FIELDS = {
+    "total_revenue", "avg_order_value", "sales", "revenue", "spent", "best_revenue", "value"
+}
+
+
+def _rule(char="-"):
+    return char * 44 + "\n"
+
+
+def _title(name):
+    return f"{name}\n" + _rule()
+
+
+# ---------------------------------------------------------
+# Templates
+# ---------------------------------------------------------
+# Each section template may define:
+#   title     – fixed text written first
+#   head      – formatted with the section data
+#   rows      – key of the section's row list (a dict or None counts as 0/1 rows)
+#   rows_head – written before the rows, only when there are rows
+#   row       – formatted once per row
+#   rows_tail – written after the rows, only when there are rows
+#   empty     – written instead when there are no rows
+#   unavailable – written instead of rows / empty when the row list is None
+#               (not computed, e.g. from an approximate aggregate)
+#   tail      – formatted with the section data, written last
+#   missing   – written after the title when the section data is None
+#   cells     – {field: item template} for list fields of the section data or
+#               of a row: the items are formatted one by one and joined, so
+#               variable-width tables fit a fixed row template
+TEXT_TEMPLATES = {
+    "header": {
+        "head": (
+            _rule("=")
+            + "       SALES ANALYTICS REPORT\n"
+            + "     Generated: {generated}\n"
+            + "     Records Processed: {records}\n"
+            + _rule("=") + "\n"
+        )
+    },
+    "summary": {
+        "title": _title("OVERALL SUMMARY"),
+        "head": (
+            "Total Revenue:        ₹{total_revenue:,.2f}\n"
+            "Total Transactions:   {transactions}\n"
+            "Average Order Value:  ₹{avg_order_value:,.2f}\n"
+            "Date Range:           {start_date} to {end_date}\n"
+        ),
+        "rows": "approximate",
+        "row": (
+            "Approximate Mode:     customers ±{distinct_error:.1%}, "
+            "product qty ≤ +{max_qty_error}\n"
+        ),
+        "tail": "\n"
+    },
+    "regions": {
+        "title": _title("REGION-WISE PERFORMANCE"),
+        "head": f"{'Region':<10}{'Sales':>12}{'% Total':>10}{'Txns':>8}\n",
+        "rows": "rows",
+        "row": "{region:<10}₹{sales:>10,.0f}{percentage:>9.2f}%{transactions:>8}\n",
+        "tail": "\n"
+    },
+    "top_products": {
+        "title": _title("TOP 5 PRODUCTS"),
+        "head": f"{'Rank':<6}{'Product':<20}{'Qty':>6}{'Revenue':>12}\n",
+        "rows": "rows",
+        "row": "{rank:<6}{product:<20}{qty:>6}₹{revenue:>10,.0f}\n",
+        "tail": "\n"
+    },
+    "top_customers": {
+        "title": _title("TOP 5 CUSTOMERS"),
+        "head": f"{'Rank':<6}{'Customer':<10}{'Spent':>14}{'Orders':>10}\n",
+        "rows": "rows",
+        "row": "{rank:<6}{customer:<10}₹{spent:>12,.0f}{orders:>10}\n",
+        "tail": "\n"
+    },
+    "customer_segments": {
+        "title": _title("CUSTOMER SEGMENTS (RFM)"),
+        "head": (
+            "Recency, frequency and spend scored 1-5 by quintile, as of {as_of}\n"
+            + f"{'Segment':<13}{'Cust':>6}{'Share':>8}{'Revenue':>13}{'Days':>6}{'Orders':>8}\n"
+        ),
+        "rows": "rows",
+        "row": (
+            "{segment:<13}{customers:>6}{share:>7.1f}% ₹{revenue:>11,.0f}"
+            "{recency:>6.1f}{orders:>8.2f}\n"
+        ),
+        "tail": "\n",
+        "missing": "Not available for approximate or warehouse aggregates\n\n"
+    },
+    "cohorts": {
+        "title": _title("COHORT RETENTION"),
+        "head": (
+            "Customers by first purchase {period}; % buying in each later {period}\n"
+            + f"{'Cohort':<10}{'Size':>6}" + "{periods}\n"
+        ),
+        "cells": {"periods": "{:>7}", "retention": "{:>6.1f}%"},
+        "rows": "rows",
+        "row": "{cohort:<10}{customers:>6}{retention}\n",
+        "tail": "\n",
+        "missing": "Not available for approximate or warehouse aggregates\n\n"
+    },
+    "daily": {
+        "title": _title("DAILY SALES TREND"),
+        "head": f"{'Date':<12}{'Revenue':>12}{'Txns':>8}{'Customers':>12}\n",
+        "rows": "rows",
+        "row": "{date:<12}₹{revenue:>10,.0f}{transactions:>8}{customers:>12}\n",
+        "tail": "\n"
+    },
+    "performance": {
+        "title": _title("PRODUCT PERFORMANCE ANALYSIS"),
+        "head": (
+            "Best Selling Day: {best_date} (₹{best_revenue:,.0f})\n"
+            "Low Performing Products (<{threshold} units):\n"
+        ),
+        "rows": "rows",
+        "row": " - {product} ({qty})\n",
+        "unavailable": " Not available in approximate mode\n",
+        "tail": "\n"
+    },
+    "region_averages": {
+        "title": "Average Transaction Value per Region:\n",
+        "rows": "rows",
+        "row": " - {region}: ₹{value:,.2f}\n",
+        "tail": "\n"
+    },
+    "enrichment": {
+        "title": _title("API ENRICHMENT SUMMARY"),
+        "head": (
+            "Total Products Enriched: {enriched}\n"
+            "Success Rate: {success_rate:.2f}%\n"
+        ),
+        "rows": "failed_products",
+        "rows_head": "Products not enriched:\n",
+        "row": " - {product}\n",
+        "empty": "All products enriched successfully\n",
+        "missing": "API enrichment skipped\n"
+    }
+}
+
+HTML_TEMPLATES = {
+    "header": {
+        "head": (
+            "<h1>Sales Analytics Report</h1>\n"
+            "<p>Generated: {generated} &middot; Records Processed: {records}</p>\n"
+        )
+    },
+    "summary": {
+        "title": "<h2>Overall Summary</h2>\n",
+        "head": (
+            "<table>\n"
+            "<tr><th>Total Revenue</th><td>₹{total_revenue:,.2f}</td></tr>\n"
+            "<tr><th>Total Transactions</th><td>{transactions}</td></tr>\n"
+            "<tr><th>Average Order Value</th><td>₹{avg_order_value:,.2f}</td></tr>\n"
+            "<tr><th>Date Range</th><td>{start_date} to {end_date}</td></tr>\n"
+        ),
+        "rows": "approximate",
+        "row": (
+            "<tr><th>Approximate Mode</th><td>customers ±{distinct_error:.1%}, "
+            "product qty ≤ +{max_qty_error}</td></tr>\n"
+        ),
+        "tail": "</table>\n"
+    },
+    "regions": {
+        "title": "<h2>Region-wise Performance</h2>\n",
+        "head": "<table>\n<tr><th>Region</th><th>Sales</th><th>% Total</th><th>Txns</th></tr>\n",
+        "rows": "rows",
+        "row": (
+            "<tr><td>{region}</td><td>₹{sales:,.0f}</td>"
+            "<td>{percentage:.2f}%</td><td>{transactions}</td></tr>\n"
+        ),
+        "tail": "</table>\n"
+    },
+    "top_products": {
+        "title": "<h2>Top 5 Products</h2>\n",
+        "head": "<table>\n<tr><th>Rank</th><th>Product</th><th>Qty</th><th>Revenue</th></tr>\n",
+        "rows": "rows",
+        "row": (
+            "<tr><td>{rank}</td><td>{product}</td>"
+            "<td>{qty}</td><td>₹{revenue:,.0f}</td></tr>\n"
+        ),
+        "tail": "</table>\n"
+    },
+    "top_customers": {
+        "title": "<h2>Top 5 Customers</h2>\n",
+        "head": "<table>\n<tr><th>Rank</th><th>Customer</th><th>Spent</th><th>Orders</th></tr>\n",
+        "rows": "rows",
+        "row": (
+            "<tr><td>{rank}</td><td>{customer}</td>"
+            "<td>₹{spent:,.0f}</td><td>{orders}</td></tr>\n"
+        ),
+        "tail": "</table>\n"
+    },
+    "customer_segments": {
+        "title": "<h2>Customer Segments (RFM)</h2>\n",
+        "head": (
+            "<p>Recency, frequency and spend scored 1-5 by quintile, as of {as_of}</p>\n"
+            "<table>\n<tr><th>Segment</th><th>Customers</th><th>Share</th><th>Revenue</th>"
+            "<th>Avg Days Since Purchase</th><th>Avg Orders</th></tr>\n"
+        ),
+        "rows": "rows",
+        "row": (
+            "<tr><td>{segment}</td><td>{customers}</td><td>{share:.1f}%</td>"
+            "<td>₹{revenue:,.0f}</td><td>{recency:.1f}</td><td>{orders:.2f}</td></tr>\n"
+        ),
+        "tail": "</table>\n",
+        "missing": "<p>Not available for approximate or warehouse aggregates</p>\n"
+    },
+    "cohorts": {
+        "title": "<h2>Cohort Retention</h2>\n",
+        "head": (
+            "<p>Customers by first purchase {period}; % buying in each later {period}</p>\n"
+            "<table>\n<tr><th>Cohort</th><th>Size</th>{periods}</tr>\n"
+        ),
+        "cells": {"periods": "<th>{}</th>", "retention": "<td>{:.1f}%</td>"},
+        "rows": "rows",
+        "row": "<tr><td>{cohort}</td><td>{customers}</td>{retention}</tr>\n",
+        "tail": "</table>\n",
+        "missing": "<p>Not available for approximate or warehouse aggregates</p>\n"
+    },
+    "daily": {
+        "title": "<h2>Daily Sales Trend</h2>\n",
+        "head": "<table>\n<tr><th>Date</th><th>Revenue</th><th>Txns</th><th>Customers</th></tr>\n",
+        "rows": "rows",
+        "row": (
+            "<tr><td>{date}</td><td>₹{revenue:,.0f}</td>"
+            "<td>{transactions}</td><td>{customers}</td></tr>\n"
+        ),
+        "tail": "</table>\n"
+    },
+    "performance": {
+        "title": "<h2>Product Performance Analysis</h2>\n",
+        "head": (
+            "<p>Best Selling Day: {best_date} (₹{best_revenue:,.0f})</p>\n"
+            "<p>Low Performing Products (&lt;{threshold} units):</p>\n<ul>\n"
+        ),
+        "rows": "rows",
+        "row": "<li>{product} ({qty})</li>\n",
+        "unavailable": "<li>Not available in approximate mode</li>\n",
+        "tail": "</ul>\n"
+    },
+    "region_averages": {
+        "title": "<p>Average Transaction Value per Region:</p>\n<ul>\n",
+        "rows": "rows",
+        "row": "<li>{region}: ₹{value:,.2f}</li>\n",
+        "tail": "</ul>\n"
+    },
+    "enrichment": {
+        "title": "<h2>API Enrichment Summary</h2>\n",
+        "head": (
+            "<p>Total Products Enriched: {enriched}</p>\n"
+            "<p>Success Rate: {success_rate:.2f}%</p>\n"
+        ),
+        "rows": "failed_products",
+        "rows_head": "<p>Products not enriched:</p>\n<ul>\n",
+        "row": "<li>{product}</li>\n",
+        "rows_tail": "</ul>\n",
+        "empty": "<p>All products enriched successfully</p>\n",
+        "missing": "<p>API enrichment skipped</p>\n"
+    }
+}
+
+HTML_PAGE = (
+    "<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n"
+    "<title>Sales Analytics Report</title>\n</head>\n<body>\n{body}</body>\n</html>\n"
+)
+
+TEMPLATES = {"text": TEXT_TEMPLATES, "html": HTML_TEMPLATES}
+
+
+def _rows(data, key):
+    rows = data.get(key)
+    if rows is None:
+        return []
+    return [rows] if isinstance(rows, dict) else rows
+
+
+def _in_rupees(value, convert):
+    if isinstance(value, dict):
+        return {
+            k: convert(v) if k in MONEY_FIELDS and v is not None else _in_rupees(v, convert)
+            for k, v in value.items()
+        }
+    if isinstance(value, list):
+        return [_in_rupees(v, convert) for v in value]
+    return value
+
+
+def _escaped(value):
+    if isinstance(value, str):
+        return html.escape(value)
+    if isinstance(value, dict):
+        return {k: _escaped(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_escaped(v) for v in value]
+    return value
+
+
+def _with_cells(data, cells):
+    if not cells:
+        return data
+    joined = {
+        field: "".join(item.format(value) for value in data[field])
+        for field, item in cells.items()
+        if isinstance(data.get(field), list)
+    }
+    return {**data, **joined}
+
+
+def render_template(template, data):
+    """
+    Returns: one section rendered from a text / HTML section template
+    """
+    out = [template.get("title", "")]
+
+    if data is None:
+        out.append(template.get("missing", ""))
+        return "".join(out)
+
+    cells = template.get("cells")
+    data = _with_cells(data, cells)
+    out.append(template.get("head", "").format(**data))
+    if "rows" in template:
+        rows = _rows(data, template["rows"])
+        if data.get(template["rows"]) is None and "unavailable" in template:
+            out.append(template["unavailable"])
+        elif rows:
+            out.append(template.get("rows_head", ""))
+            row = template["row"]
+            out.extend(row.format(**_with_cells(r, cells)) for r in rows)
+            out.append(template.get("rows_tail", ""))
+        else:
+            out.append(template.get("empty", ""))
+    out.append(template.get("tail", "").format(**data))
+
+    return "".join(out)
+
+
+def _render_json(name, data):
+    return f"  {json.dumps(name)}: " + json.dumps(data, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+
+
+def _render_csv(name, data):
+    """
+    One CSV block per section: the section name, its scalar fields as
+    field,value pairs (lists of values as field,value,value...), then its
+    row list as a table, with list cells spread over trailing columns.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow([name])
+
+    if data is not None:
+        for key, value in data.items():
+            if not isinstance(value, (list, dict)) and value is not None:
+                writer.writerow([key, value])
+            elif isinstance(value, list) and not all(isinstance(v, dict) for v in value):
+                writer.writerow([key] + value)
+        for key, value in data.items():
+            rows = _rows(data, key) if isinstance(value, (list, dict)) else []
+            rows = [r for r in rows if isinstance(r, dict)]
+            if rows:
+                writer.writerow(list(rows[0]))
+                writer.writerows(
+                    [cell for v in r.values() for cell in (v if isinstance(v, list) else [v])]
+                    for r in rows
+                )
+
+    writer.writerow([])
+    return buffer.getvalue()
+
+
+# ---------------------------------------------------------
+# Renderer
+# ---------------------------------------------------------
+class ReportRenderer:
+    """
+    Renders report metrics to one of FORMATS, reusing cached sections.
+    rendered / reused count sections rendered vs. served from the cache
+    by the last render() call.
+    """
+
+    def __init__(self, cache_file=None, cache_size=CACHE_SIZE):
+        self.cache_file = cache_file
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.last_keys = []
+        self.rendered = 0
+        self.reused = 0
+
+        if cache_file and os.path.exists(cache_file):
+            try:
+                with open(cache_file, "r", encoding="utf-8") as f:
+                    self.cache.update(json.load(f))
+            except (OSError, ValueError):
+                self.cache.clear()
+
+    @staticmethod
+    def section_key(file_format, name, data):
+        """
+        Returns: hash of everything a rendered section depends on
+        """
+        template = TEMPLATES.get(file_format, {}).get(name)
+        payload = json.dumps(
+            [file_format, name, template, data], sort_keys=True, default=str, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def render_section(self, file_format, name, data):
+        key = self.section_key(file_format, name, data)
+        self.last_keys.append(key)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.reused += 1
+            return self.cache[key]
+
+        if file_format == "json":
+            text = _render_json(name, _in_rupees(data, rupees))
+        elif file_format == "csv":
+            text = _render_csv(name, _in_rupees(data, display_rupees))
+        elif file_format == "html":
+            text = render_template(HTML_TEMPLATES[name], _escaped(_in_rupees(data, display_rupees)))
+        else:
+            text = render_template(TEXT_TEMPLATES[name], _in_rupees(data, display_rupees))
+
+        self.cache[key] = text
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        self.rendered += 1
+        return text
+
+    def render(self, metrics, file_format="text"):
+        """
+        Returns: the full report as one string
+        """
+        if file_format not in FORMATS:
+            raise ValueError(f"Unknown report format: {file_format} (use one of {', '.join(FORMATS)})")
+
+        self.rendered = self.reused = 0
+        self.last_keys = []
+        parts = [
+            self.render_section(file_format, name, metrics[name])
+            for name in SECTIONS
+            if name in metrics
+        ]
+
+        if file_format == "json":
+            return "{\n" + ",\n".join(parts) + "\n}\n"
+        if file_format == "html":
+            return HTML_PAGE.format(body="".join(parts))
+        return "".join(parts)
+
+    def write(self, metrics, output_file, file_format="text"):
+        """
+        Renders the report and writes it with a single buffered write.
+        """
+        report = self.render(metrics, file_format)
+        with open(output_file, "w", encoding="utf-8") as f:
+            f.write(report)
+
+        if self.cache_file:
+            self.save_cache()
+
+    def save_cache(self):
+        """
+        Persists only the sections of the last render, so the cache file does
+        not grow with every data change.
+        """
+        sections = {key: self.cache[key] for key in self.last_keys if key in self.cache}
+        with open(self.cache_file, "w", encoding="utf-8") as f:
+            json.dump(sections, f, ensure_ascii=False)
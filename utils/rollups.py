@@ -0,0 +1,273 @@
+# =========================================================
+# TIME-BUCKETED ROLLUPS
+# File: utils/rollups.py
+# =========================================================
+# Pre-aggregates revenue, transaction counts and unique customers by day,
+# ISO week, month and quarter, optionally crossed with Region and/or
+# ProductName. Only the day level touches transactions (or reuses the daily
+# grouping of a sales aggregate); weeks are merged from days, months from
+# days and quarters from months, so trend queries never rescan the data.
+#
+#   rollup = SalesRollup.from_aggregate(aggregate)
+#   rollup.series("month")
+#   rollup.rolling_revenue(window=7)
+#
+#   by_region = SalesRollup.from_transactions(valid, by=("Region",))
+#   by_region.series("quarter", Region="North")
+#
+# Buckets sum revenue in integer paise like the sales aggregate; query
+# results report rupees.
+
+from collections import deque
+from datetime import date, timedelta
+
+from utils.money import rupees
+from utils.sketches import HyperLogLog
+
+LEVELS = ("day", "week", "month", "quarter")
+DIMENSIONS = ("Region", "ProductName")
+
+
+def _new_bucket(customers):
+    return {"revenue": 0, "count": 0, "customers": customers}
+
+
+def _fold(target, bucket):
+    target["revenue"] += bucket["revenue"]
+    target["count"] += bucket["count"]
+    target["customers"] |= bucket["customers"]
+
+
+def _empty_like(customers):
+    if isinstance(customers, HyperLogLog):
+        return HyperLogLog(precision=customers.precision)
+    return set()
+
+
+def _copied(customers):
+    copy = _empty_like(customers)
+    copy |= customers
+    return copy
+
+
+def week_of(day):
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def quarter_of(month):
+    year, m = month.split("-")
+    return f"{year}-Q{(int(m) - 1) // 3 + 1}"
+
+
+class SalesRollup:
+    """
+    Revenue / transactions / unique customers per time bucket and dimension key.
+    Buckets of each level are {(period, dims): {"revenue", "count", "customers"}},
+    where dims is a tuple of the values of the `by` columns (empty when by is empty).
+    """
+
+    def __init__(self, daily, by=()):
+        self.by = tuple(by)
+        self.skipped_dates = 0
+        self.levels = {"day": {}}
+
+        # Keep only ISO dates; anything else cannot be placed on the calendar
+        for (period, dims), bucket in daily.items():
+            try:
+                date.fromisoformat(period)
+            except (TypeError, ValueError):
+                self.skipped_dates += bucket["count"]
+                continue
+            self.levels["day"][(period, dims)] = bucket
+
+        self._roll_up()
+
+    # ---------------------------------------------------------
+    # Construction
+    # ---------------------------------------------------------
+    @classmethod
+    def from_aggregate(cls, aggregate):
+        """
+        Builds a time-only rollup from the daily grouping of a sales aggregate
+        (exact or approximate) without touching transactions.
+        """
+        daily = {
+            (period, ()): {
+                "revenue": v["revenue"],
+                "count": v["count"],
+                "customers": _copied(v["customers"])
+            }
+            for period, v in aggregate["daily"].items()
+        }
+        return cls(daily)
+
+    @classmethod
+    def from_transactions(cls, transactions, by=(), distinct_error=None):
+        """
+        Builds day buckets crossed with the `by` columns in one pass.
+        With distinct_error, unique customers are HyperLogLog estimates.
+        """
+        by = tuple(by)
+        unknown = set(by) - set(DIMENSIONS)
+        if unknown:
+            raise ValueError(f"Unknown rollup dimensions: {', '.join(sorted(unknown))}")
+
+        daily = {}
+        for tx in transactions:
+            key = (tx["Date"], tuple(tx[col] for col in by))
+            bucket = daily.get(key)
+            if bucket is None:
+                customers = HyperLogLog(distinct_error) if distinct_error else set()
+                bucket = daily[key] = _new_bucket(customers)
+            bucket["revenue"] += tx["Quantity"] * tx["UnitPricePaise"]
+            bucket["count"] += 1
+            bucket["customers"].add(tx["CustomerID"])
+
+        return cls(daily, by)
+
+    def _roll_up(self):
+        """
+        Derives week and month buckets from days, and quarter buckets from months.
+        """
+        def coarsen(source, period_of):
+            result = {}
+            for (period, dims), bucket in sorted(source.items()):
+                key = (period_of(period), dims)
+                target = result.get(key)
+                if target is None:
+                    target = result[key] = _new_bucket(_empty_like(bucket["customers"]))
+                _fold(target, bucket)
+            return result
+
+        days = self.levels["day"]
+        self.levels["week"] = coarsen(days, lambda d: week_of(date.fromisoformat(d)))
+        self.levels["month"] = coarsen(days, lambda d: d[:7])
+        self.levels["quarter"] = coarsen(self.levels["month"], quarter_of)
+
+    def merge(self, other):
+        """
+        Folds another rollup with the same dimensions (e.g. a later run) into this one.
+        """
+        if other.by != self.by:
+            raise ValueError("Cannot merge rollups with different dimensions")
+
+        days = self.levels["day"]
+        for key, bucket in other.levels["day"].items():
+            target = days.get(key)
+            if target is None:
+                target = days[key] = _new_bucket(_empty_like(bucket["customers"]))
+            _fold(target, bucket)
+
+        self.skipped_dates += other.skipped_dates
+        self._roll_up()
+        return self
+
+    # ---------------------------------------------------------
+    # Queries
+    # ---------------------------------------------------------
+    def _buckets(self, level, filters):
+        if level not in LEVELS:
+            raise ValueError(f"Unknown rollup level: {level} (use one of {', '.join(LEVELS)})")
+        unknown = set(filters) - set(self.by)
+        if unknown:
+            raise ValueError(f"Rollup is not split by: {', '.join(sorted(unknown))}")
+
+        positions = {col: i for i, col in enumerate(self.by)}
+        merged = {}
+        for (period, dims), bucket in sorted(self.levels[level].items()):
+            if any(dims[positions[col]] != value for col, value in filters.items()):
+                continue
+            if not self.by:
+                merged[period] = bucket
+                continue
+            target = merged.get(period)
+            if target is None:
+                target = merged[period] = _new_bucket(_empty_like(bucket["customers"]))
+            _fold(target, bucket)
+        return merged
+
+    def series(self, level="day", **filters):
+        """
+        Returns: {period: {"revenue", "transaction_count", "unique_customers"}}
+        in time order, summed over every dimension value not fixed by filters.
+        """
+        return {
+            period: {
+                "revenue": rupees(bucket["revenue"]),
+                "transaction_count": bucket["count"],
+                "unique_customers": len(bucket["customers"])
+            }
+            for period, bucket in self._buckets(level, filters).items()
+        }
+
+    def breakdown(self, level="day"):
+        """
+        Returns: {(period, dims): {"revenue", "transaction_count", "unique_customers"}}
+        """
+        return {
+            key: {
+                "revenue": rupees(bucket["revenue"]),
+                "transaction_count": bucket["count"],
+                "unique_customers": len(bucket["customers"])
+            }
+            for key, bucket in sorted(self.levels[level].items())
+        }
+
+    def peak(self, level="day", **filters):
+        """
+        Returns: (period, revenue, transaction count) of the highest-revenue bucket
+        """
+        buckets = self._buckets(level, filters)
+        period = max(buckets, key=lambda p: buckets[p]["revenue"])
+        return period, rupees(buckets[period]["revenue"]), buckets[period]["count"]
+
+    def rolling_revenue(self, window=7, **filters):
+        """
+        Moving revenue over the last `window` calendar days (days without
+        sales count as zero).
+        Returns: {day: revenue of that day and the window - 1 days before it}
+        """
+        days = {p: b["revenue"] for p, b in self._buckets("day", filters).items()}
+        if not days:
+            return {}
+
+        result = {}
+        recent = deque()
+        total = 0
+        current = date.fromisoformat(min(days))
+        last = date.fromisoformat(max(days))
+
+        while current <= last:
+            revenue = days.get(current.isoformat(), 0)
+            recent.append(revenue)
+            total += revenue
+            if len(recent) > window:
+                total -= recent.popleft()
+            result[current.isoformat()] = rupees(total)
+            current += timedelta(days=1)
+
+        return result
+
+    def deltas(self, level="day", **filters):
+        """
+        Change in revenue from the previous bucket of the series
+        (day-over-day, week-over-week, ...).
+        Returns: {period: {"revenue", "delta", "pct_change"}}; the first
+                 period has delta and pct_change None
+        """
+        result = {}
+        previous = None
+        for period, bucket in self._buckets(level, filters).items():
+            revenue = bucket["revenue"]
+            delta = pct = None
+            if previous is not None:
+                delta = revenue - previous
+                pct = round(delta * 100 / previous, 2) if previous else None
+            result[period] = {
+                "revenue": rupees(revenue),
+                "delta": None if delta is None else rupees(delta),
+                "pct_change": pct
+            }
+            previous = revenue
+        return result
@@ -0,0 +1,222 @@
+# =========================================================
+# APPROXIMATE ANALYTICS SKETCHES
+# File: utils/sketches.py
+# =========================================================
+# Fixed-size, mergeable summaries used by the approximate aggregation mode:
+#
+#   HyperLogLog  – distinct count (unique customers per day / region).
+#                  Behaves like the set it replaces: add(), len() and |=.
+#   SpaceSaving  – weighted top-k heavy hitters (top selling products).
+#                  Read-only mapping of product -> {"qty", "revenue", "error"}.
+#
+# Both merge across chunks, worker processes and incremental runs, and both
+# pickle, so they can live inside a saved aggregate state.
+
+import heapq
+import math
+from collections.abc import Mapping
+
+DEFAULT_DISTINCT_ERROR = 0.01
+DEFAULT_TOP_K_ERROR = 0.001
+
+MIN_PRECISION = 4
+MAX_PRECISION = 18
+
+
+def approximate_settings(distinct_error=DEFAULT_DISTINCT_ERROR, top_k_error=DEFAULT_TOP_K_ERROR):
+    """
+    Returns the settings dictionary that switches an aggregate to approximate mode.
+    distinct_error: relative standard error of unique-customer counts
+    top_k_error:    product quantities are over-counted by at most
+                    top_k_error * total quantity
+    """
+    if not 0 < distinct_error < 1 or not 0 < top_k_error < 1:
+        raise ValueError("Sketch error bounds must be between 0 and 1")
+    return {"distinct_error": distinct_error, "top_k_error": top_k_error}
+
+
+_blake2b = None
+
+
+def hash64(value):
+    # Stable across processes and runs, unlike hash(), so sketches stay mergeable.
+    # hashlib (and OpenSSL with it) is bound on the first call, not at import;
+    # an import statement inside this hot function would cost more than the hash.
+    global _blake2b
+    if _blake2b is None:
+        from hashlib import blake2b as _blake2b
+    data = value.encode("utf-8") if isinstance(value, str) else bytes(value)
+    return int.from_bytes(_blake2b(data, digest_size=8).digest(), "big")
+
+
+# ---------------------------------------------------------
+# Distinct counting
+# ---------------------------------------------------------
+def precision_for_error(error):
+    """
+    Returns the register-count exponent p whose standard error
+    1.04 / sqrt(2 ** p) is at most error.
+    """
+    p = math.ceil(math.log2((1.04 / error) ** 2))
+    return max(MIN_PRECISION, min(MAX_PRECISION, p))
+
+
+class HyperLogLog:
+    """
+    Distinct-count sketch using 2 ** precision one-byte registers.
+    Merging and estimating view the registers as a NumPy array.
+    """
+
+    def __init__(self, error=DEFAULT_DISTINCT_ERROR, precision=None):
+        self.precision = precision or precision_for_error(error)
+        self.registers = bytearray(1 << self.precision)
+
+    def add(self, value):
+        self.add_hash(hash64(value))
+
+    def add_hash(self, x):
+        """
+        Adds a value by its precomputed hash64(), so a value feeding several
+        sketches is hashed once.
+        """
+        p = self.precision
+        index = x >> (64 - p)
+        rest = x & ((1 << (64 - p)) - 1)
+        rank = (64 - p) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        """
+        Returns: estimated number of distinct values added
+        """
+        import numpy as np
+
+        registers = np.frombuffer(self.registers, dtype=np.uint8)
+        m = len(registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / float(np.ldexp(1.0, -registers.astype(np.int32)).sum())
+
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction (linear counting)
+            estimate = m * math.log(m / zeros)
+
+        return estimate
+
+    def __len__(self):
+        return int(round(self.count()))
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        import numpy as np
+
+        mine = np.frombuffer(self.registers, dtype=np.uint8)
+        np.maximum(mine, np.frombuffer(other.registers, dtype=np.uint8), out=mine)
+        return self
+
+    def __ior__(self, other):
+        return self.merge(other)
+
+    @property
+    def standard_error(self):
+        return 1.04 / math.sqrt(len(self.registers))
+
+
+# ---------------------------------------------------------
+# Heavy hitters
+# ---------------------------------------------------------
+class SpaceSaving(Mapping):
+    """
+    Weighted Space-Saving summary monitoring at most capacity keys.
+
+    Each monitored key maps to {"qty", "revenue", "error"}; "qty" over-counts
+    the true quantity by at most "error", which never exceeds the smallest
+    monitored quantity (<= total quantity / capacity). When there are no
+    more distinct keys than capacity, every figure is exact.
+    """
+
+    def __init__(self, error=DEFAULT_TOP_K_ERROR, capacity=None):
+        self.capacity = capacity or math.ceil(1 / error)
+        self._entries = {}
+        self.total = 0
+        self._heap = []
+
+    def add(self, key, qty, revenue):
+        self.total += qty
+
+        entry = self._entries.get(key)
+        if entry is None:
+            floor = {"qty": 0, "revenue": 0, "error": 0}
+            if len(self._entries) >= self.capacity:
+                floor = self._evict()
+            entry = self._entries[key] = {
+                "qty": floor["qty"],
+                "revenue": floor["revenue"],
+                "error": floor["qty"]
+            }
+            heapq.heappush(self._heap, (entry["qty"] + qty, key))
+
+        entry["qty"] += qty
+        entry["revenue"] += revenue
+
+    def _evict(self):
+        """
+        Removes and returns the entry with the smallest quantity. Heap
+        entries are refreshed lazily, since quantities only ever grow.
+        """
+        while True:
+            qty, key = heapq.heappop(self._heap)
+            entry = self._entries[key]
+            if entry["qty"] == qty:
+                return self._entries.pop(key)
+            heapq.heappush(self._heap, (entry["qty"], key))
+
+    def min_qty(self):
+        if len(self._entries) < self.capacity:
+            return 0
+        return min(entry["qty"] for entry in self._entries.values())
+
+    def merge(self, other):
+        """
+        Combines two summaries. A key missing from a full summary may have
+        been evicted there, so it inherits that summary's minimum as error.
+        """
+        self_floor, other_floor = self.min_qty(), other.min_qty()
+        merged = {}
+
+        for key in self._entries.keys() | other._entries.keys():
+            entry = {"qty": 0, "revenue": 0, "error": 0}
+            for part in (self._entries.get(key), other._entries.get(key)):
+                if part is not None:
+                    entry["qty"] += part["qty"]
+                    entry["revenue"] += part["revenue"]
+                    entry["error"] += part["error"]
+            floor = (
+                (other_floor if key not in other._entries else 0)
+                + (self_floor if key not in self._entries else 0)
+            )
+            entry["qty"] += floor
+            entry["error"] += floor
+            merged[key] = entry
+
+        # Keep first-seen order among the survivors for stable output
+        order = list(self._entries) + [k for k in other._entries if k not in self._entries]
+        keep = set(sorted(order, key=lambda k: merged[k]["qty"], reverse=True)[:self.capacity])
+
+        self._entries = {key: merged[key] for key in order if key in keep}
+        self.total += other.total
+        self._heap = [(entry["qty"], key) for key, entry in self._entries.items()]
+        heapq.heapify(self._heap)
+        return self
+
+    # Mapping interface, so the summary reads like the exact products dict
+    def __getitem__(self, key):
+        return self._entries[key]
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
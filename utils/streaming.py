@@ -0,0 +1,102 @@
+# =========================================================
+# STREAMING PIPELINE
+# File: utils/streaming.py
+# =========================================================
+# Lines flow from the file through parse, validate and aggregate one chunk at
+# a time, so memory use stays flat regardless of the input size.
+
+from utils.data_processor import (
+    iter_file_transactions,
+    iter_validate_and_filter,
+    iter_chunks,
+    new_validation_summary,
+    new_sales_aggregate,
+    update_sales_aggregate,
+    new_enrichment_summary,
+    update_enrichment_summary
+)
+
+DEFAULT_CHUNK_SIZE = 10000
+
+
+def _as_list(filenames):
+    return [filenames] if isinstance(filenames, str) else list(filenames)
+
+
+def iter_transaction_chunks(filenames, region=None, min_amount=None, max_amount=None,
+                            chunk_size=DEFAULT_CHUNK_SIZE, summary=None, dedup=None,
+                            rejects=None):
+    """
+    Streams validated transactions from one or more sales files in chunks.
+    Validation counts are accumulated into summary and rows dropped by the
+    parser into rejects (see new_parse_rejects) as chunks are consumed.
+    With a dedup TransactionIDIndex, repeated TransactionIDs are dropped.
+    Yields: lists of at most chunk_size transaction dictionaries
+    """
+    parsed = (
+        tx
+        for filename in _as_list(filenames)
+        for tx in iter_file_transactions(filename, rejects=rejects)
+    )
+    valid = iter_validate_and_filter(parsed, region, min_amount, max_amount, summary)
+    if dedup is not None:
+        from utils.dedup import iter_deduplicate
+
+        valid = iter_deduplicate(valid, dedup)
+
+    yield from iter_chunks(valid, chunk_size)
+
+
+def stream_sales_aggregate(filenames, region=None, min_amount=None, max_amount=None,
+                           chunk_size=DEFAULT_CHUNK_SIZE, approximate=None, dedup=None,
+                           rejects=None):
+    """
+    Builds the sales aggregate for one or more files without materialising
+    transactions.
+    Returns: (aggregate, validation summary)
+    """
+    summary = new_validation_summary()
+    aggregate = new_sales_aggregate(approximate)
+
+    for chunk in iter_transaction_chunks(
+        filenames, region, min_amount, max_amount, chunk_size, summary, dedup, rejects
+    ):
+        update_sales_aggregate(aggregate, chunk)
+
+    return aggregate, summary
+
+
+def stream_pipeline(filenames, product_mapping=None, enriched_file=None, region=None,
+                    min_amount=None, max_amount=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                    approximate=None, dedup=None, rejects=None):
+    """
+    Aggregates, enriches and saves one or more sales files chunk by chunk.
+    Enriched rows are written as they are produced, never held all at once.
+    Enrichment is skipped when product_mapping or enriched_file is None.
+    Returns: (aggregate, validation summary, enrichment summary or None)
+    """
+    from utils.api_handler import ENRICHED_HEADER, enrich_sales_data, write_enriched_rows
+
+    summary = new_validation_summary()
+    aggregate = new_sales_aggregate(approximate)
+    chunks = iter_transaction_chunks(
+        filenames, region, min_amount, max_amount, chunk_size, summary, dedup, rejects
+    )
+
+    if product_mapping is None or not enriched_file:
+        for chunk in chunks:
+            update_sales_aggregate(aggregate, chunk)
+        return aggregate, summary, None
+
+    enrichment = new_enrichment_summary()
+    with open(enriched_file, "w", encoding="utf-8") as out:
+        out.write("|".join(ENRICHED_HEADER) + "\n")
+        for chunk in chunks:
+            update_sales_aggregate(aggregate, chunk)
+            enriched = enrich_sales_data(chunk, product_mapping)
+            update_enrichment_summary(enrichment, enriched)
+            write_enriched_rows(out, enriched)
+
+    print(f"Enriched data saved to {enriched_file}")
+
+    return aggregate, summary, enrichment
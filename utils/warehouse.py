@@ -0,0 +1,341 @@
+# =========================================================
+# SQLITE WAREHOUSE BACKEND
+# File: utils/warehouse.py
+# =========================================================
+# Validated transactions are bulk-loaded into a local SQLite file that
+# survives between runs, with indexes on Date, Region, CustomerID and
+# ProductID. TransactionID is unique: reloading a file only appends the
+# transactions the warehouse does not hold yet. The analytics functions in
+# data_processor accept the warehouse like any other input: its aggregate
+# runs each grouping as a GROUP BY query the first time an analytics
+# function asks for it, so only the grouped results (never the rows) are
+# loaded into Python.
+#
+#   warehouse = SalesWarehouse("output/warehouse.db")
+#   warehouse.load(valid)
+#   region_wise_sales(warehouse)
+#   top_selling_products(warehouse.to_aggregate(region="North", date_from="2024-12-01"))
+#
+# Money is stored as integer paise, like the in-memory aggregate, so SUMs
+# are exact.
+
+from utils.data_processor import iter_chunks
+from utils.money import PAISE_PER_RUPEE
+
+LOAD_BATCH = 10000
+
+TABLE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    transaction_id   TEXT NOT NULL,
+    date             TEXT NOT NULL,
+    product_id       TEXT NOT NULL,
+    product_name     TEXT NOT NULL,
+    quantity         INTEGER NOT NULL,
+    unit_price       REAL NOT NULL,
+    unit_price_paise INTEGER NOT NULL,
+    customer_id      TEXT NOT NULL,
+    region           TEXT NOT NULL
+)
+"""
+
+INDEXES = {
+    "idx_transactions_date": "date",
+    "idx_transactions_region": "region",
+    "idx_transactions_customer": "customer_id",
+    "idx_transactions_product": "product_id"
+}
+
+# Kept through bulk loads (unlike INDEXES): INSERT OR IGNORE relies on it
+UNIQUE_INDEX = (
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_id ON transactions (transaction_id)"
+)
+
+REVENUE = "quantity * unit_price_paise"
+
+# Filter name -> column, matching TransactionQuery
+FILTER_COLUMNS = {
+    "region": "region",
+    "customer": "customer_id",
+    "product": "product_id",
+    "product_name": "product_name"
+}
+
+
+class CustomerCount:
+    """
+    Stands in for a per-day customer set: only the distinct count is
+    pushed down, and len() is all the analytics and the report use.
+    """
+
+    def __init__(self, count):
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __repr__(self):
+        return f"CustomerCount({self.count})"
+
+
+class CustomerProducts:
+    """
+    Stands in for a customer's product set: the distinct count comes with
+    the customer query, and the names are fetched (for every customer at
+    once) only when a set is actually iterated.
+    """
+
+    def __init__(self, aggregate, customer, count):
+        self.aggregate = aggregate
+        self.customer = customer
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self.aggregate.customer_products()[self.customer])
+
+    def __repr__(self):
+        return f"CustomerProducts({self.customer!r}, {self.count})"
+
+
+class WarehouseAggregate(dict):
+    """
+    Sales aggregate (see data_processor.new_sales_aggregate) backed by the
+    warehouse. Each grouping is queried on first access and then kept;
+    groups are ordered by first appearance, like the row-by-row aggregate.
+    """
+
+    def __init__(self, db, where, params):
+        super().__init__()
+        self.db = db
+        self.where = where
+        self.params = params
+        self._products = None
+
+    def _query(self, select, group_by=None):
+        sql = f"SELECT {select} FROM transactions {self.where}"
+        if group_by:
+            sql += f" GROUP BY {group_by} ORDER BY MIN(rowid)"
+        return self.db.execute(sql, self.params)
+
+    def __missing__(self, key):
+        if key in ("total_revenue", "transactions", "start_date", "end_date"):
+            revenue, count, start, end = self._query(
+                f"COALESCE(SUM({REVENUE}), 0), COUNT(*), MIN(date), MAX(date)"
+            ).fetchone()
+            self.update(total_revenue=revenue, transactions=count, start_date=start, end_date=end)
+
+        elif key == "regions":
+            self["regions"] = {
+                region: {"revenue": revenue, "count": count}
+                for region, revenue, count in self._query(
+                    f"region, SUM({REVENUE}), COUNT(*)", "region"
+                )
+            }
+
+        elif key == "products":
+            self["products"] = {
+                product: {"qty": qty, "revenue": revenue}
+                for product, qty, revenue in self._query(
+                    f"product_name, SUM(quantity), SUM({REVENUE})", "product_name"
+                )
+            }
+
+        elif key == "customers":
+            self["customers"] = {
+                customer: {
+                    "spent": spent,
+                    "count": count,
+                    "products": CustomerProducts(self, customer, products)
+                }
+                for customer, spent, count, products in self._query(
+                    f"customer_id, SUM({REVENUE}), COUNT(*), COUNT(DISTINCT product_name)",
+                    "customer_id"
+                )
+            }
+
+        elif key == "daily":
+            self["daily"] = {
+                date: {"revenue": revenue, "count": count, "customers": CustomerCount(customers)}
+                for date, revenue, count, customers in self._query(
+                    f"date, SUM({REVENUE}), COUNT(*), COUNT(DISTINCT customer_id)", "date"
+                )
+            }
+
+        else:
+            raise KeyError(key)
+
+        return self[key]
+
+    def customer_products(self):
+        """
+        Returns: {customer: set of product names}, queried once
+        """
+        if self._products is None:
+            self._products = {}
+            for customer, product in self._query("DISTINCT customer_id, product_name"):
+                self._products.setdefault(customer, set()).add(product)
+        return self._products
+
+    def top_customers(self, n):
+        """
+        The n biggest spenders, ranked in SQL rather than by grouping every
+        customer into Python (unless the customers are loaded already).
+        Returns: [(customer, {"spent", "count", "products"})], like
+                 sorted(aggregate["customers"].items()) by spent, descending
+        """
+        if "customers" in self:
+            return sorted(
+                self["customers"].items(), key=lambda x: x[1]["spent"], reverse=True
+            )[:n]
+        rows = self.db.execute(
+            f"SELECT customer_id, SUM({REVENUE}), COUNT(*), COUNT(DISTINCT product_name) "
+            f"FROM transactions {self.where} GROUP BY customer_id "
+            f"ORDER BY SUM({REVENUE}) DESC, MIN(rowid) LIMIT ?",
+            [*self.params, n]
+        )
+        return [
+            (customer, {
+                "spent": spent,
+                "count": count,
+                "products": CustomerProducts(self, customer, products)
+            })
+            for customer, spent, count, products in rows
+        ]
+
+
+class SalesWarehouse:
+    """
+    Local SQLite store of validated transactions.
+    """
+
+    def __init__(self, path):
+        import sqlite3
+
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(TABLE_SCHEMA)
+        self.removed_duplicates = self._ensure_unique()
+        self.create_indexes()
+
+    def _ensure_unique(self):
+        """
+        Adds the TransactionID constraint. Warehouses written before it may
+        hold reloaded transactions more than once; the first copy is kept.
+        Returns: number of duplicate rows removed
+        """
+        import sqlite3
+
+        try:
+            self.db.execute(UNIQUE_INDEX)
+            return 0
+        except sqlite3.IntegrityError:
+            removed = self.db.execute(
+                "DELETE FROM transactions WHERE rowid NOT IN "
+                "(SELECT MIN(rowid) FROM transactions GROUP BY transaction_id)"
+            ).rowcount
+            self.db.execute(UNIQUE_INDEX)
+            self.db.commit()
+            return removed
+
+    def create_indexes(self):
+        for name, column in INDEXES.items():
+            self.db.execute(f"CREATE INDEX IF NOT EXISTS {name} ON transactions ({column})")
+        self.db.commit()
+
+    def drop_indexes(self):
+        for name in INDEXES:
+            self.db.execute(f"DROP INDEX IF EXISTS {name}")
+        self.db.commit()
+
+    def load(self, transactions, batch_size=LOAD_BATCH, rebuild_indexes=None):
+        """
+        Appends transactions with one executemany call and one commit per batch.
+        Transactions whose TransactionID is already stored are skipped.
+        rebuild_indexes: drop the indexes for the load and build them once
+                         afterwards; by default only when the table is empty
+                         (about 3-4x faster for an initial bulk load, while
+                         small appends to a large history keep their indexes)
+        Returns: number of rows loaded (skipped duplicates not counted)
+        """
+        if rebuild_indexes is None:
+            rebuild_indexes = not self.db.execute("SELECT 1 FROM transactions LIMIT 1").fetchone()
+        if rebuild_indexes:
+            self.drop_indexes()
+
+        try:
+            return self._insert(transactions, batch_size)
+        finally:
+            if rebuild_indexes:
+                self.create_indexes()
+
+    def _insert(self, transactions, batch_size):
+        changes = self.db.total_changes
+        for chunk in iter_chunks(transactions, batch_size):
+            self.db.executemany(
+                "INSERT OR IGNORE INTO transactions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        tx["TransactionID"], tx["Date"], tx["ProductID"], tx["ProductName"],
+                        tx["Quantity"], tx["UnitPrice"], tx["UnitPricePaise"],
+                        tx["CustomerID"], tx["Region"]
+                    )
+                    for tx in chunk
+                ]
+            )
+            self.db.commit()
+        return self.db.total_changes - changes
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+
+    def to_aggregate(self, **filters):
+        """
+        Returns a lazily queried aggregate of the stored transactions matching
+        the filters (all optional, combined with AND; indexed columns first):
+          region, customer, product, product_name – a value or a list of values
+          date_from, date_to                      – inclusive ISO date bounds
+          min_amount, max_amount                  – inclusive amount bounds (rupees)
+        Falsy values (None, "", 0, []) mean "no filter", as in
+        validate_and_filter.
+        """
+        unknown = set(filters) - set(FILTER_COLUMNS) - {
+            "date_from", "date_to", "min_amount", "max_amount"
+        }
+        if unknown:
+            raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}")
+        filters = {key: value for key, value in filters.items() if value}
+
+        clauses, params = [], []
+        for key, column in FILTER_COLUMNS.items():
+            value = filters.get(key)
+            if value is None:
+                continue
+            values = [value] if isinstance(value, str) else list(value)
+            clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+
+        for key, condition in (("date_from", "date >= ?"), ("date_to", "date <= ?")):
+            if filters.get(key) is not None:
+                clauses.append(condition)
+                params.append(filters[key])
+
+        for key, condition in (("min_amount", f"{REVENUE} >= ?"), ("max_amount", f"{REVENUE} <= ?")):
+            if filters.get(key) is not None:
+                clauses.append(condition)
+                params.append(filters[key] * PAISE_PER_RUPEE)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return WarehouseAggregate(self.db, where, params)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,234 @@
+# =========================================================
+# BULK WRITERS & BINARY OUTPUT FORMATS
+# File: utils/writers.py
+# =========================================================
+# Text output is written in large joined batches instead of one write per
+# row. Enriched data can also be saved as a compact columnar file that
+# downstream readers memory-map, or as Parquet / Arrow IPC when pyarrow is
+# installed.
+
+import json
+import struct
+
+WRITE_BATCH_ROWS = 8192
+
+COLUMNAR_MAGIC = b"SCOL\x01"
+ALIGNMENT = 8
+
+INT_COLUMNS = {"Quantity"}
+FLOAT_COLUMNS = {"UnitPrice", "API_Rating"}
+BOOL_COLUMNS = {"API_Match"}
+TEXT_COLUMNS = {"TransactionID"}
+
+
+# ---------------------------------------------------------
+# Batched text writes
+# ---------------------------------------------------------
+def write_batched(f, lines, batch_rows=WRITE_BATCH_ROWS):
+    """
+    Writes an iterable of newline-terminated strings with one write call per
+    batch of rows.
+    """
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= batch_rows:
+            f.write("".join(batch))
+            batch = []
+    if batch:
+        f.write("".join(batch))
+
+
+# ---------------------------------------------------------
+# Column extraction
+# ---------------------------------------------------------
+def _columns_of(rows, names):
+    """
+    Returns {name: list of values}. Sequences that already expose columns
+    (EnrichedTransactions) are used directly; other rows are materialised.
+    """
+    if hasattr(rows, "column"):
+        return {name: rows.column(name) for name in names}
+
+    columns = {name: [] for name in names}
+    for row in rows:
+        for name in names:
+            columns[name].append(row.get(name))
+    return columns
+
+
+def _to_array(name, values):
+    import numpy as np
+
+    if name in INT_COLUMNS:
+        return np.array(values, dtype=np.int64)
+    if name in FLOAT_COLUMNS:
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    if name in BOOL_COLUMNS:
+        return np.array([bool(v) for v in values], dtype=np.bool_)
+    return None
+
+
+# ---------------------------------------------------------
+# Length-prefixed columnar file
+# ---------------------------------------------------------
+# Layout: magic | uint64 header length | JSON header | aligned column blocks.
+# Numeric columns are raw little-endian arrays; categorical columns are int32
+# codes with their categories in the header; free-text columns are int64 end
+# offsets plus one UTF-8 blob.
+def save_columnar(rows, names, filename):
+    """
+    Saves rows to the columnar format.
+    Returns: number of rows written
+    """
+    import numpy as np
+
+    columns = _columns_of(rows, names)
+    count = len(columns[names[0]]) if names else 0
+
+    blocks = []
+    specs = []
+
+    for name in names:
+        values = columns[name]
+        array = _to_array(name, values)
+
+        if array is not None:
+            specs.append({"name": name, "kind": "numeric", "dtype": array.dtype.str})
+            blocks.append([array.astype(array.dtype.newbyteorder("<"), copy=False).tobytes()])
+        elif name in TEXT_COLUMNS:
+            encoded = [("" if v is None else str(v)).encode("utf-8") for v in values]
+            offsets = np.cumsum([len(b) for b in encoded], dtype=np.int64)
+            specs.append({"name": name, "kind": "text"})
+            blocks.append([offsets.astype("<i8").tobytes(), b"".join(encoded)])
+        else:
+            lookup = {}
+            codes = np.fromiter(
+                (lookup.setdefault(v, len(lookup)) for v in values),
+                dtype=np.int32,
+                count=len(values)
+            )
+            specs.append({"name": name, "kind": "dict", "categories": list(lookup)})
+            blocks.append([codes.astype("<i4").tobytes()])
+
+    # Offsets are relative to the start of the data section
+    position = 0
+    for spec, parts in zip(specs, blocks):
+        spec["parts"] = []
+        for part in parts:
+            spec["parts"].append([position, len(part)])
+            position += len(part) + (-len(part)) % ALIGNMENT
+
+    header = json.dumps({"rows": count, "columns": specs}).encode("utf-8")
+    header += b" " * ((-len(COLUMNAR_MAGIC) - 8 - len(header)) % ALIGNMENT)
+
+    with open(filename, "wb") as f:
+        f.write(COLUMNAR_MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for parts in blocks:
+            for part in parts:
+                f.write(part)
+                f.write(b"\0" * ((-len(part)) % ALIGNMENT))
+
+    return count
+
+
+class ColumnarFile:
+    """
+    Memory-mapped reader for files written by save_columnar.
+    Numeric columns and categorical codes are zero-copy NumPy views.
+    """
+
+    def __init__(self, filename):
+        import numpy as np
+
+        self.buffer = np.memmap(filename, dtype=np.uint8, mode="r")
+        magic_len = len(COLUMNAR_MAGIC)
+        if bytes(self.buffer[:magic_len]) != COLUMNAR_MAGIC:
+            raise ValueError(f"Not a columnar sales file: {filename}")
+
+        (header_len,) = struct.unpack("<Q", bytes(self.buffer[magic_len:magic_len + 8]))
+        header_start = magic_len + 8
+        header = json.loads(bytes(self.buffer[header_start:header_start + header_len]))
+
+        self.rows = header["rows"]
+        self.data_start = header_start + header_len
+        self.specs = {spec["name"]: spec for spec in header["columns"]}
+        self.names = [spec["name"] for spec in header["columns"]]
+
+    def _part(self, spec, index, dtype):
+        offset, length = spec["parts"][index]
+        start = self.data_start + offset
+        return self.buffer[start:start + length].view(dtype)
+
+    def __len__(self):
+        return self.rows
+
+    def codes(self, name):
+        """
+        Returns (int32 codes, categories) of a categorical column.
+        """
+        spec = self.specs[name]
+        return self._part(spec, 0, "<i4"), spec["categories"]
+
+    def column(self, name):
+        """
+        Returns a NumPy view for numeric columns and a list of strings for
+        text and categorical columns.
+        """
+        spec = self.specs[name]
+
+        if spec["kind"] == "numeric":
+            return self._part(spec, 0, spec["dtype"])
+
+        if spec["kind"] == "dict":
+            codes, categories = self.codes(name)
+            return [categories[c] for c in codes.tolist()]
+
+        ends = self._part(spec, 0, "<i8").tolist()
+        blob = bytes(self._part(spec, 1, "u1"))
+        start = 0
+        values = []
+        for end in ends:
+            values.append(blob[start:end].decode("utf-8"))
+            start = end
+        return values
+
+
+# ---------------------------------------------------------
+# Parquet / Arrow IPC (optional pyarrow)
+# ---------------------------------------------------------
+def save_arrow(rows, names, filename, file_format="parquet"):
+    """
+    Saves rows as Parquet or Arrow IPC. Requires pyarrow.
+    Returns: number of rows written
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError("pyarrow is required for Parquet / Arrow output: pip install pyarrow")
+
+    columns = _columns_of(rows, names)
+    arrays = []
+    for name in names:
+        array = _to_array(name, columns[name])
+        if array is not None:
+            arrays.append(pa.array(array))
+        elif name in TEXT_COLUMNS:
+            arrays.append(pa.array(columns[name], type=pa.string()))
+        else:
+            arrays.append(pa.array(columns[name], type=pa.string()).dictionary_encode())
+    table = pa.Table.from_arrays(arrays, names=names)
+
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(table, filename)
+    elif file_format == "arrow":
+        with pa.OSFile(filename, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+    else:
+        raise ValueError(f"Unknown Arrow format: {file_format}")
+
+    return table.num_rows